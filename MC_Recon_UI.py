@@ -1,727 +1,96 @@
+import time
+
+# 启动计时起点（--profile-startup），在其他模块导入之前记录
+STARTUP_TIME = time.perf_counter()
+
 import sys
 import os
-import pandas as pd
-import numpy as np
-import re
+import math
+import numbers
 import logging
-import configparser
-from copy import copy
+import argparse
+import multiprocessing
 from datetime import datetime
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Font, PatternFill, Border, Side, Color
-from openpyxl.utils import get_column_letter
-from openpyxl.worksheet.page import PageMargins, PrintPageSetup
-from openpyxl.worksheet.properties import PageSetupProperties
+# 界面启动只需要配置模块；pandas、openpyxl和处理引擎在用到时才导入，处理在子进程中进行（界面显示后即启动并预加载）
+from recon_config import (DEFAULT_STORE_PATH, REPORT_HEADER_MAPPING, TREND_DIMENSIONS, load_company_name,
+                          load_history_store_config, load_watch_config, load_service_config, load_property_profiles,
+                          ensure_config_file)
+from recon_process import EngineProcess
+from recon_checkpoint import read_checkpoint, resumable_reports
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QPushButton, QTextEdit, QProgressBar, QFrame,
-                             QFileDialog, QMessageBox, QListWidget, QListWidgetItem)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QRect
+                             QFileDialog, QMessageBox, QListWidget, QListWidgetItem,
+                             QTabWidget, QLineEdit, QTableView, QHeaderView, QComboBox)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QRect, QAbstractTableModel, QModelIndex
 from PyQt5.QtGui import QFont, QPalette, QColor, QIcon
 from PyQt5.QtWidgets import QDesktopWidget
 
+# 模块导入完成的时间（启动耗时统计的第一个阶段）
+IMPORTS_DONE_TIME = time.perf_counter()
+
+class ReceiptTableModel(QAbstractTableModel):
+    """历史查询结果的表格模型，视图只按需读取可见区域的单元格"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.headers = []
+        self.values = []
+    
+    def set_data(self, data):
+        self.beginResetModel()
+        self.headers = list(data.columns)
+        self.values = data.to_numpy(dtype=object)
+        self.endResetModel()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.values)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        header = self.headers[index.column()]
+        value = self.values[index.row()][index.column()]
+        is_number = isinstance(value, numbers.Real) and not isinstance(value, bool)
+        if role == Qt.DisplayRole:
+            if value is None or (is_number and math.isnan(value)):
+                return ''
+            if header == '税率' and is_number:
+                return f'{value:.0%}'
+            if is_number:
+                return f'{value:,.2f}'
+            return str(value).replace('\n', ' ')
+        if role == Qt.TextAlignmentRole:
+            if is_number:
+                return int(Qt.AlignRight | Qt.AlignVCenter)
+            return int(Qt.AlignCenter)
+        return None
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal and section < len(self.headers):
+            header = self.headers[section]
+            return REPORT_HEADER_MAPPING.get(header, header)
+        if role == Qt.DisplayRole and orientation == Qt.Vertical:
+            return str(section + 1)
+        return None
+
 class DataProcessThread(QThread):
     progress_signal = pyqtSignal(str)
     finished_signal = pyqtSignal(bool, str)
     
-    def __init__(self, input_files):
+    def __init__(self, engine_process, input_files, resume=False):
         super().__init__()
+        self.engine_process = engine_process
         self.input_files = input_files
-        self.column_config = self.load_column_config()
+        self.resume = resume
     
-    def excel_column_to_number(self, column_letter):
-        """将Excel列字母转换为数字索引（从0开始）"""
-        if isinstance(column_letter, int):
-            return column_letter  # 如果已经是数字，直接返回
-        
-        column_letter = str(column_letter).strip()
-        
-        # 如果包含注释符号#，只取#前面的部分
-        if '#' in column_letter:
-            column_letter = column_letter.split('#')[0].strip()
-        
-        column_letter = column_letter.upper()
-        
-        # 如果是纯数字字符串，转换为整数
-        if column_letter.isdigit():
-            return int(column_letter)
-        
-        # 转换字母为数字
-        result = 0
-        for char in column_letter:
-            if 'A' <= char <= 'Z':
-                result = result * 26 + (ord(char) - ord('A') + 1)
-            else:
-                raise ValueError(f"无效的列标识符: {column_letter}")
-        
-        return result - 1  # 转换为从0开始的索引
-    
-    def load_column_config(self):
-        """从配置文件加载列号配置"""
-        config = configparser.ConfigParser()
-        config_path = get_config_path()
-        
-        # 默认列号配置（使用字母格式）
-        default_config = {
-            'receipt_column': 'A',
-            'supplier_column': 'D',
-            'date_column': 'X',
-            'product_name_column': 'A',
-            'quantity_column': 'I',
-            'unit_column': 'J',
-            'unit_price_column': 'N',
-            'subtotal_column': 'Z',
-            'tax_amount_column': 'AE',
-            'total_amount_column': 'AI',
-            'department_column': 'AL'
-        }
-        
-        if os.path.exists(config_path):
-            try:
-                config.read(config_path, encoding='utf-8')
-                if 'Columns' in config:
-                    # 从配置文件读取列号，如果不存在则使用默认值
-                    for key in default_config:
-                        if key in config['Columns']:
-                            default_config[key] = config.get('Columns', key)
-                logging.info(f'已加载列配置: {default_config}')
-            except Exception as e:
-                logging.error(f"读取列配置错误: {e}，使用默认配置")
-        
-        # 将所有列配置转换为数字索引
-        numeric_config = {}
-        for key, value in default_config.items():
-            try:
-                numeric_config[key] = self.excel_column_to_number(value)
-                logging.info(f'{key}: {value} -> {numeric_config[key]}')
-            except Exception as e:
-                logging.error(f"转换列配置错误 {key}={value}: {e}")
-                # 使用备用默认值
-                backup_defaults = {
-                    'receipt_column': 0, 'supplier_column': 3, 'date_column': 23,
-                    'product_name_column': 0, 'quantity_column': 8, 'unit_column': 9,
-                    'unit_price_column': 13, 'subtotal_column': 25, 'tax_amount_column': 30,
-                    'total_amount_column': 34, 'department_column': 37
-                }
-                numeric_config[key] = backup_defaults.get(key, 0)
-        
-        return numeric_config
-    
-    def get_column_name(self, column_index):
-        """根据列索引生成Unnamed列名"""
-        return f'Unnamed: {column_index}'
-
-    def format_mixed_text(self, text):
-        if pd.isna(text):
-            return text
-        text = str(text)
-        chinese_pattern = re.compile('[\u4e00-\u9fff]')
-        match = chinese_pattern.search(text)
-        if match:
-            english_part = text[:match.start()].strip()
-            chinese_part = text[match.start():].strip()
-            if english_part and chinese_part:
-                return f'{english_part}\n{chinese_part}'
-        return text
-
-    def extract_chinese(self, text):
-        """提取文本中的中文字符"""
-        if pd.isna(text):
-            return text
-        text = str(text)
-        chinese_pattern = re.compile('[\u4e00-\u9fff]+')
-        chinese_matches = chinese_pattern.findall(text)
-        if chinese_matches:
-            return ''.join(chinese_matches)
-        return text
-
     def run(self):
-        try:
-            # 创建日志目录
-            if not os.path.exists('logs'):
-                os.makedirs('logs')
-            
-            # 配置日志
-            log_filename = os.path.join('logs', f'process_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
-            logging.basicConfig(
-                level=logging.INFO,
-                format='%(asctime)s - %(levelname)s - %(message)s',
-                handlers=[
-                    logging.FileHandler(log_filename, encoding='utf-8'),
-                    logging.StreamHandler()
-                ]
-            )
-            
-            all_final_data = []
-            
-            for input_file in self.input_files:
-                self.progress_signal.emit(f'开始读取文件：{os.path.basename(input_file)}')
-                logging.info(f'开始读取文件：{input_file}')
-                
-                # 读取原始文件
-                df = pd.read_excel(input_file, skiprows=8)
-                logging.info(f'文件读取完成，共{len(df)}行数据')
-                self.progress_signal.emit(f'文件读取完成，共{len(df)}行数据')
-                
-                # 获取收货单号的行索引
-                receipt_column_name = self.get_column_name(self.column_config['receipt_column'])
-                receipt_rows = df[df[receipt_column_name].astype(str).str.match(r'^(RTS)?000\d+$', na=False)].index
-                
-                # 创建一个空的列表来存储所有明细数据
-                all_details = []
-                
-                # 遍历每个收货单号之间的行
-                total_receipts = len(receipt_rows)
-                for i in range(total_receipts):
-                    start_idx = receipt_rows[i]
-                    end_idx = receipt_rows[i+1] if i < len(receipt_rows)-1 else len(df)
-                    
-                    receipt = df.loc[start_idx, self.get_column_name(self.column_config['receipt_column'])]
-                    supplier = df.loc[start_idx, self.get_column_name(self.column_config['supplier_column'])]
-                    date = df.loc[start_idx, self.get_column_name(self.column_config['date_column'])]
-                    
-                    # 清理供应商名称和日期中的发票信息
-                    if pd.notna(supplier):
-                        supplier = re.sub(r'[（(].*[)）]|（专票.*|（普票.*|\s+专票.*|\s+普票.*|\d+%$', '', str(supplier)).strip()
-                    
-                    if pd.notna(date):
-                        try:
-                            date = pd.to_datetime(date)
-                            if pd.notna(date):
-                                date = date.strftime('%Y-%m-%d')
-                        except:
-                            date = None
-                    
-                    # 获取明细行（跳过收货单号行）
-                    details = df.loc[start_idx+1:end_idx-1].copy()
-                    
-                    # 只保留非空行且不包含Page和Delivery Date的行
-                    product_name_column = self.get_column_name(self.column_config['product_name_column'])
-                    details = details[details[product_name_column].notna()]
-                    details = details[~details[product_name_column].astype(str).str.contains('Page|Delivery Date', na=False)]
-                    
-                    if not details.empty:
-                        details['收货单号'] = receipt
-                        details['供应商名称'] = self.extract_chinese(supplier)
-                        details['收货日期'] = date
-                        details['商品名称'] = details[self.get_column_name(self.column_config['product_name_column'])].apply(self.format_mixed_text)
-                        details['实收数量'] = details[self.get_column_name(self.column_config['quantity_column'])]
-                        details['基本单位'] = details[self.get_column_name(self.column_config['unit_column'])]
-                        details['单价'] = details[self.get_column_name(self.column_config['unit_price_column'])]
-                        details['小计金额'] = details[self.get_column_name(self.column_config['subtotal_column'])]
-                        details['税额'] = details[self.get_column_name(self.column_config['tax_amount_column'])]
-                        details['税率'] = details[self.get_column_name(self.column_config['tax_amount_column'])] / details[self.get_column_name(self.column_config['subtotal_column'])]
-                        details['小计价税'] = details[self.get_column_name(self.column_config['total_amount_column'])]
-                        details['部门'] = details[self.get_column_name(self.column_config['department_column'])].apply(self.format_mixed_text)
-                        
-                        all_details.append(details[['收货单号', '收货日期', '商品名称', '实收数量', '基本单位',
-                                                   '单价', '小计金额', '税额', '税率', '小计价税', '部门', '供应商名称']])
-                    
-                    progress = f'处理进度：{i+1}/{total_receipts}'
-                    self.progress_signal.emit(progress)
-                    logging.info(progress)
-                
-                # 合并所有明细数据
-                if all_details:
-                    file_df = pd.concat(all_details, ignore_index=True)
-                    all_final_data.append(file_df)
-                    logging.info(f'文件处理完成，共整理{len(file_df)}条记录')
-                    self.progress_signal.emit(f'文件处理完成，共整理{len(file_df)}条记录')
-            
-            # 合并所有文件的数据
-            final_df = pd.concat(all_final_data, ignore_index=True)
-            logging.info(f'所有文件处理完成，共整理{len(final_df)}条记录')
-            self.progress_signal.emit(f'所有文件处理完成，共整理{len(final_df)}条记录')
-            
-            # 创建供应商对账明细表文件夹
-            if not os.path.exists('供应商对账明细'):
-                os.makedirs('供应商对账明细')
-                logging.info('创建供应商对账明细文件夹')
-            
-            # 按供应商名称分组并生成对账明细表
-            total_suppliers = len(final_df['供应商名称'].unique())
-            current_supplier = 0
-            
-            for supplier_name, supplier_data in final_df.groupby('供应商名称'):
-                if pd.notna(supplier_name) and supplier_name.strip():
-                    current_supplier += 1
-                    self.progress_signal.emit(f'正在生成供应商对账单 ({current_supplier}/{total_suppliers}): {supplier_name}')
-                    
-                    # 按收货日期和收货单号排序
-                    supplier_data = supplier_data.sort_values(['收货日期', '收货单号'])
-                    
-                    # 获取年月信息
-                    first_date = pd.to_datetime(supplier_data['收货日期'].iloc[0])
-                    year_month = first_date.strftime('%Y%m')
-                    
-                    # 创建年月目录
-                    year_month_dir = os.path.join('供应商对账明细', year_month)
-                    if not os.path.exists(year_month_dir):
-                        os.makedirs(year_month_dir)
-                    
-                    # 计算合计金额
-                    total_amount = supplier_data['小计价税'].sum()
-                    
-                    # 创建一个包含合计行的新数据框
-                    summary_row = pd.DataFrame([{
-                        '收货单号': '合计',
-                        '收货日期': '',
-                        '商品名称': '',
-                        '实收数量': '',
-                        '基本单位': '',
-                        '单价': '',
-                        '小计金额': supplier_data['小计金额'].sum(),
-                        '税额': supplier_data['税额'].sum(),
-                        '税率': '',
-                        '小计价税': total_amount,
-                        '部门': '',
-                        '供应商名称': ''
-                    }])
-                    
-                    supplier_data_with_summary = pd.concat([supplier_data, summary_row], ignore_index=True)
-                    
-                    # 创建新的Excel工作簿
-                    wb = Workbook()
-                    ws = wb.active
-                    
-                    # 设置页面布局
-                    ws.page_setup.orientation = ws.ORIENTATION_PORTRAIT
-                    ws.page_setup.paperSize = ws.PAPERSIZE_A4
-                    ws.page_setup.fitToPage = True
-                    ws.page_setup.fitToHeight = 0
-                    ws.page_setup.fitToWidth = 1
-                    ws.print_options.horizontalCentered = True
-                    ws.print_options.verticalCentered = False
-                    # 设置页面缩放比例为80%
-                    ws.sheet_properties.pageSetUpPr = PageSetupProperties(fitToPage=True)
-                    ws.sheet_view.zoomScale = 80
-                    
-                    # 读取配置文件中的公司名称
-                    config = configparser.ConfigParser()
-                    config_path = get_config_path()
-                    company_name = 'HOTEL NAME'  # 默认值
-                    if os.path.exists(config_path):
-                        try:
-                            config.read(config_path, encoding='utf-8')
-                            if 'General' in config and 'company_name' in config['General']:
-                                company_name = config['General']['company_name']
-                        except Exception as e:
-                            logging.error(f"读取配置文件错误: {e}")
-                    
-                    # 设置页脚文本、字体和大小
-                    ws.oddFooter.center.text = f'\n第 &P 页，共 &N 页\n{company_name}'
-                    ws.oddFooter.center.size = 11
-                    ws.oddFooter.center.font = '微软雅黑'
-
-                    
-                    # 设置页边距（单位：厘米）
-                    ws.page_margins = PageMargins(left=0.31, right=0.31, top=0.31, bottom=0.39, header=0.31, footer=0.21)
-                    
-                    # 设置列宽
-                    column_widths = {
-                        '收货单号': 17,
-                        '收货日期': 19,
-                        '商品名称': 60,
-                        '实收数量': 19,
-                        '基本单位': 19,
-                        '单价': 20,
-                        '小计金额': 14,
-                        '税额': 14,
-                        '税率': 10,
-                        '小计价税': 20,
-                        '部门': 35,
-                        '供应商名称': 36
-                    }
-                    
-                    # 设置酒店名称标题
-                    hotel_title_row = 1
-                    ws.merge_cells(start_row=hotel_title_row, start_column=1, end_row=hotel_title_row, end_column=len(column_widths))
-                    hotel_title_cell = ws.cell(row=hotel_title_row, column=1, value='对账明细表')
-                    hotel_title_cell.font = Font(name='微软雅黑', size=16, color='000000')
-                    hotel_title_cell.alignment = Alignment(horizontal='center', vertical='center')
-                    ws.row_dimensions[hotel_title_row].height = 22
-                    
-                    # 设置空白行2
-                    blank_row2 = 2
-                    ws.merge_cells(start_row=blank_row2, start_column=1, end_row=blank_row2, end_column=len(column_widths))
-                    # 在A2单元格添加供应商名称信息
-                    supplier_info = f'供应商名称：{supplier_name}'
-                    blank_cell2 = ws.cell(row=blank_row2, column=1, value=supplier_info)
-                    blank_cell2.font = Font(name='微软雅黑', size=13, color='000000')
-                    blank_cell2.alignment = Alignment(horizontal='left', vertical='center')
-                    ws.row_dimensions[blank_row2].height = 18.75
-
-                    # 设置空白行3 - 添加对账周期信息
-                    blank_row3 = 3
-                    ws.merge_cells(start_row=blank_row3, start_column=1, end_row=blank_row3, end_column=len(column_widths))
-                    
-                    # 获取年月信息并计算月份第一天和最后一天
-                    first_date = pd.to_datetime(supplier_data['收货日期'].iloc[0])
-                    first_day = first_date.replace(day=1).strftime('%Y-%m-%d')
-                    # 计算月份最后一天
-                    if first_date.month == 12:
-                        last_day_date = first_date.replace(year=first_date.year+1, month=1, day=1) - pd.Timedelta(days=1)
-                    else:
-                        last_day_date = first_date.replace(month=first_date.month+1, day=1) - pd.Timedelta(days=1)
-                    last_day = last_day_date.strftime('%Y-%m-%d')
-                    
-                    # 设置对账周期信息
-                    billing_cycle = f'对帐周期：{first_day} 至 {last_day}'
-                    blank_cell3 = ws.cell(row=blank_row3, column=1, value=billing_cycle)
-                    blank_cell3.font = Font(name='微软雅黑', size=13, color='000000')
-                    blank_cell3.alignment = Alignment(horizontal='left', vertical='center')
-                    ws.row_dimensions[blank_row3].height = 18.75
+        # 处理在子进程中进行，本线程只等待管道消息，转发进度和日志
+        success, error_msg = self.engine_process.run(self.input_files, self.progress_signal.emit, self.resume)
+        self.finished_signal.emit(success, error_msg)
 
-                    # 设置空白行4 - 添加小计金额合计信息
-                    blank_row4 = 4
-                    ws.merge_cells(start_row=blank_row4, start_column=1, end_row=blank_row4, end_column=len(column_widths))
-                    
-                    # 获取小计金额合计数据
-                    total_subtotal = supplier_data['小计金额'].sum()
-                    
-                    # 设置小计金额信息
-                    subtotal_info = f'Net净额：{total_subtotal:,.2f}'
-                    blank_cell4 = ws.cell(row=blank_row4, column=1, value=subtotal_info)
-                    blank_cell4.font = Font(name='微软雅黑', size=13, color='000000')
-                    blank_cell4.alignment = Alignment(horizontal='left', vertical='center')
-                    ws.row_dimensions[blank_row4].height = 18.75
-
-                    # 设置空白行5 - 添加税额合计信息
-                    blank_row5 = 5
-                    ws.merge_cells(start_row=blank_row5, start_column=1, end_row=blank_row5, end_column=len(column_widths))
-                    
-                    # 获取税额合计数据
-                    total_tax = supplier_data['税额'].sum()
-                    
-                    # 设置税额信息
-                    tax_info = f'Vat税额：{total_tax:,.2f}'
-                    blank_cell5 = ws.cell(row=blank_row5, column=1, value=tax_info)
-                    blank_cell5.font = Font(name='微软雅黑', size=13, color='000000')
-                    blank_cell5.alignment = Alignment(horizontal='left', vertical='center')
-                    ws.row_dimensions[blank_row5].height = 18.75
-
-                    # 设置空白行6 - 添加小计价税合计信息
-                    blank_row6 = 6
-                    ws.merge_cells(start_row=blank_row6, start_column=1, end_row=blank_row6, end_column=len(column_widths))
-                    
-                    # 获取小计价税合计数据
-                    total_amount = supplier_data['小计价税'].sum()
-                    
-                    # 设置小计价税信息
-                    gross_info = f'Gross含税总额：{total_amount:,.2f}'
-                    blank_cell6 = ws.cell(row=blank_row6, column=1, value=gross_info)
-                    blank_cell6.font = Font(name='微软雅黑', size=13, color='000000')
-                    blank_cell6.alignment = Alignment(horizontal='left', vertical='center')
-                    ws.row_dimensions[blank_row6].height = 18.75
-                    
-                    # 设置表头样式
-                    header_font = Font(name='微软雅黑', size=13, bold=False, color='000000')
-                    cell_font = Font(name='微软雅黑', size=13)
-                    
-                    # 设置对齐方式
-                    center_alignment = Alignment(horizontal='center', vertical='center')
-                    right_alignment = Alignment(horizontal='right', vertical='center', shrink_to_fit=False)
-                    wrap_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                    
-                    # 设置边框样式
-                    thin_border = Border(
-                        left=Side(style='hair', color='D3D3D3'),
-                        right=Side(style='hair', color='D3D3D3'),
-                        top=Side(style='hair', color='D3D3D3'),
-                        bottom=Side(style='hair', color='D3D3D3')
-                    )
-                    header_border = Border(
-                        top=Side(style='thin', color='000000'),
-                        bottom=Side(style='thin', color='000000')
-                    )
-                    # 合计行边框样式（只有上边框）
-                    summary_border = Border(
-                        top=Side(style='thin', color='000000')
-                    )
-
-                    # 写入表头
-                    headers = list(supplier_data.columns)
-                    
-                    # 更新表头字段名称
-                    header_mapping = {
-                        '商品名称': '商品名称 Article',
-                        '实收数量': '实收数量 QTY',
-                        '基本单位': '基本单位 Unit',
-                        '单价': '单价 Unit Price',
-                        '小计金额': '净额 Net',
-                        '税额': '税额 VAT',
-                        '小计价税': '含税总额 Gross',
-                        '部门': '成本中心 CostCenter'
-                    }
-                    
-                    header_row = 7
-                    for col, header in enumerate(headers, 1):
-                        # 使用映射更新表头名称
-                        display_header = header_mapping.get(header, header)
-                        cell = ws.cell(row=header_row, column=col, value=display_header)
-                        cell.font = header_font
-                        cell.alignment = center_alignment
-                        cell.border = header_border
-                        ws.column_dimensions[get_column_letter(col)].width = column_widths[header]
-                        
-                        # 隐藏供应商名称列
-                        if header == '供应商名称':
-                            ws.column_dimensions[get_column_letter(col)].hidden = True
-                    
-                    # 设置表头行高
-                    ws.row_dimensions[header_row].height = 18.75
-                    
-                    # 冻结前七行
-                    ws.freeze_panes = 'A8'
-
-                    # 写入数据
-                    for row_idx, row in enumerate(supplier_data.values, header_row + 1):
-                        # 设置行高为40以适应双行文本
-                        ws.row_dimensions[row_idx].height = 40
-                        
-                        # 检查是否为负数金额行
-                        has_negative = False
-                        for col_idx, value in enumerate(row, 1):
-                            # 使用原始字段名称进行判断，因为headers中存储的是原始字段名
-                            if headers[col_idx-1] in ['小计金额', '税额', '小计价税'] and pd.notna(value) and float(value) < 0:
-                                has_negative = True
-                                break
-                        
-                        # 设置斑马线效果（偶数行）
-                        if row_idx % 2 == 0 and not has_negative:
-                            row_fill = PatternFill(start_color='F5F5F5', end_color='F5F5F5', fill_type='solid')
-                        else:
-                            row_fill = None
-                        
-                        # 写入单元格数据
-                        for col_idx, value in enumerate(row, 1):
-                            cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                            cell.font = cell_font
-                            cell.border = thin_border
-                            
-                            # 如果是负数金额行，整行设置黄色背景
-                            if has_negative:
-                                cell.fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
-                                # 使用原始字段名称进行判断，因为headers中存储的是原始字段名
-                                if headers[col_idx-1] in ['小计金额', '税额', '小计价税'] and pd.notna(value) and float(value) < 0:
-                                    cell.font = Font(name='微软雅黑', size=11, color='FF0000')
-                            elif row_fill:
-                                cell.fill = row_fill
-                            
-                            # 设置数字列的对齐方式和格式
-                            # 使用原始字段名称进行判断，因为headers中存储的是原始字段名
-                            if headers[col_idx-1] in ['商品名称', '部门']:
-                                cell.alignment = wrap_alignment
-                            elif headers[col_idx-1] in ['实收数量', '单价', '小计金额', '税额', '小计价税']:
-                                cell.alignment = right_alignment
-                                if pd.notna(value) and str(value).strip():
-                                    cell.number_format = '#,##0.00'
-                            elif headers[col_idx-1] == '税率':
-                                cell.alignment = right_alignment
-                                if pd.notna(value) and str(value).strip():
-                                    cell.number_format = '0%'
-                            else:
-                                cell.alignment = center_alignment
-                    
-                    # 写入合计行
-                    row_idx = len(supplier_data) + header_row + 1
-                    for col_idx, value in enumerate(summary_row.iloc[0], 1):
-                        cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                        cell.font = Font(name='微软雅黑', size=11, bold=True)
-                        cell.border = summary_border
-                        
-                        # 设置数字列的对齐方式和格式
-                        if headers[col_idx-1] in ['小计金额', '税额', '小计价税']:
-                            cell.alignment = right_alignment
-                            if pd.notna(value) and str(value).strip():
-                                cell.number_format = '#,##0.00'
-                        else:
-                            cell.alignment = center_alignment
-                    
-                    # 设置重复打印的行
-                    ws.print_title_rows = '1:7'
-
-                    # 创建商品数量统计工作表
-                    article_summary_ws = wb.create_sheet(title="Article_Summary")
-                    
-                    # 按商品名称分组统计数量
-                    article_stats = supplier_data.groupby('商品名称').agg({
-                        '实收数量': 'sum',
-                        '基本单位': 'first',
-                        '单价': 'mean',
-                        '小计金额': 'sum',
-                        '税额': 'sum',
-                        '税率': 'first',
-                        '小计价税': 'sum'
-                    }).reset_index()
-                    
-                    # 按总数量降序排列
-                    article_stats = article_stats.sort_values('实收数量', ascending=False)
-                    
-                    # 设置商品统计表的页面布局
-                    article_summary_ws.page_setup.orientation = article_summary_ws.ORIENTATION_PORTRAIT
-                    article_summary_ws.page_setup.paperSize = article_summary_ws.PAPERSIZE_A4
-                    article_summary_ws.page_setup.fitToPage = True
-                    article_summary_ws.page_setup.fitToHeight = 0
-                    article_summary_ws.page_setup.fitToWidth = 1
-                    article_summary_ws.print_options.horizontalCentered = True
-                    article_summary_ws.print_options.verticalCentered = False
-                    # 设置页面缩放比例为80%
-                    article_summary_ws.sheet_properties.pageSetUpPr = PageSetupProperties(fitToPage=True)
-                    article_summary_ws.sheet_view.zoomScale = 80
-                    
-                    # 设置页脚
-                    article_summary_ws.oddFooter.center.text = f'\n第 &P 页，共 &N 页\n{company_name}'
-                    article_summary_ws.oddFooter.center.size = 11
-                    article_summary_ws.oddFooter.center.font = '微软雅黑'
-                    
-                    # 设置页边距
-                    article_summary_ws.page_margins = PageMargins(left=0.31, right=0.31, top=0.31, bottom=0.39, header=0.31, footer=0.21)
-                    
-                    # 设置商品统计表的列宽
-                    summary_column_widths = {
-                        '商品名称 Article': 58,
-                        '总数量': 12,
-                        '基本单位 Unit': 16,
-                        '平均单价': 14,
-                        '净额 Net': 14,
-                        '税额 VAT': 14,
-                        '税率': 10,
-                        '含税总额 Gross': 19
-                    }
-                    
-                    # 设置商品统计表标题
-                    summary_title_row = 1
-                    article_summary_ws.merge_cells(start_row=summary_title_row, start_column=1, end_row=summary_title_row, end_column=len(summary_column_widths))
-                    summary_title_cell = article_summary_ws.cell(row=summary_title_row, column=1, value='商品数量统计表 Article Quantity Summary')
-                    summary_title_cell.font = Font(name='微软雅黑', size=16, color='000000')
-                    summary_title_cell.alignment = Alignment(horizontal='center', vertical='center')
-                    article_summary_ws.row_dimensions[summary_title_row].height = 22
-                    
-                    # 设置空白行
-                    summary_blank_row = 2
-                    article_summary_ws.merge_cells(start_row=summary_blank_row, start_column=1, end_row=summary_blank_row, end_column=len(summary_column_widths))
-                    blank_cell = article_summary_ws.cell(row=summary_blank_row, column=1, value='')
-                    blank_cell.font = Font(name='微软雅黑', size=20, color='000000')
-                    blank_cell.alignment = Alignment(horizontal='center', vertical='center')
-                    article_summary_ws.row_dimensions[summary_blank_row].height = 10
-                    
-                    # 写入商品统计表头
-                    summary_headers = ['商品名称 Article', '总数量', '基本单位 Unit', '平均单价', '净额 Net', '税额 VAT', '税率', '含税总额 Gross']
-                    summary_header_row = 3
-                    for col, header in enumerate(summary_headers, 1):
-                        cell = article_summary_ws.cell(row=summary_header_row, column=col, value=header)
-                        cell.font = header_font
-                        cell.alignment = center_alignment
-                        cell.border = header_border
-                        article_summary_ws.column_dimensions[get_column_letter(col)].width = summary_column_widths[header]
-                    
-                    # 冻结前三行
-                    article_summary_ws.freeze_panes = 'A4'
-                    
-                    # 写入商品统计数据
-                    for row_idx, (_, row) in enumerate(article_stats.iterrows(), summary_header_row + 1):
-                        # 设置行高
-                        article_summary_ws.row_dimensions[row_idx].height = 40
-                        
-                        # 设置斑马线效果
-                        if row_idx % 2 == 0:
-                            row_fill = PatternFill(start_color='F5F5F5', end_color='F5F5F5', fill_type='solid')
-                        else:
-                            row_fill = None
-                        
-                        # 写入数据
-                        values = [
-                            row['商品名称'],
-                            row['实收数量'],
-                            row['基本单位'],
-                            row['单价'],
-                            row['小计金额'],
-                            row['税额'],
-                            row['税率'],
-                            row['小计价税']
-                        ]
-                        
-                        for col_idx, value in enumerate(values, 1):
-                            cell = article_summary_ws.cell(row=row_idx, column=col_idx, value=value)
-                            cell.font = cell_font
-                            cell.border = thin_border
-                            
-                            if row_fill:
-                                cell.fill = row_fill
-                            
-                            # 设置对齐方式和格式
-                            # 由于summary_headers已更新，需要使用新的字段名称进行判断
-                            if summary_headers[col_idx-1] == '商品名称 Article':
-                                cell.alignment = wrap_alignment
-                            elif summary_headers[col_idx-1] in ['总数量', '平均单价', '净额 Net', '税额 VAT', '含税总额 Gross']:
-                                cell.alignment = right_alignment
-                                if pd.notna(value) and str(value).strip():
-                                    cell.number_format = '#,##0.00'
-                            elif summary_headers[col_idx-1] == '税率':
-                                cell.alignment = right_alignment
-                                if pd.notna(value) and str(value).strip():
-                                    cell.number_format = '0%'
-                            else:
-                                cell.alignment = center_alignment
-                    
-                    # 添加商品统计合计行
-                    summary_total_row = len(article_stats) + summary_header_row + 1
-                    summary_totals = [
-                        '合计',
-                        article_stats['实收数量'].sum(),
-                        '',
-                        '',
-                        article_stats['小计金额'].sum(),
-                        article_stats['税额'].sum(),
-                        '',
-                        article_stats['小计价税'].sum()
-                    ]
-                    
-                    for col_idx, value in enumerate(summary_totals, 1):
-                        cell = article_summary_ws.cell(row=summary_total_row, column=col_idx, value=value)
-                        cell.font = Font(name='微软雅黑', size=11, bold=True)
-                        cell.border = summary_border
-                        
-                        # 设置数字列的对齐方式和格式
-                        if summary_headers[col_idx-1] in ['总数量', '平均单价', '小计金额', '税额', '小计价税']:
-                            cell.alignment = right_alignment
-                            if pd.notna(value) and str(value).strip():
-                                cell.number_format = '#,##0.00'
-                        else:
-                            cell.alignment = center_alignment
-                    
-                    # 设置重复打印的行
-                    article_summary_ws.print_title_rows = '1:3'
-                    
-                    # 保存文件
-                    output_file = os.path.join(year_month_dir, f'{supplier_name}_对账明细.xlsx')
-                    wb.save(output_file)
-                    logging.info(f'已生成供应商对账单：{output_file}')
-                    
-                    # 不再生成独立的商品数量统计表文件
-                    logging.info(f'商品数量统计表已添加到对账明细表中')
-            
-            # 创建备份文件夹
-            if not os.path.exists('bak'):
-                os.makedirs('bak')
-                logging.info('创建备份文件夹')
-            
-            # 获取当前时间作为备份文件名
-            current_time = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
-            
-            # 备份数据
-            backup_file = os.path.join('bak', f'cleaned_receiving_journal_{current_time}.xlsx')
-            final_df.to_excel(backup_file, index=False)
-            logging.info(f'数据已备份至：{backup_file}')
-            
-            self.progress_signal.emit('处理完成！')
-            self.finished_signal.emit(True, '')
-            
-        except Exception as e:
-            error_msg = f'处理过程中出现错误：{str(e)}'
-            logging.error(error_msg)
-            self.progress_signal.emit(error_msg)
-            self.finished_signal.emit(False, error_msg)
 
 class QTextEditLogger(logging.Handler):
     def __init__(self, widget):
@@ -761,14 +130,19 @@ class QTextEditLogger(logging.Handler):
                 self.widget.verticalScrollBar().maximum()
             )
 
-# 程序版本信息
+# 程序版本信息和有效期（各物业的版本入口，如MC_Recon_UI_SY.py，可以覆盖）
 VERSION = '1.2.1'
+EXPIRATION_DATE = datetime(2026, 12, 31)
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.selected_files = []
         self.version = VERSION
+        # 已预加载处理引擎、等待下一次处理的子进程
+        self.engine_process = None
+        self.process_thread = None
+        self.cancel_requested = False
         
         # 确保配置文件存在
         config_path = ensure_config_file()
@@ -958,9 +332,36 @@ class MainWindow(QMainWindow):
         self.process_button.clicked.connect(self.startProcess)
         self.process_button.setEnabled(False)
         
+        # 取消按钮：处理过程中可用，引擎完成当前收货单或对账单后停止
+        self.cancel_button = QPushButton('取消处理')
+        self.cancel_button.setStyleSheet("""
+            QPushButton {
+                background-color: #e74c3c;
+                color: white;
+                border: none;
+                padding: 10px 20px;
+                border-radius: 5px;
+                font-weight: bold;
+                margin-top: 10px;
+                font-size: 16px;
+            }
+            QPushButton:hover {
+                background-color: #c0392b;
+            }
+            QPushButton:pressed {
+                background-color: #a93226;
+            }
+            QPushButton:disabled {
+                background-color: #cccccc;
+            }
+        """)
+        self.cancel_button.clicked.connect(self.cancelProcess)
+        self.cancel_button.setEnabled(False)
+        
         progress_layout.addWidget(progress_label)
         progress_layout.addWidget(self.progress_bar)
         progress_layout.addWidget(self.process_button)
+        progress_layout.addWidget(self.cancel_button)
         progress_layout.addStretch()
         progress_frame.setLayout(progress_layout)
         
@@ -991,9 +392,18 @@ class MainWindow(QMainWindow):
         log_layout.addWidget(self.progress_text)
         log_frame.setLayout(log_layout)
         
-        # 添加所有部件到主布局（调整顺序，将日志放到下方）
-        layout.addLayout(split_layout)
-        layout.addWidget(log_frame)
+        # 对账处理页：文件选择和进度在上，日志放到下方
+        process_tab = QWidget()
+        process_layout = QVBoxLayout()
+        process_layout.addLayout(split_layout)
+        process_layout.addWidget(log_frame)
+        process_tab.setLayout(process_layout)
+        
+        # 使用选项卡切换对账处理和历史查询
+        self.tabs = QTabWidget()
+        self.tabs.addTab(process_tab, '对账处理')
+        self.tabs.addTab(self.createHistoryTab(), '历史查询')
+        layout.addWidget(self.tabs)
         
         # 添加版权信息
         copyright_label = QLabel(f'Powered By Cayman Fu 2025 Ver {self.version}')
@@ -1062,6 +472,196 @@ class MainWindow(QMainWindow):
             }
         """)
     
+    def createHistoryTab(self):
+        """创建历史查询页：按供应商、月份、商品和成本中心查询历史收货明细库"""
+        history_frame = QFrame()
+        history_frame.setFrameShape(QFrame.StyledPanel)
+        history_frame.setFrameShadow(QFrame.Raised)
+        history_frame.setStyleSheet("""
+            QFrame {
+                background-color: #ffffff;
+                border-radius: 10px;
+                padding: 15px;
+                margin: 10px;
+            }
+        """)
+        
+        history_layout = QVBoxLayout()
+        
+        # 查询条件
+        filter_layout = QHBoxLayout()
+        self.history_filters = {}
+        for key, label_text, placeholder in [
+            ('supplier', '供应商', '支持*通配符'),
+            ('month', '月份', 'YYYYMM'),
+            ('article', '商品', '支持*通配符'),
+            ('department', '成本中心', '支持*通配符')
+        ]:
+            filter_layout.addWidget(QLabel(label_text))
+            line_edit = QLineEdit()
+            line_edit.setPlaceholderText(placeholder)
+            line_edit.returnPressed.connect(self.runHistoryQuery)
+            filter_layout.addWidget(line_edit)
+            self.history_filters[key] = line_edit
+        
+        self.history_query_button = QPushButton('查询')
+        self.history_query_button.setStyleSheet("""
+            QPushButton {
+                background-color: #4a90e2;
+                color: white;
+                border: none;
+                padding: 8px 15px;
+                border-radius: 5px;
+                font-weight: bold;
+                font-size: 16px;
+            }
+            QPushButton:hover {
+                background-color: #357abd;
+            }
+            QPushButton:pressed {
+                background-color: #2a5f9e;
+            }
+        """)
+        self.history_query_button.clicked.connect(self.runHistoryQuery)
+        
+        self.history_export_button = QPushButton('导出Excel')
+        self.history_export_button.setStyleSheet("""
+            QPushButton {
+                background-color: #4caf50;
+                color: white;
+                border: none;
+                padding: 8px 15px;
+                border-radius: 5px;
+                font-weight: bold;
+                font-size: 16px;
+            }
+            QPushButton:hover {
+                background-color: #43a047;
+            }
+            QPushButton:pressed {
+                background-color: #388e3c;
+            }
+            QPushButton:disabled {
+                background-color: #cccccc;
+            }
+        """)
+        self.history_export_button.clicked.connect(self.exportHistoryQuery)
+        self.history_export_button.setEnabled(False)
+        
+        # 月度趋势直接读取月度汇总表，月份条件作为截止月份
+        self.trend_dimension_combo = QComboBox()
+        for key, label_text in TREND_DIMENSIONS.items():
+            self.trend_dimension_combo.addItem(label_text, key)
+        self.history_trend_button = QPushButton('月度趋势')
+        self.history_trend_button.setStyleSheet(self.history_query_button.styleSheet())
+        self.history_trend_button.clicked.connect(self.runHistoryTrend)
+        
+        filter_layout.addWidget(self.history_query_button)
+        filter_layout.addWidget(self.trend_dimension_combo)
+        filter_layout.addWidget(self.history_trend_button)
+        filter_layout.addWidget(self.history_export_button)
+        
+        # 查询结果，行高固定，视图只绘制可见行
+        self.history_model = ReceiptTableModel(self)
+        self.history_table = QTableView()
+        self.history_table.setModel(self.history_model)
+        self.history_table.setAlternatingRowColors(True)
+        self.history_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.history_table.verticalHeader().setDefaultSectionSize(28)
+        self.history_table.horizontalHeader().setStretchLastSection(True)
+        
+        self.history_status_label = QLabel('请输入查询条件')
+        self.history_result = None
+        self.history_result_title = None
+        
+        history_layout.addLayout(filter_layout)
+        history_layout.addWidget(self.history_table)
+        history_layout.addWidget(self.history_status_label)
+        history_frame.setLayout(history_layout)
+        return history_frame
+    
+    def historyFilterValues(self):
+        return {key: line_edit.text().strip() or None for key, line_edit in self.history_filters.items()}
+    
+    def runHistoryQuery(self):
+        store_path = load_history_store_config() or DEFAULT_STORE_PATH
+        if not os.path.exists(store_path):
+            self.history_status_label.setText(f'历史库不存在：{store_path}，请先处理收货明细')
+            return
+        
+        try:
+            import pandas as pd
+            from receipt_store import ReceiptStore
+            start_time = datetime.now()
+            with ReceiptStore(store_path) as store:
+                result = store.query_receipts(**self.historyFilterValues())
+            elapsed_ms = (datetime.now() - start_time).total_seconds() * 1000
+        except Exception as e:
+            logging.error(f'历史查询失败：{e}')
+            self.history_status_label.setText(f'查询失败：{e}')
+            return
+        
+        self.history_result = result
+        self.history_result_title = None
+        self.history_model.set_data(result)
+        self.history_export_button.setEnabled(not result.empty)
+        self.history_status_label.setText(
+            f'共{len(result)}行，含税总额 {pd.to_numeric(result["小计价税"], errors="coerce").sum():,.2f}，查询耗时{elapsed_ms:.0f}毫秒')
+        logging.info(f'历史查询 {self.historyFilterValues()}：{len(result)}行，耗时{elapsed_ms:.0f}毫秒')
+    
+    def runHistoryTrend(self):
+        store_path = load_history_store_config() or DEFAULT_STORE_PATH
+        if not os.path.exists(store_path):
+            self.history_status_label.setText(f'历史库不存在：{store_path}，请先处理收货明细')
+            return
+        
+        dimension = self.trend_dimension_combo.currentData()
+        filters = self.historyFilterValues()
+        try:
+            from receipt_store import ReceiptStore
+            start_time = datetime.now()
+            with ReceiptStore(store_path) as store:
+                trend = store.monthly_trend(dimension, 12, filters['month'], filters['supplier'])
+            elapsed_ms = (datetime.now() - start_time).total_seconds() * 1000
+        except Exception as e:
+            logging.error(f'月度趋势查询失败：{e}')
+            self.history_status_label.setText(f'查询失败：{e}')
+            return
+        
+        self.history_result = trend
+        self.history_result_title = f'{TREND_DIMENSIONS[dimension]}月度含税总额趋势'
+        self.history_model.set_data(trend)
+        self.history_export_button.setEnabled(not trend.empty)
+        self.history_status_label.setText(f'{self.history_result_title}：共{len(trend)}行，查询耗时{elapsed_ms:.0f}毫秒')
+        logging.info(f'{self.history_result_title}：{len(trend)}行，耗时{elapsed_ms:.0f}毫秒')
+    
+    def exportHistoryQuery(self):
+        if self.history_result is None or self.history_result.empty:
+            return
+        
+        default_name = f'历史查询_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+        output_file, _ = QFileDialog.getSaveFileName(self, '导出查询结果', default_name, 'Excel Files (*.xlsx)')
+        if not output_file:
+            return
+        
+        description = '，'.join(f'{key}={value}' for key, value in self.historyFilterValues().items() if value) or '全部'
+        try:
+            from recon_report import export_query_result, export_trend_report
+            company_name = load_company_name()
+            if self.history_result_title:
+                export_trend_report(self.history_result, output_file, self.history_result_title, company_name)
+            else:
+                export_query_result(self.history_result, output_file, description, company_name)
+            logging.info(f'查询结果已导出：{output_file}')
+            self.history_status_label.setText(f'查询结果已导出：{output_file}')
+        except Exception as e:
+            logging.error(f'导出查询结果失败：{e}')
+            error_box = QMessageBox(self)
+            error_box.setWindowTitle('错误')
+            error_box.setText(f'导出查询结果失败：{e}')
+            error_box.setIcon(QMessageBox.Critical)
+            error_box.exec_()
+    
     def selectFiles(self):
         # 尝试从上次的位置打开文件对话框
         last_dir = getattr(self, 'last_directory', '')
@@ -1113,18 +713,61 @@ class MainWindow(QMainWindow):
             warning_box.exec_()
             return
         
+        # 上次处理相同文件时中断，可以只生成剩余的对账单
+        resume = False
+        completed = resumable_reports(self.selected_files)
+        if completed:
+            question_box = QMessageBox(self)
+            question_box.setWindowTitle('继续上次的处理')
+            question_box.setText(f'上次处理这些文件时中断，已完成{completed}份对账单。\n\n'
+                                 f'是否继续上次的处理，只生成剩余的对账单？选择"否"将重新生成全部对账单。')
+            question_box.setIcon(QMessageBox.Question)
+            question_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+            question_box.setDefaultButton(QMessageBox.Yes)
+            resume = question_box.exec_() == QMessageBox.Yes
+        
         self.process_button.setEnabled(False)
         self.select_button.setEnabled(False)
         self.clear_button.setEnabled(False)
         self.progress_text.clear()
         self.progress_bar.setRange(0, 0)  # 设置进度条为忙碌状态
+        self.cancel_requested = False
+        self.cancel_button.setText('取消处理')
+        self.cancel_button.setEnabled(True)
         
-        # 创建并启动处理线程
-        self.process_thread = DataProcessThread(self.selected_files)
+        # 将文件交给已预加载引擎的子进程处理，处理线程只负责转发进度和日志
+        engine_process = self.engine_process or EngineProcess()
+        self.engine_process = None
+        self.process_thread = DataProcessThread(engine_process, self.selected_files, resume)
         self.process_thread.progress_signal.connect(self.updateProgress)
         self.process_thread.finished_signal.connect(self.processFinished)
         self.process_thread.start()
     
+    def cancelProcess(self):
+        """请求取消正在进行的处理，已完成的对账单保留，未完成的输出丢弃"""
+        if self.process_thread is None or not self.process_thread.isRunning():
+            return
+        self.cancel_requested = True
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.setText('正在取消...')
+        self.process_thread.engine_process.cancel()
+        logging.info('已请求取消处理，等待当前收货单或对账单完成')
+    
+    def prepareEngine(self):
+        """启动下一次处理使用的子进程，子进程启动后立即导入处理引擎"""
+        if self.engine_process is None:
+            self.engine_process = EngineProcess()
+        return self.engine_process
+    
+    def shutdownEngine(self):
+        """程序退出时结束处理子进程：空闲的子进程正常退出，正在处理的子进程强制结束"""
+        if self.engine_process is not None:
+            self.engine_process.close()
+            self.engine_process = None
+        if self.process_thread is not None and self.process_thread.isRunning():
+            self.process_thread.engine_process.terminate()
+            self.process_thread.wait()
+    
     def updateProgress(self, message):
         self.progress_text.append(message)
         # 滚动到底部
@@ -1138,6 +781,10 @@ class MainWindow(QMainWindow):
         self.process_button.setEnabled(True)
         self.select_button.setEnabled(True)
         self.clear_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.setText('取消处理')
+        # 每个子进程只处理一次，提前为下一次处理准备新的子进程
+        self.prepareEngine()
         
         if success:
             # 获取处理的统计信息
@@ -1147,9 +794,19 @@ class MainWindow(QMainWindow):
             if year_month_dirs:
                 latest_dir = max(year_month_dirs)  # 获取最新的年月目录
                 full_dir_path = os.path.join(supplier_dir, latest_dir)
-                supplier_files = [f for f in os.listdir(full_dir_path) if f.endswith('.xlsx') and not f.startswith('~$')]
+                supplier_files = [f for f in os.listdir(full_dir_path) if f.endswith('_对账明细.xlsx') and not f.startswith(('~$', '_'))]
+                consolidated_files = [f for f in os.listdir(full_dir_path) if f.startswith('全部供应商对账明细_')]
                 
-                stats_message = f'数据处理完成！\n\n处理结果:\n- 生成了{len(supplier_files)}个供应商对账单\n- 保存在目录: {full_dir_path}\n\n是否打开输出文件夹？'
+                if consolidated_files:
+                    result_text = f'- 生成了合并对账明细工作簿: {consolidated_files[0]}'
+                else:
+                    result_text = f'- 生成了{len(supplier_files)}个供应商对账单'
+                # 处理失败并已跳过的单元（见错误报告）
+                if error_msg:
+                    result_text += f'\n- {error_msg}'
+                stats_message = f'数据处理完成！\n\n处理结果:\n{result_text}\n- 保存在目录: {full_dir_path}\n\n是否打开输出文件夹？'
+            elif error_msg:
+                stats_message = f'数据处理完成！\n\n{error_msg}\n\n是否打开输出文件夹？'
             else:
                 stats_message = '数据处理完成！是否打开输出文件夹？'
             
@@ -1188,6 +845,14 @@ class MainWindow(QMainWindow):
             # 处理完成后自动清空文件列表
             self.clearFiles()
             logging.info('处理完成，界面已重置')
+        elif self.cancel_requested:
+            # 取消后保留文件列表，方便修改选择后重新处理
+            info_box = QMessageBox(self)
+            info_box.setWindowTitle('已取消')
+            info_box.setText(f'{error_msg}\n\n已完成的对账单保存在：{os.path.abspath("供应商对账明细")}')
+            info_box.setIcon(QMessageBox.Information)
+            info_box.exec_()
+            logging.info(error_msg)
         else:
             error_box = QMessageBox(self)
             error_box.setWindowTitle('错误')
@@ -1204,67 +869,11 @@ def ensure_directories():
             os.makedirs(directory)
             logging.info(f'创建目录: {directory}')
 
-def get_app_dir():
-    """获取应用程序所在目录，兼容打包后的exe和脚本运行模式"""
-    if getattr(sys, 'frozen', False):
-        # 如果是打包后的exe，使用sys.executable获取exe所在目录
-        app_dir = os.path.dirname(sys.executable)
-    else:
-        # 如果是脚本运行，使用脚本所在目录
-        app_dir = os.path.dirname(os.path.abspath(__file__))
-    return app_dir
-
-def get_config_path():
-    """获取配置文件路径"""
-    app_dir = get_app_dir()
-    config_path = os.path.join(app_dir, 'config.ini')
-    return config_path
-
-def ensure_config_file():
-    """确保配置文件存在，如果不存在则创建默认配置"""
-    config_path = get_config_path()
-    logging.info(f'配置文件路径: {config_path}')
-    
-    # 检查配置文件是否存在
-    if not os.path.exists(config_path):
-        logging.info('配置文件不存在，创建默认配置文件')
-        config = configparser.ConfigParser()
-        config['General'] = {
-            'company_name': 'HOTEL NAME'
-        }
-        
-        # 添加默认列号配置
-        config['Columns'] = {
-            'receipt_column': 'A',          # 收货单号 - Receipt Number Column
-            'supplier_column': 'D',         # 供应商名称 - Supplier Column
-            'date_column': 'X',             # 收货日期 - Date Column
-            'product_name_column': 'A',     # 商品名称 Article - Product Name Column
-            'quantity_column': 'I',         # 实收数量 Received Quantity Column
-            'unit_column': 'J',             # 基本单位 Basic Unit Column
-            'unit_price_column': 'N',       # 单价 Price Column
-            'subtotal_column': 'Z',         # 小计金额 Subtotal Column
-            'tax_amount_column': 'AE',      # 税额 Tax Column
-            'total_amount_column': 'AI',    # 小计价税列 Total Amount Column
-            'department_column': 'AL'       # 部门列 Department Column
-        }
-        
-        # 写入配置文件
-        try:
-            with open(config_path, 'w', encoding='utf-8') as configfile:
-                config.write(configfile)
-            logging.info('默认配置文件创建成功，包含列号配置')
-        except Exception as e:
-            logging.error(f'创建配置文件失败: {e}')
-    else:
-        logging.info('配置文件已存在')
-    
-    return config_path
-
 def check_expiration():
     """
     检查程序是否过期
     
-    检查当前日期是否超过2025年12月31日。
+    检查当前日期是否超过有效期EXPIRATION_DATE。
     如果超过，则返回False，表示程序已过期；否则返回True。
     
     Returns:
@@ -1272,16 +881,279 @@ def check_expiration():
     """
     # 获取当前日期
     current_date = datetime.now()
-    # 设置过期日期为2025年12月31日
-    expiration_date = datetime(2026, 12, 31)
     
-    # 如果当前日期超过了2025年12月31日，则程序已过期
-    if current_date > expiration_date:
+    # 如果当前日期超过了有效期，则程序已过期
+    if current_date > EXPIRATION_DATE:
         return False
         
     return True
 
+def run_query_cli(argv):
+    """命令行查询历史收货明细库，可选导出为Excel"""
+    parser = argparse.ArgumentParser(prog='MC_Recon_UI query', description='查询历史收货明细库')
+    parser.add_argument('--supplier', help='供应商名称，支持*通配符')
+    parser.add_argument('--month', help='收货月份，格式YYYYMM')
+    parser.add_argument('--article', help='商品名称，支持*通配符')
+    parser.add_argument('--department', help='成本中心，支持*通配符')
+    parser.add_argument('--limit', type=int, help='最多返回的行数')
+    parser.add_argument('--export', metavar='FILE', help='将查询结果导出到Excel文件')
+    parser.add_argument('--db', help='历史库路径，默认读取config.ini')
+    args = parser.parse_args(argv)
+    
+    store_path = args.db or load_history_store_config() or DEFAULT_STORE_PATH
+    if not os.path.exists(store_path):
+        print(f'历史库不存在：{store_path}')
+        return 1
+    
+    import pandas as pd
+    from receipt_store import ReceiptStore
+    from recon_report import export_query_result
+    
+    filters = {'supplier': args.supplier, 'month': args.month, 'article': args.article, 'department': args.department}
+    start_time = datetime.now()
+    with ReceiptStore(store_path) as store:
+        result = store.query_receipts(limit=args.limit, **filters)
+    elapsed_ms = (datetime.now() - start_time).total_seconds() * 1000
+    
+    with pd.option_context('display.max_rows', 50, 'display.width', 200):
+        print(result.to_string(max_rows=50) if not result.empty else '没有符合条件的记录')
+    print(f'共{len(result)}行，查询耗时{elapsed_ms:.0f}毫秒')
+    
+    if args.export:
+        description = '，'.join(f'{key}={value}' for key, value in filters.items() if value) or '全部'
+        export_query_result(result, args.export, description, load_company_name())
+        print(f'查询结果已导出：{args.export}')
+    return 0
+
+def run_trend_cli(argv):
+    """命令行输出月度汇总表中的含税总额趋势，可选导出为Excel"""
+    parser = argparse.ArgumentParser(prog='MC_Recon_UI trend', description='按月汇总的含税总额趋势')
+    parser.add_argument('--by', choices=list(TREND_DIMENSIONS), default='supplier', help='汇总维度')
+    parser.add_argument('--months', type=int, default=12, help='包含的月份数')
+    parser.add_argument('--end-month', help='截止月份，格式YYYYMM，默认为最新月份')
+    parser.add_argument('--supplier', help='只看指定供应商，支持*通配符')
+    parser.add_argument('--export', metavar='FILE', help='将趋势导出到Excel文件')
+    parser.add_argument('--db', help='历史库路径，默认读取config.ini')
+    args = parser.parse_args(argv)
+    
+    store_path = args.db or load_history_store_config() or DEFAULT_STORE_PATH
+    if not os.path.exists(store_path):
+        print(f'历史库不存在：{store_path}')
+        return 1
+    
+    import pandas as pd
+    from receipt_store import ReceiptStore
+    from recon_report import export_trend_report
+    
+    start_time = datetime.now()
+    with ReceiptStore(store_path) as store:
+        trend = store.monthly_trend(args.by, args.months, args.end_month, args.supplier)
+    elapsed_ms = (datetime.now() - start_time).total_seconds() * 1000
+    
+    with pd.option_context('display.width', 200, 'display.float_format', '{:,.2f}'.format):
+        print(trend.to_string(max_rows=50) if not trend.empty else '没有汇总数据')
+    print(f'共{len(trend)}行，查询耗时{elapsed_ms:.0f}毫秒')
+    
+    if args.export:
+        title = f'{TREND_DIMENSIONS[args.by]}月度含税总额趋势'
+        export_trend_report(trend, args.export, title, load_company_name())
+        print(f'趋势已导出：{args.export}')
+    return 0
+
+def run_template_cli(argv):
+    """命令行导出内置对账单模板，修改样式后在config.ini的[Report]中配置为自定义模板"""
+    parser = argparse.ArgumentParser(prog='MC_Recon_UI template', description='导出内置对账单模板')
+    parser.add_argument('output', help='模板文件路径（.xlsx）')
+    args = parser.parse_args(argv)
+    
+    from recon_report import build_default_template
+    build_default_template().save(args.output)
+    print(f'对账单模板已导出：{args.output}')
+    print('可修改字体、颜色、列宽、页面设置等样式；标题中的占位符（如{供应商名称}、{净额:,.2f}）在生成时替换，'
+          '模板的最后一行为表头')
+    return 0
+
+def run_backup_cli(argv):
+    """命令行查看备份，或将备份按需导出为Excel"""
+    parser = argparse.ArgumentParser(prog='MC_Recon_UI backup', description='查看或导出清洗后数据的备份')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='列出bak目录中的备份')
+    export_parser = subparsers.add_parser('export', help='将备份导出为Excel')
+    export_parser.add_argument('backup', help='备份文件路径或内容哈希（可以只写前几位）')
+    export_parser.add_argument('output', help='导出的Excel文件路径')
+    args = parser.parse_args(argv)
+    
+    from recon_backup import export_backup_to_excel, find_backup, list_backups
+    if args.command == 'list':
+        for path in list_backups('bak'):
+            modified = datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y-%m-%d %H:%M:%S')
+            print(f'{modified}  {os.path.getsize(path) / 1024:>10.1f}KB  {os.path.basename(path)}')
+        return 0
+    
+    backup_file = find_backup('bak', args.backup)
+    if backup_file is None:
+        print(f'找不到唯一匹配的备份：{args.backup}')
+        return 1
+    export_backup_to_excel(backup_file, args.output)
+    print(f'备份已导出：{args.output}')
+    return 0
+
+def configure_logging():
+    """日志同时写入logs目录下的文件和控制台"""
+    log_filename = os.path.join('logs', f'app_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_filename, encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
+
+def run_resume_cli():
+    """命令行从运行检查点续跑上次中断的处理，只生成剩余的对账单，不启动界面"""
+    header, completed = read_checkpoint()
+    if header is None:
+        print('没有可以续跑的运行检查点')
+        return 1
+    missing = [input_file for input_file in header['input_files'] if not os.path.exists(input_file)]
+    if missing:
+        print(f'输入文件不存在：{"，".join(missing)}')
+        return 1
+    
+    if not os.path.exists('logs'):
+        os.makedirs('logs')
+    configure_logging()
+    ensure_directories()
+    ensure_config_file()
+    print(f'从运行检查点续跑（{header.get("started")}开始），共{len(header["input_files"])}个文件，'
+          f'已完成{len(completed)}份对账单')
+    from recon_engine import ReconEngine
+    success, error_msg = ReconEngine(header['input_files'], resume=True).run()
+    print('处理完成' if success else error_msg)
+    return 0 if success else 1
+
+def run_watch_cli(argv):
+    """命令行监视输入文件夹：新的收货明细写入完成后自动增量处理，不启动界面，Ctrl+C退出"""
+    watch_config = load_watch_config()
+    parser = argparse.ArgumentParser(prog='MC_Recon_UI watch', description='监视输入文件夹并自动增量处理')
+    parser.add_argument('--folder', default=watch_config['folder'], help='监视的输入文件夹，默认读取config.ini')
+    parser.add_argument('--interval', type=float, default=watch_config['poll_seconds'], help='检查新文件的间隔（秒）')
+    parser.add_argument('--settle', type=float, default=watch_config['settle_seconds'],
+                        help='文件多久不再变化视为写入完成（秒）')
+    parser.add_argument('--once', action='store_true', help='处理文件夹中现有的新文件后退出')
+    args = parser.parse_args(argv)
+    
+    if not os.path.exists('logs'):
+        os.makedirs('logs')
+    configure_logging()
+    ensure_directories()
+    ensure_config_file()
+    from recon_watch import WatchService
+    service = WatchService(args.folder, watch_config['parse_cache'], args.interval, args.settle)
+    try:
+        service.run(once=args.once)
+    except KeyboardInterrupt:
+        logging.info('已停止监视文件夹')
+    return 0
+
+def run_serve_cli(argv):
+    """命令行启动本地任务服务（HTTP接口，只监听127.0.0.1），不启动界面，Ctrl+C退出"""
+    service_config = load_service_config()
+    parser = argparse.ArgumentParser(prog='MC_Recon_UI serve', description='本地任务服务：提交收货明细、查询任务状态、下载对账单')
+    parser.add_argument('--port', type=int, default=service_config['port'], help='监听端口，默认读取config.ini')
+    parser.add_argument('--workers', type=int, default=service_config['workers'], help='同时运行的任务数')
+    parser.add_argument('--root', default=service_config['root'], help='任务队列数据库和任务目录')
+    args = parser.parse_args(argv)
+    
+    if not os.path.exists('logs'):
+        os.makedirs('logs')
+    configure_logging()
+    ensure_config_file()
+    from recon_service import serve
+    serve(args.root, args.port, args.workers)
+    return 0
+
+def run_batch_cli(argv):
+    """命令行集团批量处理：按config.ini中的[Property:名称]配置段依次处理多个物业，共用进程池和解析缓存"""
+    parser = argparse.ArgumentParser(prog='MC_Recon_UI batch', description='集团批量处理多个物业')
+    parser.add_argument('--property', action='append', dest='properties', metavar='NAME',
+                        help='只处理指定的物业，可以指定多次，默认处理全部物业')
+    parser.add_argument('--no-cache', action='store_true', help='不使用解析缓存')
+    args = parser.parse_args(argv)
+    
+    if not os.path.exists('logs'):
+        os.makedirs('logs')
+    configure_logging()
+    ensure_config_file()
+    profiles = load_property_profiles()
+    if args.properties:
+        unknown = set(args.properties) - {profile.name for profile in profiles}
+        if unknown:
+            print(f'配置文件中没有这些物业：{"、".join(sorted(unknown))}')
+            return 2
+        profiles = [profile for profile in profiles if profile.name in args.properties]
+    if not profiles:
+        print('配置文件中没有物业配置段，请添加 [Property:物业名称]')
+        return 2
+    
+    from recon_batch import BatchRun
+    batch = BatchRun(profiles, cache_dir=None if args.no_cache else load_watch_config()['parse_cache'])
+    success, error_msg = batch.run()
+    for name, property_success, property_msg, summary in batch.results:
+        status = '成功' if property_success else '失败'
+        print(f'{name}：{status}' + (f'，{summary["rows"]}行，{summary["reports"]}份对账单' if summary else '')
+              + (f'，{property_msg}' if property_msg else ''))
+    return 0 if success else 1
+
+class StartupProfile:
+    """启动耗时统计：记录各阶段完成的时间，--profile-startup 时在界面首次显示后输出并退出"""
+    
+    def __init__(self):
+        self.checkpoints = [('导入模块', IMPORTS_DONE_TIME)]
+    
+    def mark(self, name):
+        self.checkpoints.append((name, time.perf_counter()))
+    
+    @property
+    def elapsed(self):
+        return self.checkpoints[-1][1] - STARTUP_TIME
+    
+    def report(self):
+        lines = ['启动耗时统计：']
+        previous = STARTUP_TIME
+        for name, moment in self.checkpoints:
+            lines.append(f'  {name}：{(moment - previous) * 1000:.0f}毫秒（累计{(moment - STARTUP_TIME) * 1000:.0f}毫秒）')
+            previous = moment
+        return '\n'.join(lines)
+
 def main():
+    # 命令行子命令：query 查询历史收货明细库，trend 查看月度趋势，template 导出对账单模板，
+    # backup 查看或导出备份，watch 监视文件夹自动处理，serve 启动本地任务服务，batch 集团批量处理，不启动界面
+    if len(sys.argv) > 1 and sys.argv[1] == 'query':
+        sys.exit(run_query_cli(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'trend':
+        sys.exit(run_trend_cli(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'template':
+        sys.exit(run_template_cli(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'backup':
+        sys.exit(run_backup_cli(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'watch':
+        sys.exit(run_watch_cli(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        sys.exit(run_serve_cli(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        sys.exit(run_batch_cli(sys.argv[2:]))
+    # --resume：从运行检查点续跑上次中断的处理
+    if '--resume' in sys.argv[1:]:
+        sys.exit(run_resume_cli())
+    
+    # --profile-startup：输出启动各阶段耗时后退出，用于排查启动慢的问题
+    profile_startup = '--profile-startup' in sys.argv
+    if profile_startup:
+        sys.argv.remove('--profile-startup')
+    profile = StartupProfile()
+    
     try:
         # 确保必要的目录存在
         ensure_directories()
@@ -1290,21 +1162,16 @@ def main():
         config_path = ensure_config_file()
         
         # 配置日志
-        log_filename = os.path.join('logs', f'app_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_filename, encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        configure_logging()
+        profile.mark('读取配置')
         
         app = QApplication(sys.argv)
+        profile.mark('创建QApplication')
         # 导入资源文件并设置全局窗口图标
         import resources
         icon = QIcon(':/icons/app_icon')
         app.setWindowIcon(icon)
+        profile.mark('加载图标资源')
         
         # 确保任务栏图标与应用程序图标一致（Windows平台特定）
         if sys.platform == 'win32':
@@ -1325,8 +1192,24 @@ def main():
             logging.info('程序版本检查通过')
         
         window = MainWindow()
+        profile.mark('创建主窗口')
         window.show()
-        logging.info('应用程序启动成功')
+        app.aboutToQuit.connect(window.shutdownEngine)
+        
+        def on_first_shown():
+            profile.mark('首次显示界面')
+            logging.info(f'应用程序启动成功，耗时{profile.elapsed:.2f}秒')
+            engine_process = window.prepareEngine()
+            if profile_startup:
+                engine_process.wait_ready()
+                profile.mark('启动处理子进程并预加载引擎')
+                report = profile.report()
+                print(report)
+                logging.info(report)
+                app.quit()
+        
+        # 事件循环开始处理后（窗口已绘制）才记录首次显示并启动处理子进程
+        QTimer.singleShot(0, on_first_shown)
         sys.exit(app.exec_())
     except Exception as e:
         logging.error(f'应用程序启动失败: {e}')
@@ -1338,4 +1221,6 @@ def main():
         sys.exit(1)
 
 if __name__ == '__main__':
+    # 打包后的程序在子进程中运行处理引擎和进程池任务时需要
+    multiprocessing.freeze_support()
     main()
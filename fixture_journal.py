@@ -0,0 +1,41 @@
+from openpyxl import Workbook
+
+# 测试脚本使用的收货明细表：与ERP导出的格式相同（默认列配置），前8行为抬头，第9行为表头，数据从第10行开始
+
+# 明细各字段所在的列（Excel列号从1开始）：商品名称、实收数量、基本单位、单价、小计金额、税额、小计价税、部门
+DETAIL_COLUMNS = (1, 9, 10, 14, 26, 31, 35, 38)
+
+
+def write_journal(target, receipts, header=None, preamble_rows=8, inserted_columns=0):
+    """写入收货明细表，target 为文件路径或文件对象
+
+    receipts 为 (收货单号, 供应商, 收货日期, 明细列表) 的列表，每条明细为
+    (商品名称, 实收数量, 基本单位, 单价, 小计金额, 税额, 小计价税[, 部门])；收货单之间插入分页行。
+    header 为表头行的 {列号: 表头文字}（列号从1开始，不计插入的列），写在抬头之后的一行，默认为空行。
+    inserted_columns 模拟ERP在A列之后插入的列数，B列及之后的数据和表头相应右移。
+    """
+    def column_of(column):
+        return column + inserted_columns if column > 1 else column
+
+    wb = Workbook()
+    ws = wb.active
+    for row in range(1, preamble_rows + 1):
+        ws.cell(row=row, column=1, value=f'preamble {row}')
+    header_row = preamble_rows + 1
+    for column, text in (header or {}).items():
+        ws.cell(row=header_row, column=column_of(column), value=text)
+    row = header_row + 1
+    for page, (receipt, supplier, date, details) in enumerate(receipts, 1):
+        ws.cell(row=row, column=1, value=receipt)
+        ws.cell(row=row, column=column_of(4), value=supplier)
+        ws.cell(row=row, column=column_of(24), value=date)
+        row += 1
+        for detail in details:
+            if len(detail) == 7:
+                detail = tuple(detail) + ('Kitchen 厨房',)
+            for column, value in zip(DETAIL_COLUMNS, detail):
+                ws.cell(row=row, column=column_of(column), value=value)
+            row += 1
+        ws.cell(row=row, column=1, value=f'Page {page}')
+        row += 1
+    wb.save(target)
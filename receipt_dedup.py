@@ -0,0 +1,122 @@
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+# 参与明细指纹计算的列（收货单号、供应商和日期单独比较）
+LINE_COLUMNS = ['商品名称', '实收数量', '基本单位', '单价', '小计金额', '税额', '小计价税', '部门']
+NUMERIC_LINE_COLUMNS = ['实收数量', '单价', '小计金额', '税额', '小计价税']
+
+# 重复类型
+EXACT_DUPLICATE = '完全重复（已删除）'
+CONFLICTING_DUPLICATE = '内容冲突（已保留）'
+HISTORY_CONFLICT = '与历史库冲突（已保留）'
+
+
+def receipt_fingerprints(file_df):
+    """计算每张收货单的指纹：供应商、日期、明细行数和明细内容哈希
+
+    每行明细先整体哈希，再按收货单累加（uint64溢出回绕，即按2^64取模），
+    结果与明细行顺序无关，全程向量化计算。
+
+    Returns:
+        DataFrame: 以收货单号为索引，包含 供应商名称、收货日期、行数、内容哈希
+    """
+    # 数值统一为浮点数再转文本，避免不同文件中 10 和 10.0 的写法差异影响哈希
+    lines = file_df[LINE_COLUMNS].copy()
+    for column in NUMERIC_LINE_COLUMNS:
+        lines[column] = pd.to_numeric(lines[column], errors='coerce').astype(float).round(6)
+    line_hashes = pd.util.hash_pandas_object(lines.astype(str), index=False).to_numpy()
+    codes, receipts = pd.factorize(file_df['收货单号'].astype(str), sort=False)
+
+    content_hashes = np.zeros(len(receipts), dtype=np.uint64)
+    np.add.at(content_hashes, codes, line_hashes)
+    line_counts = np.bincount(codes, minlength=len(receipts))
+
+    # 每张收货单的供应商和日期取第一行，缺失值统一为None便于比较
+    first_rows = file_df.iloc[np.unique(codes, return_index=True)[1]]
+    suppliers = first_rows['供应商名称'].astype(object).where(first_rows['供应商名称'].notna(), None).to_numpy()
+    dates = first_rows['收货日期'].astype(object).where(first_rows['收货日期'].notna(), None).to_numpy()
+
+    return pd.DataFrame({
+        '供应商名称': suppliers,
+        '收货日期': dates,
+        '行数': line_counts,
+        '内容哈希': [format(int(value), '016x') for value in content_hashes]
+    }, index=pd.Index(receipts, name='收货单号'))
+
+
+class ReceiptDedupIndex:
+    """跨文件的收货单哈希索引
+
+    以收货单号为键记录首次出现的收货单指纹。同一收货单号再次出现时：
+    供应商、日期和明细内容都相同的视为完全重复并删除；否则视为冲突，保留数据并记录到重复报告。
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.findings = []
+
+    def add_file(self, file_df, source_file):
+        """登记一个文件的收货单，返回删除完全重复收货单后的数据"""
+        if file_df.empty:
+            return file_df
+
+        fingerprints = receipt_fingerprints(file_df)
+        source_name = os.path.basename(source_file)
+        duplicate_receipts = []
+
+        for receipt, supplier, date, line_count, content_hash in fingerprints.itertuples(name=None):
+            signature = (supplier, date, content_hash)
+            first = self.index.get(receipt)
+            if first is None:
+                self.index[receipt] = {'signature': signature, 'line_count': line_count, 'source_file': source_name}
+                continue
+
+            if first['signature'] == signature:
+                kind = EXACT_DUPLICATE
+                duplicate_receipts.append(receipt)
+            else:
+                kind = CONFLICTING_DUPLICATE
+            self.findings.append({
+                '收货单号': receipt,
+                '类型': kind,
+                '供应商名称': supplier,
+                '收货日期': date,
+                '行数': line_count,
+                '来源文件': source_name,
+                '首次出现文件': first['source_file'],
+                '首次出现供应商': first['signature'][0],
+                '首次出现日期': first['signature'][1],
+                '首次出现行数': first['line_count']
+            })
+
+        if duplicate_receipts:
+            logging.warning(f'{source_name} 中有{len(duplicate_receipts)}张收货单与已读取的文件完全重复，已删除')
+            file_df = file_df[~file_df['收货单号'].astype(str).isin(duplicate_receipts)]
+        return file_df
+
+    def check_history(self, store):
+        """与历史库中已保存的收货单指纹比对，只报告内容不一致的收货单（重复导入相同数据是正常的）"""
+        stored = store.receipt_fingerprints(list(self.index))
+        for receipt, (supplier, date, content_hash, line_count, imported_at) in stored.items():
+            current = self.index[receipt]
+            if current['signature'] == (supplier, date, content_hash):
+                continue
+            self.findings.append({
+                '收货单号': receipt,
+                '类型': HISTORY_CONFLICT,
+                '供应商名称': current['signature'][0],
+                '收货日期': current['signature'][1],
+                '行数': current['line_count'],
+                '来源文件': current['source_file'],
+                '首次出现文件': f'历史库（{imported_at}导入）',
+                '首次出现供应商': supplier,
+                '首次出现日期': date,
+                '首次出现行数': line_count
+            })
+
+    def report(self):
+        """返回重复收货单报告数据"""
+        return pd.DataFrame(self.findings)
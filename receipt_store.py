@@ -0,0 +1,399 @@
+import os
+import sqlite3
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from receipt_dedup import receipt_fingerprints
+from recon_config import DEFAULT_STORE_PATH
+
+# 清洗后数据列与数据库字段的对应关系
+COLUMN_MAPPING = {
+    '收货单号': 'receipt_no',
+    '收货日期': 'receipt_date',
+    '供应商名称': 'supplier',
+    '商品名称': 'article',
+    '实收数量': 'quantity',
+    '基本单位': 'unit',
+    '单价': 'unit_price',
+    '小计金额': 'net_amount',
+    '税额': 'tax_amount',
+    '税率': 'tax_rate',
+    '小计价税': 'gross_amount',
+    '部门': 'department'
+}
+
+NUMERIC_COLUMNS = ['实收数量', '单价', '小计金额', '税额', '税率', '小计价税']
+
+# 写入明细表的字段顺序，与 prepare_rows 生成的元组一致
+INSERT_COLUMNS = ['receipt_no', 'line_no'] + list(COLUMN_MAPPING.values())[1:] + ['imported_at']
+
+# 查询结果的列顺序，与清洗后数据一致
+RESULT_COLUMNS = ['收货单号', '收货日期', '商品名称', '实收数量', '基本单位',
+                  '单价', '小计金额', '税额', '税率', '小计价税', '部门', '供应商名称']
+
+# 月度汇总表的计算语句，{source} 为全部明细或只含受影响的供应商/部门月份的明细
+ROLLUP_SELECTS = {
+    'supplier': """SELECT r.supplier, substr(r.receipt_date, 1, 7) AS month,
+            COUNT(DISTINCT r.receipt_no), COUNT(*), SUM(r.net_amount), SUM(r.tax_amount), SUM(r.gross_amount)
+        FROM {source}
+        WHERE r.supplier IS NOT NULL AND r.receipt_date IS NOT NULL
+        GROUP BY r.supplier, month""",
+    'article': """SELECT r.supplier, COALESCE(r.article, ''), substr(r.receipt_date, 1, 7) AS month,
+            SUM(r.quantity), COUNT(*), SUM(r.net_amount), SUM(r.tax_amount), SUM(r.gross_amount)
+        FROM {source}
+        WHERE r.supplier IS NOT NULL AND r.receipt_date IS NOT NULL
+        GROUP BY r.supplier, month, COALESCE(r.article, '')""",
+    'department': """SELECT r.department, substr(r.receipt_date, 1, 7) AS month,
+            COUNT(*), SUM(r.net_amount), SUM(r.tax_amount), SUM(r.gross_amount)
+        FROM {source}
+        WHERE r.department IS NOT NULL AND r.receipt_date IS NOT NULL
+        GROUP BY r.department, month"""
+}
+
+ALL_RECEIPTS = 'receipts r'
+
+# 只取受影响键的明细：以受影响键为外层循环（CROSS JOIN 固定连接顺序），按 (供应商/部门, 日期) 索引定位明细
+AFFECTED_RECEIPTS = """temp.affected_keys a CROSS JOIN receipts r
+            ON a.kind = '{kind}' AND r.{kind} = a.key
+            AND r.receipt_date >= a.month || '-01' AND r.receipt_date < date(a.month || '-01', '+1 month')"""
+
+# 汇总维度对应的汇总表和键字段
+ROLLUP_TABLES = {
+    'supplier': ('rollup_supplier_month', ['supplier']),
+    'article': ('rollup_supplier_article_month', ['supplier', 'article']),
+    'department': ('rollup_department_month', ['department'])
+}
+
+# 数据库结构迁移脚本，按版本号顺序执行，版本号记录在 PRAGMA user_version 中
+MIGRATIONS = [
+    (1, [
+        """CREATE TABLE receipts (
+            receipt_no TEXT NOT NULL,
+            line_no INTEGER NOT NULL,
+            receipt_date TEXT,
+            supplier TEXT,
+            article TEXT,
+            quantity REAL,
+            unit TEXT,
+            unit_price REAL,
+            net_amount REAL,
+            tax_amount REAL,
+            tax_rate REAL,
+            gross_amount REAL,
+            department TEXT,
+            imported_at TEXT NOT NULL,
+            PRIMARY KEY (receipt_no, line_no)
+        )""",
+        'CREATE INDEX idx_receipts_supplier ON receipts (supplier, receipt_date)',
+        'CREATE INDEX idx_receipts_date ON receipts (receipt_date)',
+        'CREATE INDEX idx_receipts_article ON receipts (article)',
+        'CREATE INDEX idx_receipts_department ON receipts (department, receipt_date)',
+    ]),
+    (2, [
+        """CREATE TABLE rollup_supplier_month (
+            supplier TEXT NOT NULL,
+            month TEXT NOT NULL,
+            receipt_count INTEGER NOT NULL,
+            line_count INTEGER NOT NULL,
+            net_amount REAL,
+            tax_amount REAL,
+            gross_amount REAL,
+            PRIMARY KEY (supplier, month)
+        )""",
+        """CREATE TABLE rollup_supplier_article_month (
+            supplier TEXT NOT NULL,
+            article TEXT NOT NULL,
+            month TEXT NOT NULL,
+            quantity REAL,
+            line_count INTEGER NOT NULL,
+            net_amount REAL,
+            tax_amount REAL,
+            gross_amount REAL,
+            PRIMARY KEY (supplier, month, article)
+        )""",
+        """CREATE TABLE rollup_department_month (
+            department TEXT NOT NULL,
+            month TEXT NOT NULL,
+            line_count INTEGER NOT NULL,
+            net_amount REAL,
+            tax_amount REAL,
+            gross_amount REAL,
+            PRIMARY KEY (department, month)
+        )""",
+        'CREATE INDEX idx_rollup_supplier_month_month ON rollup_supplier_month (month)',
+        'CREATE INDEX idx_rollup_supplier_article_month_month ON rollup_supplier_article_month (month)',
+        'CREATE INDEX idx_rollup_department_month_month ON rollup_department_month (month)',
+        # 用已有明细初始化汇总表
+        'INSERT INTO rollup_supplier_month ' + ROLLUP_SELECTS['supplier'].format(source=ALL_RECEIPTS),
+        'INSERT INTO rollup_supplier_article_month ' + ROLLUP_SELECTS['article'].format(source=ALL_RECEIPTS),
+        'INSERT INTO rollup_department_month ' + ROLLUP_SELECTS['department'].format(source=ALL_RECEIPTS),
+    ]),
+    (3, [
+        # 收货单指纹，用于与历史数据比对重复收货单；历史数据在下次导入时补齐
+        """CREATE TABLE receipt_fingerprints (
+            receipt_no TEXT PRIMARY KEY,
+            supplier TEXT,
+            receipt_date TEXT,
+            content_hash TEXT NOT NULL,
+            line_count INTEGER NOT NULL,
+            imported_at TEXT NOT NULL
+        )""",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def parse_month(month_text):
+    """将 202507、2025-07 或 2025/07 格式的月份转换为该月第一天和下月第一天的日期字符串"""
+    digits = ''.join(char for char in str(month_text) if char.isdigit())
+    if len(digits) != 6:
+        raise ValueError(f'无效的月份: {month_text}，请使用YYYYMM格式')
+    month_start = pd.Timestamp(year=int(digits[:4]), month=int(digits[4:]), day=1)
+    next_month_start = month_start + pd.DateOffset(months=1)
+    return month_start.strftime('%Y-%m-%d'), next_month_start.strftime('%Y-%m-%d')
+
+
+def match_condition(column, value):
+    """生成筛选条件：包含*或%时按通配符匹配，否则精确匹配（可使用索引）"""
+    value = str(value).strip()
+    if '*' in value or '%' in value:
+        return f'{column} LIKE ?', value.replace('*', '%')
+    return f'{column} = ?', value
+
+
+class ReceiptStore:
+    """本地历史收货明细库（SQLite），按收货单号和行号去重保存每次运行清洗后的数据"""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        store_dir = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(store_dir):
+            os.makedirs(store_dir)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.migrate()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def schema_version(self):
+        return self.conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def migrate(self):
+        """将数据库结构升级到最新版本"""
+        current_version = self.schema_version()
+        if current_version > SCHEMA_VERSION:
+            raise RuntimeError(f'历史库版本({current_version})高于程序支持的版本({SCHEMA_VERSION})，请更新程序')
+
+        for version, statements in MIGRATIONS:
+            if version <= current_version:
+                continue
+            with self.conn:
+                for statement in statements:
+                    self.conn.execute(statement)
+                # PRAGMA 不支持参数绑定，版本号来自常量
+                self.conn.execute(f'PRAGMA user_version = {version}')
+            logging.info(f'历史库结构已升级到版本 {version}')
+
+    def prepare_rows(self, final_df):
+        """将清洗后的数据转换为可直接写入数据库的元组列表"""
+        df = final_df[list(COLUMN_MAPPING)].copy()
+
+        # 行号为明细在收货单内的顺序，与收货单号一起构成主键
+        line_numbers = df.groupby('收货单号', sort=False).cumcount() + 1
+
+        for column in NUMERIC_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors='coerce').replace([np.inf, -np.inf], np.nan)
+        df = df.astype(object).where(df.notna(), None)
+        df['收货单号'] = df['收货单号'].map(lambda value: None if value is None else str(value))
+
+        imported_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = []
+        for line_no, values in zip(line_numbers.tolist(), df.itertuples(index=False, name=None)):
+            rows.append((values[0], line_no) + tuple(values[1:]) + (imported_at,))
+        return rows
+
+    def upsert_receipts(self, final_df):
+        """写入或更新清洗后的收货明细，重复导入同一批数据结果不变
+
+        Returns:
+            int: 写入的行数
+        """
+        if final_df.empty:
+            return 0
+
+        rows = self.prepare_rows(final_df)
+        placeholders = ', '.join('?' for _ in INSERT_COLUMNS)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in INSERT_COLUMNS[2:])
+        sql = (f'INSERT INTO receipts ({", ".join(INSERT_COLUMNS)}) VALUES ({placeholders}) '
+               f'ON CONFLICT (receipt_no, line_no) DO UPDATE SET {updates}')
+
+        fingerprints = receipt_fingerprints(final_df)
+        imported_at = rows[0][-1]
+        fingerprint_rows = [(receipt, supplier, date, content_hash, int(line_count), imported_at)
+                            for receipt, supplier, date, line_count, content_hash in fingerprints.itertuples(name=None)]
+
+        # 所有行在同一个事务内批量写入，并增量更新受影响的月度汇总
+        with self.conn:
+            self.collect_affected_keys(rows, before_upsert=True)
+            # 更正后行数变少的收货单：删除多出的旧明细行（其供应商和部门月份已记入受影响的键）
+            self.conn.execute("""DELETE FROM receipts
+                WHERE receipt_no IN (SELECT receipt_no FROM temp.incoming_receipts)
+                AND line_no > (SELECT i.line_count FROM temp.incoming_receipts i WHERE i.receipt_no = receipts.receipt_no)""")
+            self.conn.executemany(sql, rows)
+            self.conn.executemany('INSERT OR REPLACE INTO receipt_fingerprints VALUES (?, ?, ?, ?, ?, ?)', fingerprint_rows)
+            self.collect_affected_keys(rows, before_upsert=False)
+            self.refresh_rollups()
+        return len(rows)
+
+    def receipt_fingerprints(self, receipt_numbers):
+        """按收货单号查询已保存的收货单指纹
+
+        Returns:
+            dict: 收货单号 -> (供应商, 收货日期, 内容哈希, 行数, 导入时间)
+        """
+        result = {}
+        receipt_numbers = list(receipt_numbers)
+        # 分批查询，避免超出SQLite的参数个数限制
+        for start in range(0, len(receipt_numbers), 500):
+            batch = receipt_numbers[start:start + 500]
+            placeholders = ', '.join('?' for _ in batch)
+            for row in self.conn.execute(
+                    f'SELECT receipt_no, supplier, receipt_date, content_hash, line_count, imported_at '
+                    f'FROM receipt_fingerprints WHERE receipt_no IN ({placeholders})', batch):
+                result[row[0]] = row[1:]
+        return result
+
+    def collect_affected_keys(self, rows, before_upsert):
+        """记录本批数据涉及的 (供应商/部门, 月份)
+
+        写入前查询库中同一收货单号的原有键，避免收货单改了供应商或日期后旧月份的汇总未被更新。
+        """
+        self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS affected_keys (kind TEXT, key TEXT, month TEXT, '
+                          'PRIMARY KEY (kind, key, month))')
+        if before_upsert:
+            self.conn.execute('DELETE FROM temp.affected_keys')
+            # 本批每张收货单的行数（最大行号），写入时删除库中行号更大的旧明细
+            line_counts = {}
+            for row in rows:
+                line_counts[row[0]] = max(line_counts.get(row[0], 0), row[1])
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS incoming_receipts (receipt_no TEXT PRIMARY KEY, '
+                              'line_count INTEGER)')
+            self.conn.execute('DELETE FROM temp.incoming_receipts')
+            self.conn.executemany('INSERT OR IGNORE INTO temp.incoming_receipts VALUES (?, ?)', sorted(line_counts.items()))
+            for kind in ('supplier', 'department'):
+                self.conn.execute(f"""INSERT OR IGNORE INTO temp.affected_keys
+                    SELECT DISTINCT '{kind}', r.{kind}, substr(r.receipt_date, 1, 7)
+                    FROM receipts r JOIN temp.incoming_receipts i ON r.receipt_no = i.receipt_no
+                    WHERE r.{kind} IS NOT NULL AND r.receipt_date IS NOT NULL""")
+        else:
+            date_pos = INSERT_COLUMNS.index('receipt_date')
+            supplier_pos = INSERT_COLUMNS.index('supplier')
+            department_pos = INSERT_COLUMNS.index('department')
+            keys = set()
+            for row in rows:
+                if row[date_pos]:
+                    month = str(row[date_pos])[:7]
+                    if row[supplier_pos] is not None:
+                        keys.add(('supplier', row[supplier_pos], month))
+                    if row[department_pos] is not None:
+                        keys.add(('department', row[department_pos], month))
+            self.conn.executemany('INSERT OR IGNORE INTO temp.affected_keys VALUES (?, ?, ?)', list(keys))
+
+    def refresh_rollups(self):
+        """只重算受影响的供应商月份和部门月份的汇总行"""
+        for dimension, kind in (('supplier', 'supplier'), ('article', 'supplier'), ('department', 'department')):
+            table, key_columns = ROLLUP_TABLES[dimension]
+            self.conn.execute(f"""DELETE FROM {table} WHERE EXISTS (SELECT 1 FROM temp.affected_keys a
+                WHERE a.kind = '{kind}' AND a.key = {table}.{key_columns[0]} AND a.month = {table}.month)""")
+            source = AFFECTED_RECEIPTS.format(kind=kind)
+            self.conn.execute(f'INSERT INTO {table} ' + ROLLUP_SELECTS[dimension].format(source=source))
+
+    def query_receipts(self, supplier=None, month=None, article=None, department=None, limit=None):
+        """按供应商、月份、商品和成本中心查询历史收货明细
+
+        供应商、商品和成本中心支持*通配符，不含通配符时精确匹配。
+
+        Returns:
+            DataFrame: 列名与清洗后数据相同的查询结果
+        """
+        conditions = []
+        params = []
+        for column, value in (('supplier', supplier), ('article', article), ('department', department)):
+            if value:
+                condition, param = match_condition(column, value)
+                conditions.append(condition)
+                params.append(param)
+        if month:
+            month_start, next_month_start = parse_month(month)
+            conditions.append('receipt_date >= ? AND receipt_date < ?')
+            params.extend([month_start, next_month_start])
+
+        columns = ', '.join(COLUMN_MAPPING[column] for column in RESULT_COLUMNS)
+        sql = f'SELECT {columns} FROM receipts'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY receipt_date, receipt_no, line_no'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+
+        rows = self.conn.execute(sql, params).fetchall()
+        return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+    def monthly_trend(self, dimension='supplier', months=12, end_month=None, supplier=None):
+        """从月度汇总表读取含税总额的月度趋势
+
+        Args:
+            dimension: supplier（供应商）、article（供应商×商品）或 department（成本中心）
+            months: 包含的月份数
+            end_month: 截止月份（YYYYMM），默认为汇总表中最新的月份
+            supplier: 只看指定供应商，支持*通配符
+
+        Returns:
+            DataFrame: 每行一个供应商/商品/部门，每列一个月份，最后一列为合计
+        """
+        table, key_columns = ROLLUP_TABLES[dimension]
+        if end_month:
+            end_start, _ = parse_month(end_month)
+            last_month = end_start[:7]
+        else:
+            last_month = self.conn.execute(f'SELECT MAX(month) FROM {table}').fetchone()[0]
+            if last_month is None:
+                field_names = {field: column for column, field in COLUMN_MAPPING.items()}
+                return pd.DataFrame(columns=[field_names[column] for column in key_columns] + ['合计'])
+        first_month = (pd.Timestamp(last_month + '-01') - pd.DateOffset(months=months - 1)).strftime('%Y-%m')
+
+        conditions = ['month >= ?', 'month <= ?']
+        params = [first_month, last_month]
+        if supplier and dimension != 'department':
+            condition, param = match_condition('supplier', supplier)
+            conditions.append(condition)
+            params.append(param)
+
+        sql = (f'SELECT {", ".join(key_columns)}, month, gross_amount FROM {table} '
+               f'WHERE {" AND ".join(conditions)}')
+        data = pd.DataFrame(self.conn.execute(sql, params).fetchall(), columns=key_columns + ['month', 'gross_amount'])
+
+        all_months = pd.period_range(first_month, last_month, freq='M').strftime('%Y-%m').tolist()
+        trend = data.pivot_table(index=key_columns, columns='month', values='gross_amount', aggfunc='sum')
+        trend = trend.reindex(columns=all_months)
+        trend['合计'] = trend.sum(axis=1)
+        trend = trend.sort_values('合计', ascending=False).reset_index()
+        trend.columns.name = None
+        # 键字段使用与清洗后数据相同的中文列名
+        field_names = {field: column for column, field in COLUMN_MAPPING.items()}
+        return trend.rename(columns=field_names)
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM receipts').fetchone()[0]
@@ -0,0 +1,209 @@
+import io
+import os
+import json
+import time
+import hashlib
+import logging
+import uuid
+import zipfile
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+# 备份文件名：前缀 + 内容哈希 + 扩展名（zip压缩的按列存储的numpy数组，可以用numpy.load打开）
+BACKUP_PREFIX = 'cleaned_receiving_journal_'
+BACKUP_SUFFIX = '.npz'
+BACKUP_HASH_LENGTH = 16
+MANIFEST_FILE = 'manifest.json'
+
+
+class ColumnarBackupWriter:
+    """将清洗后的数据按列压缩写入备份文件，文件名为数据内容的哈希值
+
+    数据可以分批追加（流式处理时逐个分区），每批的每一列保存为一个数组：数值和日期列直接保存，
+    其他列保存为编码数组加去重后的值。数据写入临时文件，关闭时按内容哈希重命名；内容相同的备份已存在时
+    删除临时文件，只更新已有备份的修改时间，重复运行不会产生多份相同的备份。
+    内容哈希由每行的哈希值排序后计算，与行的顺序和分批方式无关；整数列按float64保存，
+    流式处理和一次性处理得到相同的哈希。
+    """
+
+    def __init__(self, directory, columns):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.columns = list(columns)
+        self.dtypes = {}
+        self.chunks = 0
+        self.rows = 0
+        self.row_hashes = []
+        self.temp_file = os.path.join(directory, f'.{BACKUP_PREFIX}{uuid.uuid4().hex}.tmp')
+        self.archive = zipfile.ZipFile(self.temp_file, 'w', zipfile.ZIP_DEFLATED, compresslevel=6)
+
+    def write_array(self, name, array):
+        with self.archive.open(f'{name}.npy', 'w', force_zip64=True) as f:
+            np.lib.format.write_array(f, array, allow_pickle=True)
+
+    def append(self, frame):
+        """追加一批数据，列顺序以columns为准"""
+        if len(frame) == 0:
+            return
+        frame = frame[self.columns]
+        # 整数列按float64保存和计算哈希，同一数据不因某一批恰好全是整数而得到不同的备份
+        integer_columns = [column for column in self.columns if pd.api.types.is_integer_dtype(frame[column].dtype)]
+        if integer_columns:
+            frame = frame.astype({column: 'float64' for column in integer_columns})
+        self.row_hashes.append(pd.util.hash_pandas_object(frame, index=False).to_numpy())
+        for index, column in enumerate(self.columns):
+            series = frame[column]
+            self.dtypes.setdefault(column, str(series.dtype))
+            name = f'{self.chunks:05d}/{index}'
+            if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_datetime64_dtype(series.dtype):
+                self.write_array(f'{name}.values', series.to_numpy())
+            else:
+                codes, uniques = pd.factorize(series.to_numpy(dtype=object), use_na_sentinel=True)
+                values = np.empty(len(uniques), dtype=object)
+                values[:] = list(uniques)
+                self.write_array(f'{name}.codes', codes.astype(np.int32))
+                self.write_array(f'{name}.uniques', values)
+        self.chunks += 1
+        self.rows += len(frame)
+
+    def close(self):
+        """写入描述文件并按内容哈希命名
+
+        Returns:
+            tuple: (备份文件路径, 是否新建)，内容相同的备份已存在时返回已有的文件
+        """
+        manifest = {'columns': self.columns, 'dtypes': self.dtypes, 'chunks': self.chunks, 'rows': self.rows}
+        self.archive.writestr(MANIFEST_FILE, json.dumps(manifest, ensure_ascii=False))
+        self.archive.close()
+
+        digest = hashlib.sha256(json.dumps(self.columns, ensure_ascii=False).encode('utf-8'))
+        if self.row_hashes:
+            digest.update(np.sort(np.concatenate(self.row_hashes)).tobytes())
+        content_hash = digest.hexdigest()[:BACKUP_HASH_LENGTH]
+        backup_file = os.path.join(self.directory, f'{BACKUP_PREFIX}{content_hash}{BACKUP_SUFFIX}')
+        if os.path.exists(backup_file):
+            os.remove(self.temp_file)
+            os.utime(backup_file)
+            return backup_file, False
+        os.replace(self.temp_file, backup_file)
+        return backup_file, True
+
+    def discard(self):
+        """出错时删除临时文件"""
+        self.archive.close()
+        if os.path.exists(self.temp_file):
+            os.remove(self.temp_file)
+
+
+def read_backup_manifest(archive):
+    return json.loads(archive.read(MANIFEST_FILE).decode('utf-8'))
+
+
+def read_array(archive, name):
+    return np.lib.format.read_array(io.BytesIO(archive.read(f'{name}.npy')), allow_pickle=True)
+
+
+def restore_column(values, dtype):
+    """按备份时的类型恢复列，无法转换时保留对象类型"""
+    if dtype != 'object':
+        try:
+            return pd.array(values, dtype=dtype)
+        except (TypeError, ValueError):
+            pass
+    return pd.Series(values, dtype=object)
+
+
+def iter_backup_frames(backup_file):
+    """逐批读取备份文件，每次产出一个DataFrame"""
+    with zipfile.ZipFile(backup_file) as archive:
+        manifest = read_backup_manifest(archive)
+        names = set(archive.namelist())
+        for chunk in range(manifest['chunks']):
+            data = {}
+            for index, column in enumerate(manifest['columns']):
+                name = f'{chunk:05d}/{index}'
+                dtype = manifest['dtypes'][column]
+                if f'{name}.values.npy' in names:
+                    values = read_array(archive, f'{name}.values')
+                    data[column] = values if str(values.dtype) == dtype else restore_column(values, dtype)
+                    continue
+                codes = read_array(archive, f'{name}.codes')
+                uniques = read_array(archive, f'{name}.uniques')
+                values = np.empty(len(codes), dtype=object)
+                values[:] = np.nan
+                valid = codes >= 0
+                values[valid] = uniques[codes[valid]]
+                data[column] = restore_column(values, dtype)
+            yield pd.DataFrame(data, columns=manifest['columns'])
+
+
+def read_backup(backup_file):
+    """读取整个备份文件"""
+    frames = list(iter_backup_frames(backup_file))
+    if not frames:
+        with zipfile.ZipFile(backup_file) as archive:
+            return pd.DataFrame(columns=read_backup_manifest(archive)['columns'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def export_backup_to_excel(backup_file, output_file):
+    """将备份文件导出为Excel，以只写模式逐批写入，内存占用不随数据量增长"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    header_written = False
+    for frame in iter_backup_frames(backup_file):
+        if not header_written:
+            ws.append(list(frame.columns))
+            header_written = True
+        frame = frame.astype(object)
+        for row in frame.where(frame.notna(), None).itertuples(index=False, name=None):
+            ws.append(row)
+    wb.save(output_file)
+    logging.info(f'备份已导出为Excel：{output_file}')
+
+
+def list_backups(directory):
+    """备份目录中的备份文件（包括旧版本的xlsx备份），按修改时间从新到旧排列"""
+    if not os.path.isdir(directory):
+        return []
+    backups = [os.path.join(directory, name) for name in os.listdir(directory)
+               if name.startswith(BACKUP_PREFIX) and name.endswith((BACKUP_SUFFIX, '.xlsx'))]
+    return sorted(backups, key=os.path.getmtime, reverse=True)
+
+
+def find_backup(directory, key):
+    """按文件路径或内容哈希的前缀查找备份文件，找不到或不唯一时返回None"""
+    if os.path.exists(key):
+        return key
+    matches = [path for path in list_backups(directory)
+               if os.path.basename(path).startswith(f'{BACKUP_PREFIX}{key}') and path.endswith(BACKUP_SUFFIX)]
+    return matches[0] if len(matches) == 1 else None
+
+
+def apply_retention(directory, retention_days, max_backups):
+    """按保留策略删除旧备份：超过retention_days天的备份，以及最新max_backups份之外的npz备份，0表示不限制
+
+    份数只计算npz备份；与npz备份同名的Excel导出随对应的备份一起删除，旧版本的xlsx备份只按天数删除。
+
+    Returns:
+        list: 已删除的备份文件
+    """
+    removed = []
+    now = time.time()
+    backups = list_backups(directory)
+    surplus = set()
+    if max_backups > 0:
+        surplus = set([path for path in backups if path.endswith(BACKUP_SUFFIX)][max_backups:])
+        surplus |= {os.path.splitext(path)[0] + '.xlsx' for path in surplus}
+    for path in backups:
+        expired = retention_days > 0 and now - os.path.getmtime(path) > retention_days * 86400
+        if expired or path in surplus:
+            try:
+                os.remove(path)
+                removed.append(path)
+                logging.info(f'按保留策略删除旧备份：{path}')
+            except OSError as e:
+                logging.error(f'删除旧备份失败：{path}，{e}')
+    return removed
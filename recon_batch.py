@@ -0,0 +1,100 @@
+import os
+import time
+import logging
+from contextlib import nullcontext
+
+from recon_cache import ParseCache
+from recon_config import load_performance_config
+from recon_watch import JOURNAL_SUFFIXES
+from recon_workers import RenderPool
+
+
+class BatchRun:
+    """集团批量处理（例如集团月末结账）：一次运行依次处理多个物业
+
+    每个物业使用自己的配置（列配置、公司名称等，叠加在集团配置之上）和输出根目录，输出与单独处理时相同；
+    所有物业共用一个对账单生成进程池（按集团配置的render_workers启动一次）和解析缓存目录，
+    结束时按物业和整批汇总耗时、行数、吞吐量和各阶段统计。
+    cancel_event 设置后当前物业在下一个安全点停止，其余物业不再处理。
+    """
+
+    def __init__(self, profiles, progress_callback=None, cancel_event=None, cache_dir=None):
+        self.profiles = profiles
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+        self.cache_dir = cache_dir
+        # 每个物业一项：(物业名称, 是否成功, 错误信息, 运行指标)
+        self.results = []
+
+    def input_files(self, profile):
+        """物业输入文件夹中的收货明细文件（按文件名排序），Excel的临时文件不处理"""
+        if not os.path.isdir(profile.input_dir):
+            return []
+        return [os.path.join(profile.input_dir, name) for name in sorted(os.listdir(profile.input_dir))
+                if name.lower().endswith(JOURNAL_SUFFIXES) and not name.startswith(('~$', '.'))]
+
+    def progress(self, profile, message):
+        if self.progress_callback is not None:
+            self.progress_callback(f'[{profile.name}] {message}')
+
+    def run_property(self, profile, render_pool):
+        """处理一个物业，返回 (是否成功, 错误信息, 运行指标)"""
+        from recon_engine import ReconEngine
+
+        input_files = self.input_files(profile)
+        if not input_files:
+            message = f'输入文件夹中没有收货明细：{profile.input_dir}'
+            logging.warning(f'物业{profile.name}：{message}')
+            return False, message, None
+        config = profile.load_config()
+        logging.info(f'开始处理物业{profile.name}：{len(input_files)}个文件，公司名称{config.company_name}，'
+                     f'输出目录{os.path.abspath(profile.output_root)}')
+        self.progress(profile, f'开始处理：{len(input_files)}个文件')
+        parse_cache = ParseCache(self.cache_dir, config.config_path) if self.cache_dir else None
+        engine = ReconEngine(input_files, lambda message: self.progress(profile, message), self.cancel_event,
+                             parse_cache=parse_cache, config=config, render_pool=render_pool)
+        success, error_msg = engine.run()
+        return success, error_msg, engine.run_summary()
+
+    def run(self):
+        """依次处理所有物业，返回 (是否全部成功, 错误信息)"""
+        start_time = time.perf_counter()
+        workers = load_performance_config()['render_workers']
+        with RenderPool(workers, shared=True) if workers > 1 else nullcontext() as render_pool:
+            for profile in self.profiles:
+                if self.cancel_event is not None and self.cancel_event.is_set():
+                    self.results.append((profile.name, False, '批量处理已取消，未处理', None))
+                    continue
+                try:
+                    success, error_msg, summary = self.run_property(profile, render_pool)
+                except Exception as e:
+                    # 一个物业的配置或输入有问题不影响其他物业
+                    success, error_msg, summary = False, f'处理过程中出现错误：{e}', None
+                    logging.error(f'物业{profile.name}：{error_msg}')
+                self.results.append((profile.name, success, error_msg, summary))
+        self.log_summary(time.perf_counter() - start_time)
+
+        failed = [(name, error_msg) for name, success, error_msg, summary in self.results if not success]
+        if failed:
+            return False, '；'.join(f'{name}：{error_msg}' for name, error_msg in failed)
+        return True, '；'.join(f'{name}：{error_msg}' for name, success, error_msg, summary in self.results
+                              if error_msg)
+
+    def log_summary(self, elapsed):
+        """记录每个物业和整批的行数、对账单数、跳过的单元数、耗时和吞吐量，以及各阶段合计耗时"""
+        total_rows = 0
+        stages = {}
+        for name, success, error_msg, summary in self.results:
+            if summary is None:
+                logging.info(f'批量处理 - {name}：未完成，{error_msg}')
+                continue
+            total_rows += summary['rows']
+            for stage, metrics in summary['stages'].items():
+                stages[stage] = stages.get(stage, 0.0) + metrics['elapsed']
+            logging.info(f'批量处理 - {name}：{"成功" if success else "失败"}，{summary["rows"]}行，'
+                         f'{summary["reports"]}份对账单，跳过{summary["errors"]}个单元，'
+                         f'耗时{summary["elapsed"]:.1f}秒，{summary["rows_per_second"]:.0f}行/秒')
+        rate = total_rows / elapsed if elapsed > 0 else 0
+        stage_text = '，'.join(f'{stage}{seconds:.1f}秒' for stage, seconds in stages.items())
+        logging.info(f'批量处理合计：{len(self.results)}个物业，{total_rows}行，耗时{elapsed:.1f}秒，{rate:.0f}行/秒'
+                     + (f'；各阶段合计：{stage_text}' if stage_text else ''))
@@ -0,0 +1,77 @@
+import os
+import hashlib
+import logging
+
+import pandas as pd
+
+from recon_checkpoint import input_signature
+
+CACHE_SUFFIX = '.pkl'
+
+
+class ParseCache:
+    """解析缓存：每个输入文件清洗后的收货明细（去重之前）保存为一个文件，再次处理同一文件时直接载入
+
+    缓存键为输入签名（文件路径、大小、修改时间和配置文件内容），文件被覆盖或配置变化后自动失效。
+    只缓存没有清洗错误的文件，出错的文件下次仍会重新解析并记入错误报告。
+    config_path 为清洗使用的配置文件（见config_files），默认为config.ini；使用不同配置的物业可以共用同一个缓存目录。
+    """
+
+    def __init__(self, directory, config_path=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.config_path = config_path
+
+    def path(self, input_file):
+        key = hashlib.sha256(input_signature([input_file], self.config_path).encode('ascii')).hexdigest()[:32]
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def contains(self, input_file):
+        try:
+            return os.path.exists(self.path(input_file))
+        except OSError:
+            return False
+
+    def load(self, input_file):
+        """载入缓存的清洗结果，缓存不存在或无法读取时返回None"""
+        try:
+            path = self.path(input_file)
+            if not os.path.exists(path):
+                return None
+            return pd.read_pickle(path)
+        except Exception as e:
+            logging.error(f'读取解析缓存失败：{input_file}，{e}')
+            return None
+
+    def store(self, input_file, frame):
+        """先写入临时文件再重命名，中断时不会留下不完整的缓存"""
+        path = self.path(input_file)
+        temp_file = f'{path}.{os.getpid()}.tmp'
+        try:
+            frame.to_pickle(temp_file)
+            os.replace(temp_file, path)
+        except Exception as e:
+            logging.error(f'写入解析缓存失败：{input_file}，{e}')
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    def prune(self, input_files):
+        """删除不属于这些输入文件的缓存（文件已移走、被覆盖或配置已变化）
+
+        Returns:
+            int: 删除的缓存文件数
+        """
+        keep = set()
+        for input_file in input_files:
+            try:
+                keep.add(os.path.basename(self.path(input_file)))
+            except OSError:
+                continue
+        removed = 0
+        for name in os.listdir(self.directory):
+            if name.endswith(CACHE_SUFFIX) and name not in keep:
+                os.remove(os.path.join(self.directory, name))
+                removed += 1
+        if removed:
+            logging.info(f'已删除{removed}个过期的解析缓存')
+        return removed
@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+
+from recon_config import config_files
+
+# 运行检查点：第一行记录本次运行的输入签名和输入文件，之后每份对账单写入完成后追加一行
+CHECKPOINT_FILE = os.path.join('供应商对账明细', '.checkpoint.jsonl')
+
+
+def input_signature(input_files, config_path=None):
+    """输入文件（路径、大小、修改时间）和配置文件内容的签名，任何一项变化后检查点失效
+
+    config_path 为处理使用的配置文件（见config_files），默认为config.ini。
+    """
+    digest = hashlib.sha256()
+    for input_file in input_files:
+        stat = os.stat(input_file)
+        digest.update(f'{os.path.abspath(input_file)}|{stat.st_size}|{stat.st_mtime_ns}\n'.encode('utf-8'))
+    for path in config_files(config_path):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def read_checkpoint(path=CHECKPOINT_FILE):
+    """读取检查点
+
+    Returns:
+        tuple: (头部信息, 已完成的输出文件集合)，检查点不存在或无法读取时头部信息为None
+    """
+    if not os.path.exists(path):
+        return None, set()
+    header = None
+    completed = set()
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 进程中断时最后一行可能不完整
+                    continue
+                if header is None:
+                    if 'signature' not in record:
+                        return None, set()
+                    header = record
+                elif 'output' in record:
+                    completed.add(record['output'])
+    except OSError as e:
+        logging.error(f'读取运行检查点失败：{e}')
+        return None, set()
+    return header, completed
+
+
+def resumable_reports(input_files, path=CHECKPOINT_FILE):
+    """检查点与这些输入文件一致时，返回可以跳过的对账单数量（文件仍然存在），否则返回0"""
+    header, completed = read_checkpoint(path)
+    try:
+        if header is None or header['signature'] != input_signature(input_files):
+            return 0
+    except OSError:
+        return 0
+    return sum(1 for output_file in completed if os.path.exists(output_file))
+
+
+class RunCheckpoint:
+    """一次运行的检查点：每份对账单原子写入输出路径后记录一行，运行中断后续跑时跳过已完成的对账单
+
+    检查点与输入签名绑定，输入文件或配置变化后不会被续跑使用。运行成功结束后删除。
+    """
+
+    def __init__(self, input_files, path=CHECKPOINT_FILE, config_path=None):
+        self.path = path
+        self.input_files = [os.path.abspath(input_file) for input_file in input_files]
+        self.signature = input_signature(input_files, config_path)
+        self.completed = set()
+
+    def start(self):
+        """开始新的运行，覆盖旧的检查点"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        header = {'signature': self.signature, 'input_files': self.input_files,
+                  'started': datetime.now().isoformat(timespec='seconds')}
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(header, ensure_ascii=False) + '\n')
+        self.completed = set()
+
+    def resume(self):
+        """续跑：检查点与本次输入一致时载入已完成的对账单并继续追加，否则重新开始
+
+        Returns:
+            bool: 是否载入了上次的检查点
+        """
+        header, completed = read_checkpoint(self.path)
+        if header is None or header['signature'] != self.signature:
+            if header is not None:
+                logging.warning('输入文件或配置已变化，检查点失效，重新生成全部对账单')
+            self.start()
+            return False
+        self.completed = completed
+        logging.info(f'已载入运行检查点（{header.get("started")}开始），记录了{len(completed)}份已完成的对账单')
+        return True
+
+    def is_done(self, output_file):
+        """对账单已在检查点中完成，并且文件仍然存在"""
+        return output_file in self.completed and os.path.exists(output_file)
+
+    def record(self, output_file):
+        """记录一份已完整写入的对账单"""
+        self.completed.add(output_file)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'output': output_file}, ensure_ascii=False) + '\n')
+
+    def remove(self):
+        """运行成功结束后删除检查点"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
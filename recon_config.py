@@ -0,0 +1,552 @@
+import os
+import sys
+import logging
+import configparser
+
+# 历史收货明细库默认路径（相对于程序运行目录）
+DEFAULT_STORE_PATH = os.path.join('history', 'receipts.db')
+
+# 对账明细表表头显示名称（界面的历史查询结果和导出的报表共用）
+REPORT_HEADER_MAPPING = {
+    '商品名称': '商品名称 Article',
+    '实收数量': '实收数量 QTY',
+    '基本单位': '基本单位 Unit',
+    '单价': '单价 Unit Price',
+    '小计金额': '净额 Net',
+    '税额': '税额 VAT',
+    '小计价税': '含税总额 Gross',
+    '部门': '成本中心 CostCenter'
+}
+
+# 月度趋势的维度：界面显示名称和标题
+TREND_DIMENSIONS = {
+    'supplier': '供应商',
+    'article': '供应商×商品',
+    'department': '成本中心'
+}
+
+def get_app_dir():
+    """获取应用程序所在目录，兼容打包后的exe和脚本运行模式"""
+    if getattr(sys, 'frozen', False):
+        # 如果是打包后的exe，使用sys.executable获取exe所在目录
+        app_dir = os.path.dirname(sys.executable)
+    else:
+        # 如果是脚本运行，使用脚本所在目录
+        app_dir = os.path.dirname(os.path.abspath(__file__))
+    return app_dir
+
+# 指定配置文件的环境变量（相对路径相对于程序目录），未设置时使用config.ini；子进程继承同一个配置文件
+CONFIG_ENV_VAR = 'MC_RECON_CONFIG'
+
+def get_config_path():
+    """获取配置文件路径"""
+    app_dir = get_app_dir()
+    config_path = os.path.join(app_dir, os.environ.get(CONFIG_ENV_VAR) or 'config.ini')
+    return config_path
+
+def config_files(config_path=None):
+    """实际存在的配置文件列表
+
+    config_path 可以是一个路径或路径列表（读取时后面的文件覆盖前面文件中的同名配置项），默认为get_config_path()。
+    """
+    if config_path is None:
+        paths = [get_config_path()]
+    elif isinstance(config_path, (str, os.PathLike)):
+        paths = [config_path]
+    else:
+        paths = list(config_path)
+    return [path for path in paths if os.path.exists(path)]
+
+def load_company_name(config_path=None):
+    """从配置文件读取公司名称"""
+    config = configparser.ConfigParser()
+    config_paths = config_files(config_path)
+    company_name = 'HOTEL NAME'  # 默认值
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+            if 'General' in config and 'company_name' in config['General']:
+                company_name = config['General']['company_name']
+        except Exception as e:
+            logging.error(f"读取配置文件错误: {e}")
+    return company_name
+
+# 原始收货明细各字段所在的列（Excel列字母）
+DEFAULT_COLUMN_CONFIG = {
+    'receipt_column': 'A',
+    'supplier_column': 'D',
+    'date_column': 'X',
+    'product_name_column': 'A',
+    'quantity_column': 'I',
+    'unit_column': 'J',
+    'unit_price_column': 'N',
+    'subtotal_column': 'Z',
+    'tax_amount_column': 'AE',
+    'total_amount_column': 'AI',
+    'department_column': 'AL'
+}
+
+def load_column_letters(config_path=None):
+    """从配置文件读取各字段所在的列（列字母或列号），未配置的字段使用默认值"""
+    config = configparser.ConfigParser()
+    config_paths = config_files(config_path)
+    columns = dict(DEFAULT_COLUMN_CONFIG)
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+            if 'Columns' in config:
+                # 从配置文件读取列号，如果不存在则使用默认值
+                for key in columns:
+                    if key in config['Columns']:
+                        columns[key] = config.get('Columns', key)
+            logging.info(f'已加载列配置: {columns}')
+        except Exception as e:
+            logging.error(f"读取列配置错误: {e}，使用默认配置")
+    return columns
+
+# 表头和列自动识别配置的默认值：读取前预扫描的行数，布局缓存文件（相对路径在输出根目录下，留空不缓存）
+DEFAULT_LAYOUT_CONFIG = {
+    'auto_detect': True,
+    'scan_rows': 30,
+    'cache_file': os.path.join('cache', 'layouts.json')
+}
+
+def load_layout_config(config_path=None):
+    """从配置文件读取表头和列自动识别配置，缺失或无效的项使用默认值"""
+    config = configparser.ConfigParser()
+    config_paths = config_files(config_path)
+    layout_config = dict(DEFAULT_LAYOUT_CONFIG)
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+            if 'Layout' in config:
+                layout_config['auto_detect'] = config.getboolean('Layout', 'auto_detect', fallback=True)
+                layout_config['scan_rows'] = config.getint('Layout', 'scan_rows',
+                                                           fallback=DEFAULT_LAYOUT_CONFIG['scan_rows'])
+                layout_config['cache_file'] = config.get('Layout', 'cache_file',
+                                                         fallback=DEFAULT_LAYOUT_CONFIG['cache_file']).strip()
+        except Exception as e:
+            logging.error(f"读取表头识别配置错误: {e}，使用默认配置")
+    return layout_config
+
+def load_header_captions(config_path=None):
+    """从配置文件的[HeaderCaptions]读取补充的表头文字（配置项 -> 表头文字列表），多个表头文字用逗号分隔"""
+    config = configparser.ConfigParser()
+    config_paths = config_files(config_path)
+    captions = {}
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+            if 'HeaderCaptions' in config:
+                for key, value in config['HeaderCaptions'].items():
+                    if key not in DEFAULT_COLUMN_CONFIG:
+                        logging.error(f"未知的表头配置项: {key}")
+                        continue
+                    captions[key] = [text.strip() for text in value.split(',') if text.strip()]
+        except Exception as e:
+            logging.error(f"读取表头文字配置错误: {e}")
+    return captions
+
+def load_billing_period_config(config_path=None):
+    """从配置文件读取各供应商的对账周期规则文本（供应商名称 -> 规则），default为未配置供应商的规则"""
+    config = configparser.ConfigParser()
+    # 保留供应商名称的大小写
+    config.optionxform = str
+    config_paths = config_files(config_path)
+    rules = {'default': 'month'}
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+            if 'BillingPeriods' in config:
+                rules.update((name.strip(), rule_text) for name, rule_text in config['BillingPeriods'].items())
+        except Exception as e:
+            logging.error(f"读取对账周期配置错误: {e}，使用自然月")
+    return rules
+
+def load_history_store_config(config_path=None):
+    """从配置文件读取历史收货明细库配置，未启用时返回None"""
+    config = configparser.ConfigParser()
+    config_paths = config_files(config_path)
+    store_path = DEFAULT_STORE_PATH
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+            if 'HistoryStore' in config:
+                if not config.getboolean('HistoryStore', 'enabled', fallback=True):
+                    return None
+                store_path = config.get('HistoryStore', 'path', fallback=DEFAULT_STORE_PATH).strip() or DEFAULT_STORE_PATH
+        except Exception as e:
+            logging.error(f"读取历史库配置错误: {e}，使用默认配置")
+    return store_path
+
+def load_dedup_config(config_path=None):
+    """从配置文件读取重复收货单检查配置，返回 (是否启用, 是否与历史库比对)"""
+    config = configparser.ConfigParser()
+    config_paths = config_files(config_path)
+    enabled, check_history = True, False
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+            if 'Dedup' in config:
+                enabled = config.getboolean('Dedup', 'enabled', fallback=True)
+                check_history = config.getboolean('Dedup', 'check_history', fallback=False)
+        except Exception as e:
+            logging.error(f"读取重复收货单配置错误: {e}，使用默认配置")
+    return enabled, check_history
+
+def load_report_template_config(config_path=None):
+    """从配置文件读取自定义对账单模板路径，未配置或文件不存在时返回None（使用内置模板）"""
+    config = configparser.ConfigParser()
+    config_paths = config_files(config_path)
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+            template_file = config.get('Report', 'template', fallback='').strip()
+            if template_file:
+                if os.path.exists(template_file):
+                    return template_file
+                logging.error(f"对账单模板文件不存在: {template_file}，使用内置模板")
+        except Exception as e:
+            logging.error(f"读取对账单模板配置错误: {e}，使用内置模板")
+    return None
+
+# 对账单输出方式：files 每个供应商一个文件，workbook 每月一个合并工作簿（每个供应商一个工作表）
+REPORT_OUTPUT_MODES = ('files', 'workbook')
+
+def load_report_output_mode(config_path=None):
+    """从配置文件读取对账单输出方式，未配置或无效时每个供应商输出一个文件"""
+    config = configparser.ConfigParser()
+    config_paths = config_files(config_path)
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+            output_mode = config.get('Report', 'output_mode', fallback='files').strip().lower()
+            if output_mode in REPORT_OUTPUT_MODES:
+                return output_mode
+            logging.error(f"对账单输出方式无效: {output_mode}，每个供应商输出一个文件")
+        except Exception as e:
+            logging.error(f"读取对账单输出方式配置错误: {e}，每个供应商输出一个文件")
+    return 'files'
+
+def load_department_report_config(config_path=None):
+    """从配置文件读取是否生成成本中心报表，默认生成"""
+    config = configparser.ConfigParser()
+    config_paths = config_files(config_path)
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+            return config.getboolean('Report', 'department_reports', fallback=True)
+        except Exception as e:
+            logging.error(f"读取成本中心报表配置错误: {e}，使用默认配置")
+    return True
+
+# 备份配置的默认值：是否同时导出Excel，保留天数和最多保留份数（0表示不限制）
+DEFAULT_BACKUP_CONFIG = {
+    'export_xlsx': False,
+    'retention_days': 90,
+    'max_backups': 30
+}
+
+def load_backup_config(config_path=None):
+    """从配置文件读取备份配置，缺失或无效的项使用默认值"""
+    config = configparser.ConfigParser()
+    config_paths = config_files(config_path)
+    backup_config = dict(DEFAULT_BACKUP_CONFIG)
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+            if 'Backup' in config:
+                for key, default in DEFAULT_BACKUP_CONFIG.items():
+                    if isinstance(default, bool):
+                        backup_config[key] = config.getboolean('Backup', key, fallback=default)
+                    else:
+                        backup_config[key] = config.getint('Backup', key, fallback=default)
+        except Exception as e:
+            logging.error(f"读取备份配置错误: {e}，使用默认配置")
+    return backup_config
+
+# 性能相关配置的默认值
+DEFAULT_PERFORMANCE_CONFIG = {
+    'streaming_threshold_mb': 200.0,
+    'render_workers': 0,
+    'pipeline_queue_size': 4
+}
+
+def load_performance_config(config_path=None):
+    """从配置文件读取性能相关配置，缺失或无效的项使用默认值"""
+    config = configparser.ConfigParser()
+    config_paths = config_files(config_path)
+    performance_config = dict(DEFAULT_PERFORMANCE_CONFIG)
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+            if 'Performance' in config:
+                for key, default in DEFAULT_PERFORMANCE_CONFIG.items():
+                    if isinstance(default, int):
+                        performance_config[key] = config.getint('Performance', key, fallback=default)
+                    else:
+                        performance_config[key] = config.getfloat('Performance', key, fallback=default)
+        except Exception as e:
+            logging.error(f"读取性能配置错误: {e}，使用默认配置")
+    return performance_config
+
+# 监视文件夹（watch 子命令）配置的默认值
+DEFAULT_WATCH_CONFIG = {
+    'folder': 'inbox',
+    'poll_seconds': 30.0,
+    'settle_seconds': 10.0,
+    'parse_cache': os.path.join('cache', 'parsed')
+}
+
+def load_watch_config(config_path=None):
+    """从配置文件读取监视文件夹配置，缺失或无效的项使用默认值"""
+    config = configparser.ConfigParser()
+    config_paths = config_files(config_path)
+    watch_config = dict(DEFAULT_WATCH_CONFIG)
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+            if 'Watch' in config:
+                for key, default in DEFAULT_WATCH_CONFIG.items():
+                    if isinstance(default, float):
+                        watch_config[key] = config.getfloat('Watch', key, fallback=default)
+                    else:
+                        watch_config[key] = config.get('Watch', key, fallback=default).strip() or default
+        except Exception as e:
+            logging.error(f"读取监视文件夹配置错误: {e}，使用默认配置")
+    return watch_config
+
+# 本地任务服务（serve 子命令）配置的默认值，服务只监听本机地址
+DEFAULT_SERVICE_CONFIG = {
+    'port': 8765,
+    'workers': 2,
+    'root': 'service'
+}
+
+def load_service_config(config_path=None):
+    """从配置文件读取本地任务服务配置，缺失或无效的项使用默认值"""
+    config = configparser.ConfigParser()
+    config_paths = config_files(config_path)
+    service_config = dict(DEFAULT_SERVICE_CONFIG)
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+            if 'Service' in config:
+                for key, default in DEFAULT_SERVICE_CONFIG.items():
+                    if isinstance(default, int):
+                        service_config[key] = config.getint('Service', key, fallback=default)
+                    else:
+                        service_config[key] = config.get('Service', key, fallback=default).strip() or default
+        except Exception as e:
+            logging.error(f"读取任务服务配置错误: {e}，使用默认配置")
+    return service_config
+
+# 以字典保存、覆盖时只需给出要修改的项的配置
+MERGED_SETTINGS = ('columns', 'backup', 'performance', 'layout')
+
+class ReconConfig:
+    """一次对账处理使用的全部配置，由ReconEngine读取
+
+    ReconConfig() 只使用内置默认值，不读取配置文件，适合嵌入其他程序；ReconConfig.load() 从config.ini读取。
+    两者都可以用关键字参数覆盖单项配置，例如 ReconConfig(company_name='XX HOTEL', columns={'date_column': 'Y'})，
+    columns、backup、performance和layout只需给出要修改的项。
+    output_root 为输出根目录，对账单、成本中心报表、备份和相对路径的历史库都写在其下，默认为运行目录；
+    config_path 为读取的配置文件（见config_files），运行检查点和解析缓存的签名包含这些文件的内容。
+    """
+
+    def __init__(self, **settings):
+        self.config_path = None
+        self.output_root = ''
+        self.company_name = 'HOTEL NAME'
+        self.columns = dict(DEFAULT_COLUMN_CONFIG)
+        self.billing_periods = {'default': 'month'}
+        self.history_store = DEFAULT_STORE_PATH
+        self.dedup_enabled = True
+        self.dedup_check_history = False
+        self.report_template = None
+        self.output_mode = 'files'
+        self.department_reports = True
+        self.backup = dict(DEFAULT_BACKUP_CONFIG)
+        self.performance = dict(DEFAULT_PERFORMANCE_CONFIG)
+        self.layout = dict(DEFAULT_LAYOUT_CONFIG)
+        self.header_captions = {}
+        for name, value in settings.items():
+            if not hasattr(self, name):
+                raise TypeError(f'未知的配置项：{name}')
+            if name in MERGED_SETTINGS:
+                value = {**getattr(self, name), **value}
+            setattr(self, name, value)
+
+    @classmethod
+    def load(cls, config_path=None, **settings):
+        """从配置文件（默认为config.ini，见config_files）读取全部配置，关键字参数覆盖读取到的值"""
+        dedup_enabled, dedup_check_history = load_dedup_config(config_path)
+        loaded = {
+            'config_path': config_path,
+            'company_name': load_company_name(config_path),
+            'columns': load_column_letters(config_path),
+            'billing_periods': load_billing_period_config(config_path),
+            'history_store': load_history_store_config(config_path),
+            'dedup_enabled': dedup_enabled,
+            'dedup_check_history': dedup_check_history,
+            'report_template': load_report_template_config(config_path),
+            'output_mode': load_report_output_mode(config_path),
+            'department_reports': load_department_report_config(config_path),
+            'backup': load_backup_config(config_path),
+            'performance': load_performance_config(config_path),
+            'layout': load_layout_config(config_path),
+            'header_captions': load_header_captions(config_path)
+        }
+        for name, value in settings.items():
+            loaded[name] = {**loaded[name], **value} if name in MERGED_SETTINGS else value
+        return cls(**loaded)
+
+# 物业配置段的前缀：[Property:物业名称]
+PROPERTY_SECTION_PREFIX = 'Property:'
+
+class PropertyProfile:
+    """集团批量处理中的一个物业：自己的配置文件、收货明细输入文件夹和输出根目录
+
+    物业的配置文件叠加在集团配置文件之上，只需写出与集团不同的配置段（通常是[General]和[Columns]）。
+    """
+
+    def __init__(self, name, config_file, input_dir, output_root):
+        self.name = name
+        self.config_file = config_file
+        self.input_dir = input_dir
+        self.output_root = output_root
+
+    def config_paths(self):
+        """读取顺序：集团配置文件，然后是物业配置文件"""
+        return [get_config_path()] + ([self.config_file] if self.config_file else [])
+
+    def load_config(self):
+        return ReconConfig.load(self.config_paths(), output_root=self.output_root)
+
+def load_property_profiles(config_path=None):
+    """从配置文件的[Property:名称]配置段读取集团批量处理的物业列表
+
+    config 为物业配置文件（相对路径相对于程序目录，留空表示与集团相同），inputs 为收货明细文件夹，
+    output 为输出根目录（默认为 output/物业名称）。
+    """
+    config = configparser.ConfigParser()
+    config_paths = config_files(config_path)
+    profiles = []
+    if config_paths:
+        try:
+            config.read(config_paths, encoding='utf-8')
+        except Exception as e:
+            logging.error(f"读取物业配置错误: {e}")
+            return profiles
+        for section in config.sections():
+            if not section.startswith(PROPERTY_SECTION_PREFIX):
+                continue
+            name = section[len(PROPERTY_SECTION_PREFIX):].strip()
+            config_file = config.get(section, 'config', fallback='').strip()
+            profiles.append(PropertyProfile(
+                name,
+                os.path.join(get_app_dir(), config_file) if config_file else None,
+                config.get(section, 'inputs', fallback='').strip() or os.path.join('inbox', name),
+                config.get(section, 'output', fallback='').strip() or os.path.join('output', name)
+            ))
+    return profiles
+
+def ensure_config_file():
+    """确保配置文件存在，如果不存在则创建默认配置"""
+    config_path = get_config_path()
+    logging.info(f'配置文件路径: {config_path}')
+    
+    # 检查配置文件是否存在
+    if not os.path.exists(config_path):
+        logging.info('配置文件不存在，创建默认配置文件')
+        config = configparser.ConfigParser()
+        config['General'] = {
+            'company_name': 'HOTEL NAME'
+        }
+        
+        # 添加默认列号配置
+        config['Columns'] = {
+            'receipt_column': 'A',          # 收货单号 - Receipt Number Column
+            'supplier_column': 'D',         # 供应商名称 - Supplier Column
+            'date_column': 'X',             # 收货日期 - Date Column
+            'product_name_column': 'A',     # 商品名称 Article - Product Name Column
+            'quantity_column': 'I',         # 实收数量 Received Quantity Column
+            'unit_column': 'J',             # 基本单位 Basic Unit Column
+            'unit_price_column': 'N',       # 单价 Price Column
+            'subtotal_column': 'Z',         # 小计金额 Subtotal Column
+            'tax_amount_column': 'AE',      # 税额 Tax Column
+            'total_amount_column': 'AI',    # 小计价税列 Total Amount Column
+            'department_column': 'AL'       # 部门列 Department Column
+        }
+        
+        # 添加表头和列自动识别配置（按表头文字识别各列，结果按表头签名缓存）
+        config['Layout'] = {
+            'auto_detect': 'true',
+            'scan_rows': '30',              # 读取前预扫描的行数
+            'cache_file': DEFAULT_LAYOUT_CONFIG['cache_file']  # 布局缓存，相对于输出根目录
+        }
+        
+        # 添加历史收货明细库配置
+        config['HistoryStore'] = {
+            'enabled': 'true',
+            'path': DEFAULT_STORE_PATH
+        }
+        
+        # 添加重复收货单检查配置
+        config['Dedup'] = {
+            'enabled': 'true',
+            'check_history': 'false'
+        }
+        
+        # 添加默认对账周期配置（供应商名称 = 规则，未列出的供应商使用default）
+        config['BillingPeriods'] = {
+            'default': 'month'              # 自然月；month:26 为每月26日至次月25日；days:14:2025-01-06 为每14天
+        }
+        
+        # 添加对账单模板配置（留空使用内置模板）
+        config['Report'] = {
+            'template': '',
+            'output_mode': 'files',         # files 每个供应商一个文件；workbook 每月一个合并工作簿
+            'department_reports': 'true'    # 同时为每个成本中心生成按供应商和商品汇总的明细
+        }
+        
+        # 添加备份配置（备份按列压缩保存，文件名为内容哈希）
+        config['Backup'] = {
+            'export_xlsx': 'false',         # 同时导出Excel格式的备份
+            'retention_days': '90',         # 删除超过天数的旧备份，0表示不限制
+            'max_backups': '30'             # 最多保留的npz备份份数，0表示不限制
+        }
+        
+        # 添加性能配置（输入文件总大小达到阈值时使用流式处理，0表示始终使用）
+        config['Performance'] = {
+            'streaming_threshold_mb': '200',
+            'render_workers': '0',          # 生成对账单的子进程数，0或1表示在处理线程中依次生成
+            'pipeline_queue_size': '4'      # 流水线各阶段之间的队列长度
+        }
+        
+        # 添加监视文件夹配置（watch 子命令）
+        config['Watch'] = {
+            'folder': 'inbox',              # 监视的输入文件夹，ERP导出的收货明细放入其中
+            'poll_seconds': '30',           # 检查新文件的间隔（秒）
+            'settle_seconds': '10',         # 文件大小和修改时间保持不变多久后视为写入完成（秒）
+            'parse_cache': DEFAULT_WATCH_CONFIG['parse_cache']  # 解析缓存目录
+        }
+        
+        # 添加本地任务服务配置（serve 子命令，只监听127.0.0.1）
+        config['Service'] = {
+            'port': '8765',
+            'workers': '2',                 # 同时运行的任务数，每个任务在单独的子进程中处理
+            'root': 'service'               # 任务队列数据库和每个任务的输入、输出目录
+        }
+        
+        # 写入配置文件
+        try:
+            with open(config_path, 'w', encoding='utf-8') as configfile:
+                config.write(configfile)
+            logging.info('默认配置文件创建成功，包含列号配置')
+        except Exception as e:
+            logging.error(f'创建配置文件失败: {e}')
+    else:
+        logging.info('配置文件已存在')
+    
+    return config_path
@@ -0,0 +1,1085 @@
+import io
+import os
+import re
+import time
+import numbers
+import logging
+from datetime import datetime
+
+import pandas as pd
+
+from receipt_store import ReceiptStore
+from receipt_dedup import ReceiptDedupIndex
+from recon_config import ReconConfig
+from recon_report import (RECEIPT_COLUMNS, ReportTemplate, ConsolidatedReport, generate_supplier_report,
+                          summary_entry, export_master_summary, DepartmentFanout, export_duplicate_report,
+                          export_error_report)
+from recon_workers import render_reports_in_pool
+from recon_backup import ColumnarBackupWriter, apply_retention, export_backup_to_excel
+from recon_pipeline import RunMetrics, BackgroundTask, prefetch
+from recon_streaming import (SupplierPartitions, STREAM_CHUNK_RECEIPTS, HEADER_ROWS, iter_receipt_batches,
+                             input_size_mb)
+from recon_checkpoint import RunCheckpoint, CHECKPOINT_FILE
+from recon_layout import LayoutDetector, SheetLayout
+
+
+# 必须为数值的金额列（配置项 -> 字段名称），非数值的明细会使对账单合计出错，整张收货单记入错误报告
+AMOUNT_COLUMN_KEYS = {
+    'subtotal_column': '小计金额',
+    'tax_amount_column': '税额',
+    'total_amount_column': '小计价税'
+}
+
+
+# 清洗后统一为float64的数量和金额字段
+NUMERIC_FIELDS = ('实收数量', '单价', '小计金额', '税额', '小计价税')
+
+
+class ProcessCancelled(BaseException):
+    """处理被用户取消（继承BaseException，不会被逐个单元隔离错误的 except Exception 捕获）"""
+
+
+class ReceiptDataError(ValueError):
+    """收货单明细数据无法处理，row 为出错明细的Excel行号"""
+
+    def __init__(self, row, reason):
+        super().__init__(reason)
+        self.row = row
+
+
+class ReconResult:
+    """ReconEngine.process() 的处理结果，全部保存在内存中
+
+    cleaned 为清洗、去重后的收货明细；summary 为每份对账单一行的合计（与汇总表相同，对账明细列为输出路径）；
+    departments 为按年月、成本中心、供应商和商品汇总的数据；duplicates 为重复收货单，errors 为处理失败并已跳过的单元；
+    workbooks 为生成的工作簿（相对输出路径 -> xlsx文件内容），metrics 为耗时、行数和各阶段统计。
+    """
+
+    def __init__(self, cleaned, summary, departments, duplicates, errors, workbooks, metrics):
+        self.cleaned = cleaned
+        self.summary = summary
+        self.departments = departments
+        self.duplicates = duplicates
+        self.errors = errors
+        self.workbooks = workbooks
+        self.metrics = metrics
+
+    def save(self, output_dir):
+        """将工作簿按相对输出路径写入output_dir，先写临时文件再重命名，返回写入的文件列表"""
+        output_files = []
+        for relative_path, content in self.workbooks.items():
+            output_file = os.path.join(output_dir, relative_path)
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            temp_file = f'{output_file}.{os.getpid()}.tmp'
+            try:
+                with open(temp_file, 'wb') as f:
+                    f.write(content)
+                os.replace(temp_file, output_file)
+            except BaseException:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+                raise
+            output_files.append(output_file)
+        return output_files
+
+
+def input_name(input_file, index):
+    """输入的显示名称：文件路径，文件对象的name属性，或按输入顺序编号（第index个输入）"""
+    if isinstance(input_file, (str, os.PathLike)):
+        return os.fspath(input_file)
+    name = getattr(input_file, 'name', None)
+    if isinstance(name, str) and name:
+        return name
+    return f'输入{index}'
+
+
+class ReconEngine:
+    """对账处理引擎：读取和清洗收货明细，生成对账单、汇总表和备份，不依赖界面
+
+    progress_callback 接收处理进度文本，界面在处理线程中运行引擎并将进度显示在日志区域。
+    cancel_event 为取消标志（threading.Event或multiprocessing.Event），引擎在每张收货单、每批收货单
+    和每份对账单之间检查，设置后在当前单元完成时停止。
+    resume 为True时从上次中断的运行检查点继续，只生成检查点中尚未完成的对账单。
+    parse_cache 为ParseCache时，已缓存的输入文件不再读取和清洗，新解析的文件在run()成功结束后才写入缓存；
+    incremental 为True时只重新生成本次新解析的文件中出现的供应商的对账单（以及尚不存在的对账单），
+    汇总表和成本中心报表仍按全部数据生成。
+    config 为ReconConfig，未指定时从config.ini读取；输出写在config.output_root下。
+    render_pool 为共用的RenderPool（批量处理多个物业时），未指定时每次运行单独启动进程池。
+
+    run() 处理input_files中的文件，输出写入程序运行目录；作为库使用时调用process()，结果全部在内存中返回：
+
+        result = ReconEngine(config=ReconConfig(company_name='XX HOTEL')).process([buffer, df])
+    """
+    
+    def __init__(self, input_files=None, progress_callback=None, cancel_event=None, resume=False,
+                 parse_cache=None, incremental=False, config=None, render_pool=None):
+        self.input_files = input_files
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+        self.resume = resume
+        self.parse_cache = parse_cache
+        self.incremental = incremental
+        self.render_pool = render_pool
+        self.reset_run_state()
+        self.config = config = config if config is not None else ReconConfig.load()
+        self.company_name = config.company_name
+        self.output_root = config.output_root
+        self.column_config = self.load_column_config(config.columns)
+        self.billing_period_rules = self.load_billing_period_rules(config.billing_periods)
+        # 相对路径的历史库放在输出根目录下，每个物业一个
+        self.history_store_path = config.history_store and self.output_path(config.history_store)
+        self.dedup_enabled, self.dedup_check_history = config.dedup_enabled, config.dedup_check_history
+        self.performance_config = config.performance
+        self.report_template_file = config.report_template
+        self.report_output_mode = config.output_mode
+        self.department_reports = config.department_reports
+        self.backup_config = config.backup
+        self.layout_config = config.layout
+        self.header_captions = config.header_captions
+        # 相对路径的布局缓存放在输出根目录下；第一次读取输入时创建识别器
+        self.layout_cache_path = config.layout['cache_file'] and self.output_path(config.layout['cache_file'])
+        self.layout_detector = None
+    
+    def reset_run_state(self):
+        """清空上一次运行的状态，同一个引擎可以多次调用run()或process()"""
+        # 本次新解析（未命中解析缓存）的文件中出现的供应商，增量处理时只重新生成这些供应商的对账单
+        self.changed_suppliers = set()
+        self.total_rows = 0
+        self.metrics = None
+        self.elapsed = 0.0
+        self.checkpoint = None
+        # 本次运行已完整写入的对账单（或合并工作簿），取消时报告给界面
+        self.completed_reports = []
+        # 处理失败并已跳过的单元（文件、收货单、供应商），运行结束后写入错误报告
+        self.errors = []
+        self.failed_reports = set()
+        # process() 处理时生成的工作簿（输出文件 -> 内存缓冲区），run() 处理时为None，工作簿直接写入文件
+        self.memory_outputs = None
+        # 本次新解析、待写入解析缓存的文件 (输入文件, 清洗后的数据)，运行成功结束后才写入
+        self.parse_cache_entries = []
+    
+    def output_path(self, *parts):
+        """输出根目录下的路径，未设置输出根目录时为相对于运行目录的路径"""
+        return os.path.join(self.output_root, *parts)
+    
+    def progress(self, message):
+        """报告处理进度"""
+        if self.progress_callback is not None:
+            self.progress_callback(message)
+    
+    def check_cancelled(self):
+        """已请求取消时抛出ProcessCancelled，在每个可以安全停止的位置调用"""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise ProcessCancelled()
+    
+    def report_completed(self, output_file):
+        """记录一份已完整写入的对账单，同时写入运行检查点"""
+        self.completed_reports.append(output_file)
+        if self.checkpoint is not None:
+            self.checkpoint.record(output_file)
+    
+    def record_error(self, stage, reason, input_file=None, receipt=None, row=None, supplier=None):
+        """记录一个处理失败的单元，跳过该单元后继续处理其他文件、收货单和供应商"""
+        self.errors.append({'阶段': stage, '文件': os.path.basename(input_file) if input_file else '',
+                            '收货单号': receipt if receipt is not None else '', '行号': row if row is not None else '',
+                            '供应商名称': supplier if supplier is not None else '', '原因': reason})
+        location = '，'.join(f'{name}{value}' for name, value in
+                            (('文件', input_file), ('收货单', receipt), ('行', row), ('供应商', supplier))
+                            if value is not None)
+        logging.error(f'{stage}失败，已跳过（{location}）：{reason}')
+    
+    def record_receipt_error(self, input_file, receipt, supplier, receipt_row, error):
+        """记录一张清洗失败的收货单，行号为出错明细的行号（无法确定时为收货单号所在行）"""
+        row = error.row if isinstance(error, ReceiptDataError) else receipt_row
+        supplier = supplier if pd.notna(supplier) else None
+        self.record_error('清洗', str(error) or type(error).__name__, input_file, receipt, row, supplier)
+    
+    def report_failed(self, supplier_name, output_file, reason):
+        """记录一份生成失败的对账单，汇总表中不再列出"""
+        self.failed_reports.add(output_file)
+        self.record_error('对账单', f'{os.path.basename(output_file)}：{reason}', supplier=supplier_name)
+    
+    def pending_report_jobs(self, report_jobs):
+        """续跑时跳过检查点中已完成的对账单，增量处理时跳过数据未变化且已存在的对账单
+
+        汇总表和成本中心报表需要的数据在切分时仍然完整累计。
+        """
+        skipped = 0
+        unchanged = 0
+        for job in report_jobs:
+            if self.checkpoint is not None and self.checkpoint.is_done(job[4]):
+                skipped += 1
+                continue
+            if self.incremental and job[0] not in self.changed_suppliers and os.path.exists(job[4]):
+                unchanged += 1
+                continue
+            yield job
+        if skipped:
+            logging.info(f'续跑：跳过{skipped}份已完成的对账单')
+            self.progress(f'续跑：跳过{skipped}份已完成的对账单')
+        if unchanged:
+            logging.info(f'增量处理：{unchanged}份对账单的数据未变化，未重新生成')
+            self.progress(f'增量处理：{unchanged}份对账单的数据未变化，未重新生成')
+    
+    def excel_column_to_number(self, column_letter):
+        """将Excel列字母转换为数字索引（从0开始）"""
+        if isinstance(column_letter, int):
+            return column_letter  # 如果已经是数字，直接返回
+        
+        column_letter = str(column_letter).strip()
+        
+        # 如果包含注释符号#，只取#前面的部分
+        if '#' in column_letter:
+            column_letter = column_letter.split('#')[0].strip()
+        
+        column_letter = column_letter.upper()
+        
+        # 如果是纯数字字符串，转换为整数
+        if column_letter.isdigit():
+            return int(column_letter)
+        
+        # 转换字母为数字
+        result = 0
+        for char in column_letter:
+            if 'A' <= char <= 'Z':
+                result = result * 26 + (ord(char) - ord('A') + 1)
+            else:
+                raise ValueError(f"无效的列标识符: {column_letter}")
+        
+        return result - 1  # 转换为从0开始的索引
+    
+    def load_column_config(self, columns):
+        """将列号配置（列字母或列号）转换为数字索引"""
+        numeric_config = {}
+        for key, value in columns.items():
+            try:
+                numeric_config[key] = self.excel_column_to_number(value)
+                logging.info(f'{key}: {value} -> {numeric_config[key]}')
+            except Exception as e:
+                logging.error(f"转换列配置错误 {key}={value}: {e}")
+                # 使用备用默认值
+                backup_defaults = {
+                    'receipt_column': 0, 'supplier_column': 3, 'date_column': 23,
+                    'product_name_column': 0, 'quantity_column': 8, 'unit_column': 9,
+                    'unit_price_column': 13, 'subtotal_column': 25, 'tax_amount_column': 30,
+                    'total_amount_column': 34, 'department_column': 37
+                }
+                numeric_config[key] = backup_defaults.get(key, 0)
+        
+        return numeric_config
+    
+    def get_column_name(self, column_index):
+        """根据列索引生成Unnamed列名"""
+        return f'Unnamed: {column_index}'
+    
+    def missing_columns(self, columns, column_config):
+        """原始数据中缺少的已配置列，返回配置项名称列表"""
+        return [key for key, index in column_config.items() if self.get_column_name(index) not in columns]
+    
+    def file_layout(self, input_file, name):
+        """读取前确定输入文件的布局（表头行和各配置项的列），与config.ini不一致或表头中缺少某些列时先记录警告
+
+        未启用自动识别时，以及已读入的DataFrame（按 skiprows=8 读入），使用默认布局。
+        """
+        if not self.layout_config['auto_detect'] or isinstance(input_file, pd.DataFrame):
+            return SheetLayout(HEADER_ROWS, dict(self.column_config))
+        if self.layout_detector is None:
+            self.layout_detector = LayoutDetector(self.column_config, self.header_captions,
+                                                  self.layout_config['scan_rows'], self.layout_cache_path)
+        layout = self.layout_detector.detect(input_file)
+        if layout.source == 'config':
+            message = (f'未能在前{self.layout_config["scan_rows"]}行找到表头或收货单号，按config.ini的布局读取：'
+                       f'{os.path.basename(name)}')
+            logging.warning(message)
+            self.progress(message)
+            return layout
+        mismatches = self.layout_detector.mismatches(layout)
+        if mismatches:
+            message = f'列布局与config.ini不一致，按检测到的布局读取：{os.path.basename(name)}，{"；".join(mismatches)}'
+            logging.warning(message)
+            self.progress(message)
+        unmatched = self.layout_detector.unmatched_notes(layout)
+        if unmatched:
+            message = f'表头中没有找到以下列的表头文字，未经核对：{os.path.basename(name)}，{"；".join(unmatched)}'
+            logging.warning(message)
+            self.progress(message)
+        return layout
+
+    def format_mixed_text(self, text):
+        if pd.isna(text):
+            return text
+        text = str(text)
+        chinese_pattern = re.compile('[\u4e00-\u9fff]')
+        match = chinese_pattern.search(text)
+        if match:
+            english_part = text[:match.start()].strip()
+            chinese_part = text[match.start():].strip()
+            if english_part and chinese_part:
+                return f'{english_part}\n{chinese_part}'
+        return text
+
+    def extract_chinese(self, text):
+        """提取文本中的中文字符"""
+        if pd.isna(text):
+            return text
+        text = str(text)
+        chinese_pattern = re.compile('[\u4e00-\u9fff]+')
+        chinese_matches = chinese_pattern.findall(text)
+        if chinese_matches:
+            return ''.join(chinese_matches)
+        return text
+
+    def write_duplicate_report(self, dedup_index, company_name):
+        """按需与历史库比对后，将重复收货单写入报告文件"""
+        if self.dedup_check_history and self.history_store_path and os.path.exists(self.history_store_path):
+            try:
+                with ReceiptStore(self.history_store_path) as store:
+                    dedup_index.check_history(store)
+            except Exception as e:
+                logging.error(f'与历史库比对重复收货单失败：{e}')
+        
+        report = dedup_index.report()
+        if report.empty:
+            logging.info('未发现重复收货单')
+            return
+        
+        current_time = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
+        report_file = self.output_path('供应商对账明细', f'_重复收货单_{current_time}.xlsx')
+        export_duplicate_report(report, report_file, company_name)
+        counts = report['类型'].value_counts()
+        summary = '，'.join(f'{kind}{count}张' for kind, count in counts.items())
+        logging.warning(f'发现重复收货单：{summary}，详见{report_file}')
+        self.progress(f'发现重复收货单：{summary}，详见{report_file}')
+    
+    def write_error_report(self, company_name):
+        """将处理失败并已跳过的单元写入错误报告文件，返回提示信息，没有错误时返回空字符串"""
+        if not self.errors:
+            return ''
+        current_time = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
+        report_file = self.output_path('供应商对账明细', f'_错误报告_{current_time}.xlsx')
+        try:
+            os.makedirs(os.path.dirname(report_file), exist_ok=True)
+            export_error_report(pd.DataFrame(self.errors, dtype=object), report_file, company_name)
+        except Exception as e:
+            logging.error(f'写入错误报告失败：{e}')
+            return f'{len(self.errors)}个单元处理失败，已跳过，详见日志'
+        message = f'{len(self.errors)}个单元处理失败，已跳过，详见{report_file}'
+        logging.warning(message)
+        self.progress(message)
+        return message
+    
+    def save_to_history_store(self, frames):
+        """将本次清洗后的数据（一个或多个DataFrame）写入历史收货明细库，写入失败不影响已生成的对账单"""
+        if not self.history_store_path:
+            return
+        try:
+            start_time = datetime.now()
+            with ReceiptStore(self.history_store_path) as store:
+                saved_rows = sum(store.upsert_receipts(frame) for frame in frames)
+                total_rows = store.count()
+            elapsed = (datetime.now() - start_time).total_seconds()
+            logging.info(f'已写入历史库 {self.history_store_path}：{saved_rows}行，库中共{total_rows}行，耗时{elapsed:.2f}秒')
+            self.progress(f'已写入历史库：{saved_rows}行')
+        except Exception as e:
+            logging.error(f'写入历史库失败：{e}')
+            self.progress(f'写入历史库失败：{e}')
+    
+    def parse_billing_period_rule(self, rule_text):
+        """解析对账周期规则
+        
+        支持的格式：
+            month               自然月（1日至月末）
+            month:26            每月26日至次月25日
+            days:14:2025-01-06  自锚定日期起每14天为一个周期
+        
+        Returns:
+            tuple: ('month', 起始日) 或 ('days', 天数, 锚定日期)
+        """
+        rule_text = str(rule_text).strip()
+        
+        # 如果包含注释符号#，只取#前面的部分
+        if '#' in rule_text:
+            rule_text = rule_text.split('#')[0].strip()
+        
+        parts = [part.strip() for part in rule_text.lower().split(':')]
+        if parts[0] == 'month':
+            start_day = int(parts[1]) if len(parts) > 1 and parts[1] else 1
+            if not 1 <= start_day <= 28:
+                raise ValueError(f"对账周期起始日必须在1到28之间: {rule_text}")
+            return ('month', start_day)
+        if parts[0] == 'days' and len(parts) == 3:
+            length = int(parts[1])
+            if length < 1:
+                raise ValueError(f"对账周期天数必须大于0: {rule_text}")
+            return ('days', length, pd.Timestamp(parts[2]).normalize())
+        raise ValueError(f"无效的对账周期规则: {rule_text}")
+    
+    def load_billing_period_rules(self, rule_texts):
+        """解析各供应商的对账周期规则（供应商名称 -> 规则文本），未配置的供应商使用default规则"""
+        rules = {'default': ('month', 1)}
+        for supplier_name, rule_text in rule_texts.items():
+            try:
+                rules[supplier_name] = self.parse_billing_period_rule(rule_text)
+            except Exception as e:
+                logging.error(f"转换对账周期配置错误 {supplier_name}={rule_text}: {e}")
+        logging.info(f'已加载对账周期配置: {rules}')
+        return rules
+    
+    def get_billing_periods(self, rule, first_date, last_date):
+        """生成覆盖first_date至last_date的所有对账周期 (周期开始日, 周期结束日)"""
+        first_date = first_date.normalize()
+        last_date = last_date.normalize()
+        
+        if rule[0] == 'days':
+            length, anchor = rule[1], rule[2]
+            offset = (first_date - anchor).days // length
+            period_start = anchor + pd.Timedelta(days=offset * length)
+            step = pd.DateOffset(days=length)
+        else:
+            start_day = rule[1]
+            period_start = first_date.replace(day=start_day)
+            if first_date.day < start_day:
+                period_start = period_start - pd.DateOffset(months=1)
+            step = pd.DateOffset(months=1)
+        
+        periods = []
+        while period_start <= last_date:
+            next_start = period_start + step
+            periods.append((period_start, next_start - pd.Timedelta(days=1)))
+            period_start = next_start
+        return periods
+    
+    def slice_billing_periods(self, supplier_data, rule):
+        """按对账周期切分已按收货日期排序的供应商数据
+        
+        在日期索引上用二分查找定位每个周期的起止位置，每个周期的查找为O(log n)。
+        没有数据的周期会被跳过，收货日期缺失的行归入最后一个周期。
+        
+        Yields:
+            tuple: (周期开始日, 周期结束日, 周期内数据)
+        """
+        dates = pd.DatetimeIndex(pd.to_datetime(supplier_data['收货日期'], errors='coerce'))
+        valid_count = int(dates.notna().sum())
+        if valid_count == 0:
+            logging.warning(f'供应商 {supplier_data["供应商名称"].iloc[0]} 没有有效的收货日期，无法确定对账周期')
+            return
+        if valid_count < len(dates):
+            logging.warning(f'供应商 {supplier_data["供应商名称"].iloc[0]} 有{len(dates) - valid_count}行收货日期缺失，已归入最后一个对账周期')
+        
+        # 排序后缺失日期位于末尾，只在有效日期部分做二分查找
+        valid_dates = dates[:valid_count]
+        periods = self.get_billing_periods(rule, valid_dates[0], valid_dates[-1])
+        for i, (period_start, period_end) in enumerate(periods):
+            start_pos = valid_dates.searchsorted(period_start, side='left')
+            end_pos = valid_dates.searchsorted(period_end + pd.Timedelta(days=1), side='left')
+            if i == len(periods) - 1:
+                end_pos = len(dates)
+            if end_pos > start_pos:
+                yield period_start, period_end, supplier_data.iloc[start_pos:end_pos]
+    
+    def check_amounts(self, details, row_offset, column_config):
+        """金额列必须为数值，否则抛出ReceiptDataError，行号为明细的索引加row_offset"""
+        for column_key, field in AMOUNT_COLUMN_KEYS.items():
+            values = details[self.get_column_name(column_config[column_key])]
+            if pd.api.types.is_numeric_dtype(values.dtype):
+                continue
+            invalid = values.notna() & ~values.map(lambda value: isinstance(value, numbers.Number)
+                                                    and not isinstance(value, bool))
+            if invalid.any():
+                label = invalid.idxmax()
+                raise ReceiptDataError(label + row_offset, f'{field}不是数值：{values[label]!r}')
+    
+    def clean_receipt(self, receipt, supplier, date, details, row_offset=0, column_config=None):
+        """清洗一张收货单：整理供应商名称和日期，筛选明细行并映射为标准字段，没有有效明细时返回None
+
+        明细的索引加row_offset为其Excel行号，金额不是数值时抛出带行号的ReceiptDataError。
+        column_config 为该文件的列（见file_layout），默认为config.ini的列配置。
+        """
+        column_config = column_config or self.column_config
+        # 清理供应商名称和日期中的发票信息
+        if pd.notna(supplier):
+            supplier = re.sub(r'[（(].*[)）]|（专票.*|（普票.*|\s+专票.*|\s+普票.*|\d+%$', '', str(supplier)).strip()
+        
+        if pd.notna(date):
+            try:
+                date = pd.to_datetime(date)
+                if pd.notna(date):
+                    date = date.strftime('%Y-%m-%d')
+            except:
+                date = None
+        
+        # 只保留非空行且不包含Page和Delivery Date的行
+        product_name_column = self.get_column_name(column_config['product_name_column'])
+        details = details[details[product_name_column].notna()]
+        details = details[~details[product_name_column].astype(str).str.contains('Page|Delivery Date', na=False)]
+        
+        if details.empty:
+            return None
+        self.check_amounts(details, row_offset, column_config)
+        
+        details = details.copy()
+        details['收货单号'] = receipt
+        details['供应商名称'] = self.extract_chinese(supplier)
+        details['收货日期'] = date
+        details['商品名称'] = details[self.get_column_name(column_config['product_name_column'])].apply(self.format_mixed_text)
+        details['实收数量'] = details[self.get_column_name(column_config['quantity_column'])]
+        details['基本单位'] = details[self.get_column_name(column_config['unit_column'])]
+        details['单价'] = details[self.get_column_name(column_config['unit_price_column'])]
+        details['小计金额'] = details[self.get_column_name(column_config['subtotal_column'])]
+        details['税额'] = details[self.get_column_name(column_config['tax_amount_column'])]
+        details['税率'] = details[self.get_column_name(column_config['tax_amount_column'])] / details[self.get_column_name(column_config['subtotal_column'])]
+        details['小计价税'] = details[self.get_column_name(column_config['total_amount_column'])]
+        details['部门'] = details[self.get_column_name(column_config['department_column'])].apply(self.format_mixed_text)
+        # 一次性读取时这些列含空行，总是float64；流式处理的一批收货单可能全是整数，统一类型后两种方式的数据和备份哈希相同
+        for field in NUMERIC_FIELDS:
+            if pd.api.types.is_integer_dtype(details[field].dtype):
+                details[field] = details[field].astype('float64')
+        return details[RECEIPT_COLUMNS]
+    
+    def iter_raw_files(self):
+        """读取阶段：依次将输入读入内存，逐个产出 (输入, 名称, 数据, 布局, 是否来自解析缓存)
+
+        输入可以是文件路径、文件对象或已读入的原始DataFrame，名称用于进度、日志和错误报告。
+        命中解析缓存时数据为已清洗的收货明细（布局为None），否则为原始数据，列名为 Unnamed: 列号；
+        解析缓存只用于文件路径。
+        """
+        for index, input_file in enumerate(self.input_files, 1):
+            self.check_cancelled()
+            name = input_name(input_file, index)
+            if self.parse_cache is not None and isinstance(input_file, str):
+                cached = self.parse_cache.load(input_file)
+                if cached is not None:
+                    logging.info(f'使用解析缓存：{input_file}，{len(cached)}条记录')
+                    self.progress(f'使用解析缓存：{os.path.basename(input_file)}')
+                    yield input_file, name, cached, None, True
+                    continue
+            layout = self.file_layout(input_file, name)
+            if isinstance(input_file, pd.DataFrame):
+                yield input_file, name, input_file, layout, False
+                continue
+            self.progress(f'开始读取文件：{os.path.basename(name)}')
+            logging.info(f'开始读取文件：{name}')
+            
+            # 读取原始文件（跳过表头及以上的行），无法读取的文件记入错误报告，继续处理其他文件
+            try:
+                df = pd.read_excel(input_file, header=None, skiprows=layout.header_row)
+            except Exception as e:
+                self.record_error('读取', str(e), name)
+                continue
+            df.columns = [self.get_column_name(i) for i in range(len(df.columns))]
+            logging.info(f'文件读取完成，共{len(df)}行数据')
+            self.progress(f'文件读取完成，共{len(df)}行数据')
+            yield input_file, name, df, layout, False
+    
+    def read_files(self, dedup_index, metrics):
+        """将所有输入整体读入内存并清洗，返回合并后的数据
+
+        读取在后台线程中进行，清洗第N个文件的同时读取第N+1个文件。
+        """
+        all_final_data = []
+        
+        raw_files = prefetch(self.iter_raw_files(), metrics.stage('读取'), metrics.stage('清洗'),
+                             self.performance_config['pipeline_queue_size'])
+        for input_file, name, df, layout, cached in raw_files:
+            if cached:
+                file_df = df
+            else:
+                error_count = len(self.errors)
+                file_df = self.clean_file(name, df, layout)
+                if file_df is not None:
+                    self.changed_suppliers.update(file_df['供应商名称'].dropna().unique())
+                    # 清洗时有收货单出错的文件不缓存，下次仍重新解析并报告错误
+                    if self.parse_cache is not None and isinstance(input_file, str) and len(self.errors) == error_count:
+                        self.parse_cache_entries.append((input_file, file_df))
+            if file_df is None:
+                continue
+            
+            # 跨文件去重：删除与已读取文件完全相同的收货单
+            if dedup_index is not None:
+                file_df = dedup_index.add_file(file_df, name)
+            all_final_data.append(file_df)
+            logging.info(f'文件处理完成，共整理{len(file_df)}条记录')
+            self.progress(f'文件处理完成，共整理{len(file_df)}条记录')
+        
+        # 合并所有文件的数据
+        if not all_final_data:
+            raise ValueError('所有输入文件都没有可处理的收货明细')
+        return pd.concat(all_final_data, ignore_index=True)
+    
+    def clean_file(self, input_file, df, layout):
+        """清洗一个输入文件的原始数据（按layout的列），返回合并后的收货明细，没有有效明细时返回None"""
+        column_config = layout.columns
+        # 缺少必需列的文件无法清洗，记入错误报告，继续处理其他文件
+        missing = self.missing_columns(df.columns, column_config)
+        if missing:
+            self.record_error('读取', f'缺少列：{"、".join(missing)}', input_file)
+            return None
+        
+        # 获取收货单号的行索引
+        receipt_column_name = self.get_column_name(column_config['receipt_column'])
+        receipt_rows = df[df[receipt_column_name].astype(str).str.match(r'^(RTS)?000\d+$', na=False)].index
+        
+        # 创建一个空的列表来存储所有明细数据
+        all_details = []
+        
+        # 遍历每个收货单号之间的行
+        total_receipts = len(receipt_rows)
+        for i in range(total_receipts):
+            self.check_cancelled()
+            start_idx = receipt_rows[i]
+            end_idx = receipt_rows[i+1] if i < len(receipt_rows)-1 else len(df)
+            
+            receipt = df.loc[start_idx, self.get_column_name(column_config['receipt_column'])]
+            supplier = df.loc[start_idx, self.get_column_name(column_config['supplier_column'])]
+            date = df.loc[start_idx, self.get_column_name(column_config['date_column'])]
+            
+            # 获取明细行（跳过收货单号行），清洗失败的收货单记入错误报告
+            try:
+                details = self.clean_receipt(receipt, supplier, date, df.loc[start_idx+1:end_idx-1],
+                                             layout.first_row, column_config)
+            except Exception as e:
+                self.record_receipt_error(input_file, receipt, supplier, start_idx + layout.first_row, e)
+                continue
+            if details is not None:
+                all_details.append(details)
+            
+            progress = f'处理进度：{i+1}/{total_receipts}'
+            self.progress(progress)
+            logging.info(progress)
+        
+        # 合并所有明细数据
+        if not all_details:
+            return None
+        return pd.concat(all_details, ignore_index=True)
+    
+    def iter_raw_receipt_batches(self):
+        """读取阶段：依次流式读取所有输入文件，每次产出 (输入文件, 布局, 最多STREAM_CHUNK_RECEIPTS张收货单的原始行)"""
+        for input_file in self.input_files:
+            layout = self.file_layout(input_file, input_file)
+            self.progress(f'开始读取文件：{os.path.basename(input_file)}')
+            logging.info(f'开始流式读取文件：{input_file}')
+            receipt_count = 0
+            # 文件无法读取或读到一半出错时记入错误报告，已产出的收货单照常处理，继续读取其他文件
+            try:
+                for batch in iter_receipt_batches(input_file, layout.width, layout.columns['receipt_column'],
+                                                  STREAM_CHUNK_RECEIPTS, layout.header_row):
+                    receipt_count += len(batch)
+                    yield input_file, layout, batch
+            except Exception as e:
+                self.record_error('读取', f'{e}（此前的{receipt_count}张收货单已处理）', input_file)
+                continue
+            logging.info(f'文件读取完成：{os.path.basename(input_file)}，共{receipt_count}张收货单')
+    
+    def clean_receipt_batch(self, input_file, layout, batch):
+        """清洗阶段：清洗一批收货单的原始行（按layout的列），返回合并后的数据，没有有效明细时返回None
+
+        清洗失败的收货单记入错误报告，不影响同一批的其他收货单。
+        """
+        columns = [self.get_column_name(i) for i in range(layout.width)]
+        receipt_column = layout.columns['receipt_column']
+        supplier_column = layout.columns['supplier_column']
+        date_column = layout.columns['date_column']
+        
+        cleaned = []
+        for row_number, receipt_row, detail_rows in batch:
+            try:
+                # 明细行紧接在收货单号所在行之后
+                details = self.clean_receipt(receipt_row[receipt_column], receipt_row[supplier_column],
+                                             receipt_row[date_column], pd.DataFrame(detail_rows, columns=columns),
+                                             row_number + 1, layout.columns)
+            except Exception as e:
+                self.record_receipt_error(input_file, receipt_row[receipt_column], receipt_row[supplier_column],
+                                          row_number, e)
+                continue
+            if details is not None:
+                cleaned.append(details)
+        return pd.concat(cleaned, ignore_index=True) if cleaned else None
+    
+    def read_files_streaming(self, dedup_index, metrics):
+        """流式读取所有输入文件，清洗后的数据按供应商分区暂存到磁盘
+
+        读取在后台线程中进行，与清洗、去重和分区写入同时进行，两者之间的队列长度有上限。
+        """
+        partitions = SupplierPartitions()
+        logging.info(f'临时分区目录：{partitions.directory}')
+        try:
+            receipt_count = 0
+            batches = prefetch(self.iter_raw_receipt_batches(), metrics.stage('读取'), metrics.stage('清洗'),
+                               self.performance_config['pipeline_queue_size'])
+            for input_file, layout, batch in batches:
+                self.check_cancelled()
+                chunk = self.clean_receipt_batch(input_file, layout, batch)
+                receipt_count += len(batch)
+                progress = f'处理进度：已处理{receipt_count}张收货单'
+                self.progress(progress)
+                logging.info(progress)
+                if chunk is None:
+                    continue
+                # 跨文件去重：去重索引只保存每张收货单的指纹，可以逐批登记
+                if dedup_index is not None:
+                    chunk = dedup_index.add_file(chunk, input_file)
+                partitions.append(chunk)
+        except BaseException:
+            partitions.cleanup()
+            raise
+        return partitions
+    
+    def iter_report_jobs(self, supplier_groups, total_suppliers, summary_entries, department_fanout=None):
+        """按供应商的对账周期规则切分数据，逐个产出 (供应商名称, 周期开始, 周期结束, 周期数据, 输出文件)
+
+        每份对账单的合计同时加入summary_entries，用于生成汇总表；周期数据同时累计到department_fanout，
+        用于生成成本中心报表。
+        """
+        current_supplier = 0
+        
+        for supplier_name, supplier_data in supplier_groups:
+            self.check_cancelled()
+            if pd.notna(supplier_name) and supplier_name.strip():
+                current_supplier += 1
+                self.progress(f'正在生成供应商对账单 ({current_supplier}/{total_suppliers}): {supplier_name}')
+                
+                # 一个供应商的全部周期切分成功后才加入汇总和成本中心报表，切分失败的供应商整体记入错误报告
+                try:
+                    supplier_jobs = list(self.slice_supplier(supplier_name, supplier_data))
+                    entries = [summary_entry(supplier_name, period_data, period_start, period_end, output_file)
+                               for supplier_name, period_start, period_end, period_data, output_file in supplier_jobs]
+                except Exception as e:
+                    self.record_error('切分', str(e), supplier=supplier_name)
+                    continue
+                summary_entries.extend(entries)
+                if department_fanout is not None:
+                    for supplier_name, period_start, period_end, period_data, output_file in supplier_jobs:
+                        department_fanout.add(period_end.strftime('%Y%m'), supplier_name, period_data)
+                yield from supplier_jobs
+    
+    def slice_supplier(self, supplier_name, supplier_data):
+        """按供应商的对账周期规则切分数据，逐个产出 (供应商名称, 周期开始, 周期结束, 周期数据, 输出文件)"""
+        # 按收货日期和收货单号排序
+        supplier_data = supplier_data.sort_values(['收货日期', '收货单号'])
+        
+        # 按供应商的对账周期规则切分数据，每个周期生成一份对账单
+        rule = self.billing_period_rules.get(supplier_name, self.billing_period_rules['default'])
+        for period_start, period_end, period_data in self.slice_billing_periods(supplier_data, rule):
+            # 以周期结束日所在月份归档，年月目录在保存对账单时创建
+            year_month_dir = self.output_path('供应商对账明细', period_end.strftime('%Y%m'))
+            
+            if rule[0] == 'days':
+                file_name = f'{supplier_name}_{period_start.strftime("%Y%m%d")}-{period_end.strftime("%Y%m%d")}_对账明细.xlsx'
+            else:
+                file_name = f'{supplier_name}_对账明细.xlsx'
+            yield supplier_name, period_start, period_end, period_data, os.path.join(year_month_dir, file_name)
+    
+    def write_consolidated_reports(self, report_jobs, template):
+        """合并输出：每个年月目录生成一个合并对账明细工作簿，每个供应商（对账周期）一个工作表
+
+        Returns:
+            dict: 对账单文件 -> 合并工作簿中对应工作表的 (显示文本, 链接)，供汇总表使用
+        """
+        reports = {}
+        links = {}
+        for supplier_name, period_start, period_end, period_data, output_file in report_jobs:
+            self.check_cancelled()
+            year_month_dir = os.path.dirname(output_file)
+            report = reports.get(year_month_dir)
+            if report is None:
+                year_month = os.path.basename(year_month_dir)
+                report = ConsolidatedReport(os.path.join(year_month_dir, f'全部供应商对账明细_{year_month}.xlsx'),
+                                            template, f'供应商对账明细目录 {year_month}')
+                reports[year_month_dir] = report
+            # 工作表名称与单独输出时的文件名一致（供应商名称，按天数切分时包含周期）
+            sheet_name = os.path.basename(output_file).removesuffix('_对账明细.xlsx')
+            try:
+                sheet_name = report.add_supplier(supplier_name, period_data, period_start, period_end, sheet_name)
+            except Exception as e:
+                self.report_failed(supplier_name, output_file, str(e))
+                continue
+            workbook_name = os.path.basename(report.output_file)
+            links[output_file] = (f'{workbook_name} / {sheet_name}', f"{workbook_name}#'{sheet_name}'!A1")
+        
+        # 取消时尚未保存的合并工作簿直接丢弃，已保存的工作簿都是完整的
+        for report in reports.values():
+            self.check_cancelled()
+            report.save(self.output_target(report.output_file))
+            self.report_completed(report.output_file)
+            self.progress(f'已生成合并对账明细工作簿：{os.path.basename(report.output_file)}')
+        return links
+    
+    def output_target(self, output_file):
+        """工作簿的保存目标：run() 处理时为输出文件，process() 处理时为以输出文件为键保存的内存缓冲区"""
+        if self.memory_outputs is None:
+            return output_file
+        buffer = io.BytesIO()
+        buffer.name = output_file
+        self.memory_outputs[output_file] = buffer
+        return buffer
+    
+    def write_reports(self, report_jobs, template):
+        """在处理线程中依次生成对账单，生成失败的对账单记入错误报告后跳过"""
+        for supplier_name, period_start, period_end, period_data, output_file in report_jobs:
+            self.check_cancelled()
+            try:
+                generate_supplier_report(supplier_name, period_data, period_start, period_end,
+                                         self.output_target(output_file), self.company_name, template)
+            except Exception as e:
+                self.report_failed(supplier_name, output_file, str(e))
+                continue
+            self.report_completed(output_file)
+    
+    def write_master_summaries(self, summary_entries, links, company_name):
+        """每个年月目录生成一个汇总表 _汇总.xlsx，每份对账单一行，链接到对账单"""
+        entries_by_dir = {}
+        for entry in summary_entries:
+            # 生成失败的对账单不列入汇总表，避免链接到不存在的文件
+            if entry['对账明细'] in self.failed_reports:
+                continue
+            entries_by_dir.setdefault(os.path.dirname(entry['对账明细']), []).append(entry)
+        for year_month_dir, entries in sorted(entries_by_dir.items()):
+            output_file = os.path.join(year_month_dir, '_汇总.xlsx')
+            title = f'供应商对账汇总 {os.path.basename(year_month_dir)}'
+            export_master_summary(entries, self.output_target(output_file), title, company_name, links)
+            self.progress(f'已生成供应商汇总表：{output_file}')
+    
+    def write_backup(self, partitions, final_df):
+        """按列压缩备份清洗后的数据，文件名为内容哈希，内容相同的备份只保留一份；流式处理时逐个分区写入"""
+        writer = ColumnarBackupWriter(self.output_path('bak'), RECEIPT_COLUMNS)
+        try:
+            for frame in (partitions.iter_frames() if partitions is not None else [final_df]):
+                self.check_cancelled()
+                writer.append(frame)
+            backup_file, created = writer.close()
+        except BaseException:
+            writer.discard()
+            raise
+        if created:
+            logging.info(f'数据已备份至：{backup_file}（{writer.rows}行）')
+        else:
+            logging.info(f'数据与已有备份相同，未重复备份：{backup_file}')
+        
+        # 按需同时导出Excel格式的备份
+        if self.backup_config['export_xlsx']:
+            export_backup_to_excel(backup_file, os.path.splitext(backup_file)[0] + '.xlsx')
+        
+        apply_retention(self.output_path('bak'), self.backup_config['retention_days'], self.backup_config['max_backups'])
+    
+    def log_resume_hint(self):
+        """运行中断时提示可以从检查点续跑"""
+        if self.checkpoint is not None and self.checkpoint.completed:
+            message = (f'已完成的{len(self.checkpoint.completed)}份对账单已记录在运行检查点，'
+                       f'重新处理相同的文件（或使用 --resume）时只生成剩余的对账单')
+            logging.info(message)
+            self.progress(message)
+    
+    def run(self):
+        """处理所有输入文件，返回 (是否成功, 错误信息)"""
+        self.reset_run_state()
+        partitions = None
+        backup_task = None
+        metrics = self.metrics = RunMetrics()
+        start_time = time.perf_counter()
+        try:
+            # 创建日志目录
+            if not os.path.exists('logs'):
+                os.makedirs('logs')
+            
+            # 配置日志
+            log_filename = os.path.join('logs', f'process_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
+            logging.basicConfig(
+                level=logging.INFO,
+                format='%(asctime)s - %(levelname)s - %(message)s',
+                handlers=[
+                    logging.FileHandler(log_filename, encoding='utf-8'),
+                    logging.StreamHandler()
+                ]
+            )
+            
+            # 单独输出时记录运行检查点，中断后可以续跑；合并工作簿只能整体重新生成，不使用检查点
+            if self.report_output_mode != 'workbook':
+                self.checkpoint = RunCheckpoint(self.input_files, self.output_path(CHECKPOINT_FILE),
+                                                self.config.config_path)
+                if self.resume:
+                    self.checkpoint.resume()
+                else:
+                    self.checkpoint.start()
+            elif self.resume:
+                logging.info('合并输出模式不支持续跑，重新生成全部合并工作簿')
+            
+            dedup_index = ReceiptDedupIndex() if self.dedup_enabled else None
+            final_df = None
+            
+            # 输入文件总大小超过阈值时改用流式处理：逐行读取并按供应商分区暂存到磁盘，内存占用与输入大小无关
+            total_size = input_size_mb(self.input_files)
+            threshold = self.performance_config['streaming_threshold_mb']
+            if total_size >= threshold:
+                logging.info(f'输入文件共{total_size:.1f}MB，达到流式处理阈值{threshold}MB，使用流式处理')
+                self.progress(f'输入文件共{total_size:.1f}MB，使用流式处理')
+                # 流式处理不经过解析缓存，无法确定哪些供应商的数据有变化，全部重新生成
+                if self.incremental:
+                    logging.info('流式处理不使用解析缓存，重新生成全部对账单')
+                    self.incremental = False
+                partitions = self.read_files_streaming(dedup_index, metrics)
+                supplier_groups = partitions.iter_suppliers()
+                total_suppliers = len(partitions)
+                total_rows = partitions.row_count
+            else:
+                final_df = self.read_files(dedup_index, metrics)
+                supplier_groups = final_df.groupby('供应商名称')
+                total_suppliers = len(final_df['供应商名称'].unique())
+                total_rows = len(final_df)
+            self.total_rows = total_rows
+            logging.info(f'所有文件处理完成，共整理{total_rows}条记录')
+            self.progress(f'所有文件处理完成，共整理{total_rows}条记录')
+            
+            # 创建供应商对账明细表文件夹
+            if not os.path.exists(self.output_path('供应商对账明细')):
+                os.makedirs(self.output_path('供应商对账明细'))
+                logging.info('创建供应商对账明细文件夹')
+            
+            company_name = self.company_name
+            
+            # 输出重复收货单报告
+            if dedup_index is not None:
+                self.write_duplicate_report(dedup_index, company_name)
+            
+            # 备份在后台线程中写入，与生成对账单同时进行
+            backup_task = BackgroundTask(self.write_backup, metrics.stage('备份'), partitions, final_df)
+            
+            # 按供应商名称分组并生成对账明细表，配置了多个子进程时在进程池中并行生成；
+            # 按对账周期切分数据（流式处理时还包括读取分区）在后台线程中提前进行
+            summary_entries = []
+            report_links = {}
+            department_fanout = DepartmentFanout() if self.department_reports else None
+            report_jobs = prefetch(self.iter_report_jobs(supplier_groups, total_suppliers, summary_entries,
+                                                         department_fanout),
+                                   metrics.stage('切分'), metrics.stage('生成对账单'),
+                                   self.performance_config['pipeline_queue_size'])
+            render_workers = self.performance_config['render_workers']
+            if self.report_output_mode == 'workbook':
+                # 所有供应商写入同一个工作簿，只能在处理线程中依次写入
+                if render_workers > 1:
+                    logging.info('合并输出模式不使用进程池，在处理线程中依次写入')
+                template = ReportTemplate(company_name, self.report_template_file)
+                report_links = self.write_consolidated_reports(report_jobs, template)
+            elif render_workers > 1:
+                render_reports_in_pool(self.pending_report_jobs(report_jobs), company_name, self.report_template_file, render_workers,
+                                       self.progress, self.check_cancelled, self.report_completed, self.report_failed,
+                                       self.render_pool)
+            else:
+                # 对账单模板每次运行只编译一次，每份对账单只填入数据和供应商信息
+                template = ReportTemplate(company_name, self.report_template_file)
+                self.write_reports(self.pending_report_jobs(report_jobs), template)
+            
+            # 汇总表、成本中心报表、备份和历史库只在全部对账单生成后写入，取消的运行不会留下不完整的汇总
+            self.check_cancelled()
+            
+            # 汇总表使用切分时已经计算好的每份对账单合计，不再读取数据
+            self.write_master_summaries(summary_entries, report_links, company_name)
+            
+            # 成本中心报表同样使用切分时累计的汇总数据
+            if department_fanout is not None:
+                department_files = department_fanout.write(self.output_path('成本中心明细'), company_name, self.progress)
+                logging.info(f'共生成{len(department_files)}个成本中心明细')
+            
+            # 等待备份完成
+            backup_task.result()
+            self.check_cancelled()
+            
+            # 写入历史收货明细库（流式处理时逐个分区写入）
+            self.save_to_history_store(partitions.iter_frames() if partitions is not None else [final_df])
+            
+            metrics.log()
+            if self.checkpoint is not None:
+                self.checkpoint.remove()
+            # 对账单全部生成后才写入解析缓存，失败或取消的运行下次仍重新解析这些文件并重新生成其供应商的对账单
+            for input_file, file_df in self.parse_cache_entries:
+                self.parse_cache.store(input_file, file_df)
+            # 处理失败的文件、收货单和对账单已跳过，汇总在错误报告中，运行本身仍然成功
+            error_msg = self.write_error_report(company_name)
+            self.progress('处理完成！')
+            return True, error_msg
+            
+        except ProcessCancelled:
+            # 备份线程也会检查取消标志并删除未完成的备份临时文件
+            if backup_task is not None:
+                backup_task.thread.join()
+            for output_file in self.completed_reports:
+                logging.info(f'取消前已完成：{output_file}')
+            error_msg = f'处理已取消，取消前已生成{len(self.completed_reports)}份对账单，汇总表、成本中心报表和历史库未更新'
+            logging.warning(error_msg)
+            self.progress(error_msg)
+            self.write_error_report(self.company_name)
+            self.log_resume_hint()
+            return False, error_msg
+        except Exception as e:
+            error_msg = f'处理过程中出现错误：{str(e)}'
+            logging.error(error_msg)
+            self.progress(error_msg)
+            self.write_error_report(self.company_name)
+            self.log_resume_hint()
+            return False, error_msg
+        finally:
+            # 出错时也要等待备份线程结束，再清理它正在读取的临时分区
+            if backup_task is not None:
+                backup_task.thread.join()
+            if partitions is not None:
+                partitions.cleanup()
+            self.elapsed = time.perf_counter() - start_time
+    
+    def process(self, inputs):
+        """库接口：处理收货明细，返回ReconResult，不写入任何文件
+
+        inputs 的每一项可以是文件路径、文件对象（如BytesIO）或按 pd.read_excel(path, skiprows=8) 读入的原始DataFrame。
+        对账单（或合并工作簿）、汇总表和成本中心报表在内存中生成，路径与run()的输出布局相同，需要时用
+        ReconResult.save() 写入目录（不使用output_root）。不配置日志，不写备份、历史库、运行检查点、布局缓存和错误报告文件，
+        也不使用进程池和流式处理。没有可处理的收货明细时抛出ValueError，取消时抛出ProcessCancelled。
+        """
+        self.reset_run_state()
+        # 只在本次调用中使用内存输出和不写缓存的布局识别器，结束后恢复，之后仍可调用run()
+        saved = (self.input_files, self.output_root, self.layout_cache_path, self.layout_detector)
+        self.input_files = list(inputs)
+        self.memory_outputs = {}
+        self.output_root = ''
+        self.layout_cache_path = None
+        self.layout_detector = None
+        metrics = self.metrics = RunMetrics()
+        start_time = time.perf_counter()
+        try:
+            dedup_index = ReceiptDedupIndex() if self.dedup_enabled else None
+            final_df = self.read_files(dedup_index, metrics)
+            self.total_rows = len(final_df)
+            
+            summary_entries = []
+            report_links = {}
+            department_fanout = DepartmentFanout() if self.department_reports else None
+            report_jobs = self.iter_report_jobs(final_df.groupby('供应商名称'), final_df['供应商名称'].nunique(),
+                                                summary_entries, department_fanout)
+            template = ReportTemplate(self.company_name, self.report_template_file)
+            if self.report_output_mode == 'workbook':
+                report_links = self.write_consolidated_reports(report_jobs, template)
+            else:
+                self.write_reports(report_jobs, template)
+            self.write_master_summaries(summary_entries, report_links, self.company_name)
+            
+            departments = []
+            if department_fanout is not None:
+                department_fanout.write('成本中心明细', self.company_name, self.progress, self.output_target)
+                for year_month, aggregates in department_fanout.aggregates():
+                    aggregates.insert(0, '年月', year_month)
+                    departments.append(aggregates)
+        finally:
+            self.elapsed = time.perf_counter() - start_time
+            self.input_files, self.output_root, self.layout_cache_path, self.layout_detector = saved
+        
+        summary = [entry for entry in summary_entries if entry['对账明细'] not in self.failed_reports]
+        workbooks = {output_file: buffer.getvalue() for output_file, buffer in self.memory_outputs.items()
+                     if output_file not in self.failed_reports}
+        departments = pd.concat(departments, ignore_index=True) if departments else pd.DataFrame()
+        duplicates = dedup_index.report() if dedup_index is not None else pd.DataFrame()
+        return ReconResult(final_df, pd.DataFrame(summary), departments, duplicates,
+                           pd.DataFrame(self.errors, dtype=object), workbooks, self.run_summary())
+    
+    def run_summary(self):
+        """本次运行的指标（可序列化为JSON）：耗时、行数、生成的对账单数、跳过的单元数和各阶段统计"""
+        return {'elapsed': round(self.elapsed, 3), 'rows': self.total_rows,
+                'rows_per_second': round(self.total_rows / self.elapsed, 1) if self.elapsed > 0 else 0,
+                'reports': len(self.completed_reports), 'errors': len(self.errors),
+                'stages': self.metrics.as_dict() if self.metrics is not None else {}}
@@ -0,0 +1,244 @@
+import os
+import re
+import json
+import hashlib
+import logging
+from itertools import islice
+
+from openpyxl.utils import get_column_letter
+
+from recon_streaming import HEADER_ROWS, RECEIPT_PATTERN, iter_xlsx_rows, iter_xls_rows
+
+# 读取前预扫描的行数，表头和第一张收货单应在其中
+DEFAULT_SCAN_ROWS = 30
+
+# 一行中至少识别出几个不同字段的表头文字才视为表头行
+MIN_HEADER_MATCHES = 3
+
+# 各列配置项的表头文字：ERP导出的表头（中文，或中英文对照），不区分大小写，忽略空格和末尾的标点。
+# 只收录完整的表头文字，不收录Date、Total、Unit等通用的英文词，以免抬头中的其他文字被误认为表头；
+# 其他表头文字可以在config.ini的[HeaderCaptions]中补充
+HEADER_CAPTIONS = {
+    'receipt_column': ('收货单号',),
+    'supplier_column': ('供应商', '供应商名称'),
+    'date_column': ('收货日期',),
+    'product_name_column': ('商品名称', '商品名称 Article'),
+    'quantity_column': ('实收数量', '实收数量 QTY'),
+    'unit_column': ('基本单位', '基本单位 Unit'),
+    'unit_price_column': ('单价', '单价 Unit Price'),
+    'subtotal_column': ('小计金额', '净额', '净额 Net'),
+    'tax_amount_column': ('税额', '税额 VAT'),
+    'total_amount_column': ('小计价税', '含税总额', '含税总额 Gross'),
+    'department_column': ('部门', '成本中心', '成本中心 CostCenter')
+}
+
+# 一个表头单元格可能写了两行表头的文字，例如“收货单号/商品名称”
+CAPTION_SEPARATORS = re.compile(r'[/／|\n]')
+
+
+def normalize_caption(text):
+    """表头文字的比较形式：去掉空格和末尾的标点，不区分大小写"""
+    return re.sub(r'\s+', '', str(text)).rstrip('.:：').lower()
+
+
+def cell_text(value):
+    return '' if value is None else str(value).strip()
+
+
+def row_signature(row_number, row):
+    """布局签名：表头行的行号和各单元格文字的哈希，末尾的空单元格不计入"""
+    texts = [cell_text(value) for value in row]
+    while texts and not texts[-1]:
+        texts.pop()
+    return hashlib.sha256(f'{row_number}|{chr(31).join(texts)}'.encode('utf-8')).hexdigest()
+
+
+def read_leading_rows(input_file, count):
+    """读取第一个工作表的前count行（只读模式，不载入整个文件），文件对象读取后回到开头"""
+    if isinstance(input_file, str) and input_file.lower().endswith('.xls'):
+        rows = iter_xls_rows(input_file, 0)
+    else:
+        rows = iter_xlsx_rows(input_file, 0)
+    try:
+        return [list(row) for row in islice(rows, count)]
+    finally:
+        rows.close()
+        if hasattr(input_file, 'seek'):
+            input_file.seek(0)
+
+
+class SheetLayout:
+    """一个收货明细表的布局：表头所在的Excel行号（数据从下一行开始）和各配置项的列号（从0开始）
+
+    source 为布局来源：header 按表头文字识别列，receipt 按第一张收货单的位置确定数据起始行、列沿用配置，
+    config 未能识别，全部沿用默认布局。unmatched 为按表头识别时表头中没有找到的配置项。
+    """
+
+    def __init__(self, header_row, columns, source='config', signature=None, unmatched=()):
+        self.header_row = header_row
+        self.columns = columns
+        self.source = source
+        self.signature = signature
+        self.unmatched = list(unmatched)
+
+    @property
+    def first_row(self):
+        """第一个数据行的Excel行号"""
+        return self.header_row + 1
+
+    @property
+    def width(self):
+        """读取的列数，覆盖所有配置项的列"""
+        return max(self.columns.values()) + 1
+
+
+class LayoutDetector:
+    """读取前预扫描每个输入文件的前几行，找到表头行并按表头文字确定各配置项的列
+
+    columns 为config.ini的列配置（数字索引），表头中没有识别出的配置项沿用配置：与已识别的配置项配置为同一列的
+    （例如商品名称与收货单号都在A列）跟随该配置项，其余使用配置的列号。没有表头文字时以第一张收货单的
+    位置确定数据起始行。
+
+    识别结果按布局签名（表头行的哈希）缓存，之后表头相同的文件只核对签名和收货单号列，不再识别；
+    cache_path 为缓存文件（JSON），为None时只在本次运行内缓存。列配置或表头文字变化后缓存失效。
+    """
+
+    def __init__(self, columns, captions=None, scan_rows=DEFAULT_SCAN_ROWS, cache_path=None):
+        self.columns = dict(columns)
+        self.scan_rows = max(scan_rows, HEADER_ROWS + 1)
+        self.cache_path = cache_path
+        self.captions = {}
+        for key in self.columns:
+            texts = list(HEADER_CAPTIONS.get(key, ())) + list((captions or {}).get(key, ()))
+            self.captions[key] = {normalize_caption(text) for text in texts if normalize_caption(text)}
+        self.config_signature = hashlib.sha256(json.dumps(
+            [self.columns, {key: sorted(texts) for key, texts in self.captions.items()}],
+            sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+        self.layouts = self.load_cache()
+
+    def default_layout(self):
+        """默认布局：前HEADER_ROWS行为抬头和表头，列按配置"""
+        return SheetLayout(HEADER_ROWS, dict(self.columns))
+
+    def load_cache(self):
+        """载入布局缓存（签名 -> 布局），缓存不存在、无法读取或列配置已变化时为空"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f'读取布局缓存失败：{e}')
+            return {}
+        if cache.get('config') != self.config_signature:
+            logging.info('列配置或表头文字已变化，布局缓存失效')
+            return {}
+        return cache.get('layouts', {})
+
+    def save_cache(self):
+        """先写入临时文件再重命名，中断时不会留下不完整的缓存"""
+        if not self.cache_path:
+            return
+        temp_file = f'{self.cache_path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'config': self.config_signature, 'layouts': self.layouts}, f, ensure_ascii=False, indent=1)
+            os.replace(temp_file, self.cache_path)
+        except OSError as e:
+            logging.error(f'写入布局缓存失败：{e}')
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    def detect(self, input_file):
+        """返回输入文件（路径或文件对象）的布局，无法预扫描时返回默认布局"""
+        try:
+            rows = read_leading_rows(input_file, self.scan_rows)
+        except Exception as e:
+            logging.warning(f'预扫描表头失败，按默认布局读取：{e}')
+            return self.default_layout()
+        layout = self.cached_layout(rows)
+        if layout is not None:
+            return layout
+        layout = self.detect_layout(rows)
+        if layout.signature is not None:
+            self.layouts[layout.signature] = {'header_row': layout.header_row, 'columns': layout.columns,
+                                              'source': layout.source, 'unmatched': layout.unmatched}
+            self.save_cache()
+        return layout
+
+    def cached_layout(self, rows):
+        """与缓存中某个布局的表头行签名相同，并且其后确有收货单号在该布局的收货单号列时返回该布局"""
+        for signature, cached in self.layouts.items():
+            header_row = cached['header_row']
+            if header_row > len(rows) or row_signature(header_row, rows[header_row - 1]) != signature:
+                continue
+            layout = SheetLayout(header_row, cached['columns'], cached['source'], signature,
+                                 cached.get('unmatched', ()))
+            if self.first_receipt_row(rows, layout.columns['receipt_column'], header_row) is not None:
+                return layout
+        return None
+
+    def first_receipt_row(self, rows, column, after_row=0):
+        """after_row之后第一个在column列有收货单号的Excel行号，预扫描的行中没有时返回None"""
+        for row_number, row in enumerate(rows[after_row:], after_row + 1):
+            if column < len(row) and RECEIPT_PATTERN.match(cell_text(row[column])):
+                return row_number
+        return None
+
+    def match_captions(self, row):
+        """识别一行中的表头文字，返回 配置项 -> 列号列表（从左到右）"""
+        found = {}
+        for index, value in enumerate(row):
+            for part in CAPTION_SEPARATORS.split(cell_text(value)):
+                caption = normalize_caption(part)
+                if not caption:
+                    continue
+                for key, texts in self.captions.items():
+                    if caption in texts and index not in found.get(key, []):
+                        found.setdefault(key, []).append(index)
+        return found
+
+    def detect_layout(self, rows):
+        """识别表头行和各配置项的列：优先按表头文字，其次按第一张收货单的位置"""
+        best_row, best = None, {}
+        for row_number, row in enumerate(rows, 1):
+            found = self.match_captions(row)
+            if len(found) >= MIN_HEADER_MATCHES and len(found) > len(best):
+                best_row, best = row_number, found
+        if best_row is not None:
+            columns = {}
+            for key, index in self.columns.items():
+                if key in best:
+                    # 多个单元格的表头文字相同时取配置的列，或离配置的列最近的一列（距离相同时取左边的）
+                    columns[key] = min(best[key], key=lambda column: (abs(column - index), column))
+            unmatched = [key for key in self.columns if key not in best]
+            for key in unmatched:
+                # 没有表头文字的配置项跟随与其配置为同一列的已识别配置项
+                index = self.columns[key]
+                same = [other for other in best if self.columns[other] == index]
+                columns[key] = columns[same[0]] if same else index
+            return SheetLayout(best_row, {key: columns[key] for key in self.columns}, 'header',
+                               row_signature(best_row, rows[best_row - 1]), unmatched)
+
+        receipt_row = self.first_receipt_row(rows, self.columns['receipt_column'])
+        if receipt_row is not None:
+            header_row = receipt_row - 1
+            return SheetLayout(header_row, dict(self.columns), 'receipt',
+                               row_signature(header_row, rows[header_row - 1]) if header_row else None)
+        return self.default_layout()
+
+    def mismatches(self, layout):
+        """布局与config.ini（默认第HEADER_ROWS行为表头，列按[Columns]）不一致之处的说明"""
+        notes = []
+        if layout.header_row != HEADER_ROWS:
+            notes.append(f'表头在第{layout.header_row}行（默认第{HEADER_ROWS}行），数据从第{layout.first_row}行开始')
+        for key, index in layout.columns.items():
+            if index != self.columns[key]:
+                notes.append(f'{key}配置为{get_column_letter(self.columns[key] + 1)}列，'
+                             f'表头在{get_column_letter(index + 1)}列')
+        return notes
+
+    def unmatched_notes(self, layout):
+        """按表头识别时表头中没有找到的配置项及其沿用的列的说明"""
+        return [f'{key}沿用{get_column_letter(layout.columns[key] + 1)}列' for key in layout.unmatched]
@@ -0,0 +1,175 @@
+import time
+import queue
+import logging
+import threading
+
+# 流水线阶段之间的默认队列长度
+DEFAULT_QUEUE_SIZE = 4
+
+# 队列结束标记
+_DONE = object()
+
+
+class _Failure:
+    """生产者线程中的异常，交给消费者重新抛出"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class StageMetrics:
+    """流水线中一个阶段的运行统计
+
+    idle 为阶段等待其他阶段的时间：生产者等待队列空位（下游慢），消费者等待队列数据（上游慢）。
+    利用率 = (运行时间 - 等待时间) / 运行时间。
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.idle = 0.0
+        self.started = None
+        self.finished = None
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.depth_max = 0
+
+    def start(self):
+        if self.started is None:
+            self.started = time.perf_counter()
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def record_depth(self, depth):
+        """记录消费时输入队列的长度"""
+        self.depth_samples += 1
+        self.depth_total += depth
+        self.depth_max = max(self.depth_max, depth)
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def utilisation(self):
+        if self.elapsed <= 0:
+            return 0.0
+        return max(self.elapsed - self.idle, 0.0) / self.elapsed
+
+    def summary(self):
+        text = (f'{self.name}：{self.items}项，耗时{self.elapsed:.2f}秒，等待{self.idle:.2f}秒，'
+                f'利用率{self.utilisation:.0%}')
+        if self.depth_samples:
+            text += f'，输入队列平均{self.depth_total / self.depth_samples:.1f}/最大{self.depth_max}'
+        return text
+
+
+class RunMetrics:
+    """一次运行中各阶段的统计，运行结束后写入日志"""
+
+    def __init__(self):
+        self.stages = []
+
+    def stage(self, name):
+        metrics = StageMetrics(name)
+        self.stages.append(metrics)
+        return metrics
+
+    def log(self):
+        for metrics in self.stages:
+            if metrics.started is not None:
+                logging.info(f'流水线统计 - {metrics.summary()}')
+
+    def as_dict(self):
+        """各阶段的统计（可序列化为JSON），供任务服务记录每个任务的指标"""
+        return {metrics.name: {'items': metrics.items, 'elapsed': round(metrics.elapsed, 3),
+                               'idle': round(metrics.idle, 3), 'utilisation': round(metrics.utilisation, 3)}
+                for metrics in self.stages if metrics.started is not None}
+
+
+def prefetch(items, producer, consumer, maxsize=DEFAULT_QUEUE_SIZE):
+    """在后台线程中迭代items，通过有界队列交给当前线程逐个消费
+
+    生产者最多领先消费者maxsize项，内存占用有上限。生产者中的异常会在消费者中重新抛出；
+    消费者提前结束时通知生产者停止。producer和consumer为两个阶段的StageMetrics。
+    """
+    items_queue = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        """放入队列，队列满时等待，消费者已结束时返回False"""
+        wait_start = time.perf_counter()
+        try:
+            while not stop.is_set():
+                try:
+                    items_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            producer.idle += time.perf_counter() - wait_start
+
+    def produce():
+        producer.start()
+        try:
+            for item in items:
+                producer.items += 1
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+        finally:
+            producer.finish()
+
+    thread = threading.Thread(target=produce, name=f'pipeline-{producer.name}', daemon=True)
+    consumer.start()
+    thread.start()
+    try:
+        while True:
+            consumer.record_depth(items_queue.qsize())
+            wait_start = time.perf_counter()
+            item = items_queue.get()
+            consumer.idle += time.perf_counter() - wait_start
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            consumer.items += 1
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+        consumer.finish()
+
+
+class BackgroundTask:
+    """在后台线程中执行一个任务，result() 等待完成并重新抛出任务中的异常"""
+
+    def __init__(self, function, metrics, *args):
+        self.metrics = metrics
+        self.error = None
+        self.value = None
+        self.thread = threading.Thread(target=self.execute, args=(function, args),
+                                       name=f'pipeline-{metrics.name}', daemon=True)
+        self.thread.start()
+
+    def execute(self, function, args):
+        self.metrics.start()
+        try:
+            self.value = function(*args)
+            self.metrics.items += 1
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.metrics.finish()
+
+    def result(self):
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.value
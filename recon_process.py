@@ -0,0 +1,151 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from logging.handlers import QueueHandler
+
+# 等待子进程退出的时间（秒），超时后强制结束
+EXIT_TIMEOUT = 5
+
+
+class EngineChannel:
+    """子进程一侧的管道：日志、进度和结果都通过它发回界面进程
+
+    引擎的流水线线程也会写日志，发送时加锁。实现了QueueHandler需要的put_nowait，
+    日志记录在子进程中格式化后再发送，参数和异常信息不需要能序列化。
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+
+    def send(self, *message):
+        with self.lock:
+            self.conn.send(message)
+
+    def put_nowait(self, record):
+        self.send('log', record)
+
+
+def serve_engine(conn, cancel_event):
+    """子进程入口：先导入处理引擎，再等待界面进程发来待处理文件，处理一次后退出
+
+    界面进程关闭管道时（程序退出）子进程直接结束；cancel_event 由界面进程设置，引擎在安全的位置停止。
+    指定了工作目录时（任务服务），输出写入该目录，历史库仍使用原来的路径。
+    """
+    channel = EngineChannel(conn)
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(channel)]
+    root.setLevel(logging.INFO)
+
+    start_time = time.perf_counter()
+    try:
+        from recon_engine import ReconEngine
+        import_error = None
+    except Exception as e:
+        import_error = f'处理引擎加载失败：{e}'
+        logging.error(import_error)
+    channel.send('ready', time.perf_counter() - start_time)
+
+    try:
+        input_files, resume, work_dir = conn.recv()
+    except EOFError:
+        return
+    if import_error is not None:
+        channel.send('finished', False, import_error)
+        return
+
+    engine = ReconEngine(input_files, lambda message: channel.send('progress', message), cancel_event, resume)
+    if work_dir is not None:
+        if engine.history_store_path:
+            engine.history_store_path = os.path.abspath(engine.history_store_path)
+        os.chdir(work_dir)
+        # 任务的日志同时写入任务目录，可以和输出一起下载
+        handler = logging.FileHandler('job.log', encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        root.addHandler(handler)
+    success, error_msg = engine.run()
+    channel.send('summary', engine.run_summary())
+    channel.send('finished', success, error_msg)
+
+
+class EngineProcess:
+    """界面进程一侧：启动处理子进程（启动后立即在子进程中导入引擎），提交待处理文件并接收进度、日志和结果
+
+    pandas和openpyxl的计算都在子进程中进行，不占用界面进程的GIL；子进程崩溃时界面进程只收到失败结果。
+    每个子进程只处理一次，处理结束后退出，内存随之释放。
+    """
+
+    def __init__(self):
+        # 统一使用spawn，各平台行为一致，子进程不继承界面进程的Qt状态
+        context = multiprocessing.get_context('spawn')
+        self.conn, child_conn = context.Pipe()
+        self.cancel_event = context.Event()
+        # 不设为守护进程：对账单进程池需要在子进程中再创建进程
+        self.process = context.Process(target=serve_engine, args=(child_conn, self.cancel_event), name='recon-engine')
+        self.process.start()
+        child_conn.close()
+        self.import_seconds = None
+        # 运行结束后子进程发回的运行指标（ReconEngine.run_summary）
+        self.summary = None
+
+    def receive(self, progress_callback=None):
+        """接收一条子进程消息：日志交给本进程的日志处理器，进度交给progress_callback，返回消息"""
+        message = self.conn.recv()
+        kind = message[0]
+        if kind == 'log':
+            logging.getLogger().handle(message[1])
+        elif kind == 'progress' and progress_callback is not None:
+            progress_callback(message[1])
+        elif kind == 'ready':
+            self.import_seconds = message[1]
+        elif kind == 'summary':
+            self.summary = message[1]
+        return message
+
+    def wait_ready(self):
+        """等待子进程导入处理引擎，返回导入耗时（秒），子进程已退出时返回None"""
+        try:
+            while self.import_seconds is None:
+                self.receive()
+        except (EOFError, OSError):
+            return None
+        return self.import_seconds
+
+    def run(self, input_files, progress_callback=None, resume=False, work_dir=None):
+        """提交待处理文件并等待处理结束，resume为True时从运行检查点续跑，work_dir为输出目录（默认为当前目录）
+
+        Returns:
+            tuple: (是否成功, 错误信息)，子进程异常退出时返回失败和退出码
+        """
+        try:
+            self.conn.send((list(input_files), resume, work_dir))
+            while True:
+                message = self.receive(progress_callback)
+                if message[0] == 'finished':
+                    return message[1], message[2]
+        except (EOFError, OSError):
+            self.process.join(EXIT_TIMEOUT)
+            error_msg = f'处理进程意外退出（退出码{self.process.exitcode}）'
+            logging.error(error_msg)
+            return False, error_msg
+        finally:
+            self.close()
+
+    def cancel(self):
+        """请求取消处理，引擎完成当前收货单或对账单后停止，run()返回取消结果"""
+        self.cancel_event.set()
+
+    def terminate(self):
+        """强制结束子进程，正在等待结果的run()随即返回失败"""
+        if self.process.is_alive():
+            self.process.terminate()
+
+    def close(self):
+        """关闭管道并等待子进程退出，超时后强制结束"""
+        self.conn.close()
+        self.process.join(EXIT_TIMEOUT)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
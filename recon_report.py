@@ -0,0 +1,1190 @@
+import os
+import logging
+from copy import copy, deepcopy
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import MergedCell
+from openpyxl.formatting.rule import CellIsRule, FormulaRule
+from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
+from openpyxl.utils import get_column_letter, column_index_from_string
+from openpyxl.worksheet.hyperlink import Hyperlink
+from openpyxl.worksheet.page import PageMargins
+from openpyxl.worksheet.properties import PageSetupProperties
+from openpyxl.worksheet.worksheet import Worksheet
+
+from recon_config import REPORT_HEADER_MAPPING
+
+# 清洗后收货明细的字段（备份文件和历史库使用相同的顺序）
+RECEIPT_COLUMNS = ['收货单号', '收货日期', '商品名称', '实收数量', '基本单位',
+                   '单价', '小计金额', '税额', '税率', '小计价税', '部门', '供应商名称']
+
+# 对账明细表各字段列宽
+REPORT_COLUMN_WIDTHS = {
+    '收货单号': 17,
+    '收货日期': 19,
+    '商品名称': 60,
+    '实收数量': 19,
+    '基本单位': 19,
+    '单价': 20,
+    '小计金额': 14,
+    '税额': 14,
+    '税率': 10,
+    '小计价税': 20,
+    '部门': 35,
+    '供应商名称': 36
+}
+
+# 对账单通用样式
+HEADER_FONT = Font(name='微软雅黑', size=13, bold=False, color='000000')
+CELL_FONT = Font(name='微软雅黑', size=13)
+TOTAL_FONT = Font(name='微软雅黑', size=11, bold=True)
+
+CENTER_ALIGNMENT = Alignment(horizontal='center', vertical='center')
+RIGHT_ALIGNMENT = Alignment(horizontal='right', vertical='center', shrink_to_fit=False)
+WRAP_ALIGNMENT = Alignment(horizontal='center', vertical='center', wrap_text=True)
+
+THIN_BORDER = Border(
+    left=Side(style='hair', color='D3D3D3'),
+    right=Side(style='hair', color='D3D3D3'),
+    top=Side(style='hair', color='D3D3D3'),
+    bottom=Side(style='hair', color='D3D3D3')
+)
+HEADER_BORDER = Border(
+    top=Side(style='thin', color='000000'),
+    bottom=Side(style='thin', color='000000')
+)
+# 合计行边框样式（只有上边框）
+SUMMARY_BORDER = Border(
+    top=Side(style='thin', color='000000')
+)
+
+# 斑马线填充色
+ZEBRA_FILL = PatternFill(start_color='F5F5F5', end_color='F5F5F5', fill_type='solid')
+
+# 负数金额行：整行标黄，负数金额标红（条件格式不能改变字号，只改颜色）
+AMOUNT_COLUMNS = ['小计金额', '税额', '小计价税']
+NEGATIVE_FILL = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
+NEGATIVE_FONT = Font(color='FF0000')
+
+def save_workbook(wb, output_file):
+    """先保存到同目录下的临时文件再重命名为输出文件，中断或磁盘写满时输出路径上不会留下不完整的文件
+
+    输出目录不存在时自动创建；output_file 为文件对象（如BytesIO）时直接写入。
+    """
+    if not isinstance(output_file, (str, os.PathLike)):
+        wb.save(output_file)
+        return
+    directory, name = os.path.split(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_file = os.path.join(directory, f'.{name}.{os.getpid()}.tmp')
+    try:
+        wb.save(temp_file)
+        os.replace(temp_file, output_file)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+def output_name(output_file):
+    """输出目标在日志中显示的名称：文件路径，或内存缓冲区的name属性"""
+    return getattr(output_file, 'name', output_file)
+
+def setup_report_page(ws, company_name):
+    """设置对账单工作表的页面布局：A4纵向、适应页宽、80%缩放、页脚和页边距"""
+    ws.page_setup.orientation = Worksheet.ORIENTATION_PORTRAIT
+    ws.page_setup.paperSize = Worksheet.PAPERSIZE_A4
+    ws.page_setup.fitToPage = True
+    ws.page_setup.fitToHeight = 0
+    ws.page_setup.fitToWidth = 1
+    ws.print_options.horizontalCentered = True
+    ws.print_options.verticalCentered = False
+    # 设置页面缩放比例为80%
+    ws.sheet_properties.pageSetUpPr = PageSetupProperties(fitToPage=True)
+    ws.sheet_view.zoomScale = 80
+    
+    # 设置页脚文本、字体和大小
+    ws.oddFooter.center.text = f'\n第 &P 页，共 &N 页\n{company_name}'
+    ws.oddFooter.center.size = 11
+    ws.oddFooter.center.font = '微软雅黑'
+    
+    # 设置页边距（单位：厘米）
+    ws.page_margins = PageMargins(left=0.31, right=0.31, top=0.31, bottom=0.39, header=0.31, footer=0.21)
+
+def write_detail_header(ws, headers, header_row, hidden_columns=('供应商名称',), column_widths=REPORT_COLUMN_WIDTHS):
+    """写入明细表头并设置列宽，hidden_columns中的列会被隐藏"""
+    for col, header in enumerate(headers, 1):
+        # 使用映射更新表头名称
+        display_header = REPORT_HEADER_MAPPING.get(header, header)
+        cell = ws.cell(row=header_row, column=col, value=display_header)
+        cell.font = HEADER_FONT
+        cell.alignment = CENTER_ALIGNMENT
+        cell.border = HEADER_BORDER
+        ws.column_dimensions[get_column_letter(col)].width = column_widths[header]
+    
+        # 隐藏指定列（对账单中隐藏供应商名称列）
+        if header in hidden_columns:
+            ws.column_dimensions[get_column_letter(col)].hidden = True
+
+def negative_line_mask(data):
+    """负数金额行的掩码：小计金额、税额、小计价税任一为负数，整表一次向量化比较"""
+    columns = [column for column in AMOUNT_COLUMNS if column in data.columns]
+    amounts = data[columns].apply(pd.to_numeric, errors='coerce')
+    return (amounts < 0).any(axis=1).to_numpy()
+
+def add_row_formatting(ws, first_row, last_row, last_column, amount_columns=()):
+    """用工作表级条件格式设置数据区的斑马线（偶数行）和负数金额行，代替逐个单元格设置填充
+
+    amount_columns 为需要检查负数的列号：任一列为负数时整行标黄（不再显示斑马线），负数单元格字体标红。
+    """
+    if last_row < first_row:
+        return
+    cell_range = f'A{first_row}:{get_column_letter(last_column)}{last_row}'
+    
+    if amount_columns:
+        letters = [get_column_letter(column) for column in amount_columns]
+        for letter in letters:
+            ws.conditional_formatting.add(f'{letter}{first_row}:{letter}{last_row}',
+                                          CellIsRule(operator='lessThan', formula=['0'], font=NEGATIVE_FONT))
+        condition = 'OR(' + ','.join(f'${letter}{first_row}<0' for letter in letters) + ')'
+        ws.conditional_formatting.add(cell_range, FormulaRule(formula=[condition], fill=NEGATIVE_FILL, stopIfTrue=True))
+    
+    ws.conditional_formatting.add(cell_range, FormulaRule(formula=['MOD(ROW(),2)=0'], fill=ZEBRA_FILL))
+
+def write_detail_rows(ws, data, start_row):
+    """从start_row开始逐行写入明细数据，斑马线和负数金额行（整行标黄、负数标红）使用条件格式"""
+    headers = list(data.columns)
+    for row_idx, row in enumerate(data.values, start_row):
+        # 设置行高为40以适应双行文本
+        ws.row_dimensions[row_idx].height = 40
+    
+        # 写入单元格数据
+        for col_idx, value in enumerate(row, 1):
+            style_detail_cell(ws.cell(row=row_idx, column=col_idx, value=value), headers[col_idx-1], value)
+    
+    add_detail_formatting(ws, data, start_row)
+
+def style_detail_cell(cell, header, value):
+    """设置明细单元格的字体、边框、对齐方式和数字格式（header为原始字段名）"""
+    cell.font = CELL_FONT
+    cell.border = THIN_BORDER
+    
+    # 设置数字列的对齐方式和格式
+    if header in ['商品名称', '部门']:
+        cell.alignment = WRAP_ALIGNMENT
+    elif header in ['实收数量', '单价', '小计金额', '税额', '小计价税']:
+        cell.alignment = RIGHT_ALIGNMENT
+        if pd.notna(value) and str(value).strip():
+            cell.number_format = '#,##0.00'
+    elif header == '税率':
+        cell.alignment = RIGHT_ALIGNMENT
+        if pd.notna(value) and str(value).strip():
+            cell.number_format = '0%'
+    else:
+        cell.alignment = CENTER_ALIGNMENT
+
+def add_detail_formatting(ws, data, start_row):
+    """为从start_row开始的明细数据添加斑马线和负数金额行的条件格式，没有负数金额行时不添加负数规则"""
+    headers = list(data.columns)
+    amount_columns = []
+    if negative_line_mask(data).any():
+        amount_columns = [col for col, header in enumerate(headers, 1) if header in AMOUNT_COLUMNS]
+    add_row_formatting(ws, start_row, start_row + len(data) - 1, len(headers), amount_columns)
+
+def export_query_result(data, output_file, description, company_name):
+    """将历史库查询结果按对账明细表的样式导出为Excel"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '查询结果'
+    setup_report_page(ws, company_name)
+    
+    headers = list(data.columns)
+    
+    # 标题、查询条件和金额合计
+    info_rows = [
+        '历史收货明细查询',
+        f'查询条件：{description}',
+        f'Net净额：{pd.to_numeric(data["小计金额"], errors="coerce").sum():,.2f}',
+        f'Vat税额：{pd.to_numeric(data["税额"], errors="coerce").sum():,.2f}',
+        f'Gross含税总额：{pd.to_numeric(data["小计价税"], errors="coerce").sum():,.2f}'
+    ]
+    for row_idx, text in enumerate(info_rows, 1):
+        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(headers))
+        cell = ws.cell(row=row_idx, column=1, value=text)
+        if row_idx == 1:
+            cell.font = Font(name='微软雅黑', size=16, color='000000')
+            cell.alignment = Alignment(horizontal='center', vertical='center')
+            ws.row_dimensions[row_idx].height = 22
+        else:
+            cell.font = Font(name='微软雅黑', size=13, color='000000')
+            cell.alignment = Alignment(horizontal='left', vertical='center')
+            ws.row_dimensions[row_idx].height = 18.75
+    
+    # 写入表头和明细，查询结果包含多个供应商，不隐藏供应商名称列
+    header_row = len(info_rows) + 1
+    write_detail_header(ws, headers, header_row, hidden_columns=())
+    ws.row_dimensions[header_row].height = 18.75
+    ws.freeze_panes = f'A{header_row + 1}'
+    write_detail_rows(ws, data, header_row + 1)
+    
+    # 写入合计行
+    total_row = len(data) + header_row + 1
+    for col_idx, header in enumerate(headers, 1):
+        if header == '收货单号':
+            value = '合计'
+        elif header in ['小计金额', '税额', '小计价税']:
+            value = pd.to_numeric(data[header], errors='coerce').sum()
+        else:
+            value = ''
+        cell = ws.cell(row=total_row, column=col_idx, value=value)
+        cell.font = TOTAL_FONT
+        cell.border = SUMMARY_BORDER
+        if header in ['小计金额', '税额', '小计价税']:
+            cell.alignment = RIGHT_ALIGNMENT
+            cell.number_format = '#,##0.00'
+        else:
+            cell.alignment = CENTER_ALIGNMENT
+    
+    ws.print_title_rows = f'1:{header_row}'
+    save_workbook(wb, output_file)
+
+# 重复收货单报告各字段列宽
+DUPLICATE_REPORT_COLUMN_WIDTHS = {
+    '收货单号': 17,
+    '类型': 24,
+    '供应商名称': 36,
+    '收货日期': 16,
+    '行数': 10,
+    '来源文件': 40,
+    '首次出现文件': 40,
+    '首次出现供应商': 36,
+    '首次出现日期': 16,
+    '首次出现行数': 14
+}
+
+def export_duplicate_report(report, output_file, company_name):
+    """导出重复收货单报告：完全重复的收货单已删除，内容冲突的收货单保留并需人工核对"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '重复收货单'
+    setup_report_page(ws, company_name)
+    ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
+    
+    headers = list(report.columns)
+    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(headers))
+    title_cell = ws.cell(row=1, column=1, value='重复收货单报告')
+    title_cell.font = Font(name='微软雅黑', size=16, color='000000')
+    title_cell.alignment = Alignment(horizontal='center', vertical='center')
+    ws.row_dimensions[1].height = 22
+    
+    header_row = 2
+    write_detail_header(ws, headers, header_row, hidden_columns=(), column_widths=DUPLICATE_REPORT_COLUMN_WIDTHS)
+    ws.row_dimensions[header_row].height = 18.75
+    ws.freeze_panes = f'A{header_row + 1}'
+    write_detail_rows(ws, report, header_row + 1)
+    
+    ws.print_title_rows = f'1:{header_row}'
+    save_workbook(wb, output_file)
+
+# 错误报告各字段列宽
+ERROR_REPORT_COLUMN_WIDTHS = {
+    '阶段': 10,
+    '文件': 40,
+    '收货单号': 17,
+    '行号': 10,
+    '供应商名称': 36,
+    '原因': 60
+}
+
+def export_error_report(report, output_file, company_name):
+    """导出处理错误报告：每行一个处理失败并已跳过的单元（文件、收货单或供应商对账单）及原因"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '错误报告'
+    setup_report_page(ws, company_name)
+    ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
+    
+    headers = list(report.columns)
+    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(headers))
+    title_cell = ws.cell(row=1, column=1, value='处理错误报告')
+    title_cell.font = Font(name='微软雅黑', size=16, color='000000')
+    title_cell.alignment = Alignment(horizontal='center', vertical='center')
+    ws.row_dimensions[1].height = 22
+    
+    header_row = 2
+    write_detail_header(ws, headers, header_row, hidden_columns=(), column_widths=ERROR_REPORT_COLUMN_WIDTHS)
+    ws.row_dimensions[header_row].height = 18.75
+    ws.freeze_panes = f'A{header_row + 1}'
+    write_detail_rows(ws, report, header_row + 1)
+    
+    ws.print_title_rows = f'1:{header_row}'
+    save_workbook(wb, output_file)
+
+def export_trend_report(trend, output_file, title, company_name):
+    """将月度汇总表生成的含税总额趋势导出为Excel"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '月度趋势'
+    setup_report_page(ws, company_name)
+    ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
+    
+    headers = list(trend.columns)
+    
+    # 设置标题
+    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(headers))
+    title_cell = ws.cell(row=1, column=1, value=title)
+    title_cell.font = Font(name='微软雅黑', size=16, color='000000')
+    title_cell.alignment = Alignment(horizontal='center', vertical='center')
+    ws.row_dimensions[1].height = 22
+    
+    # 写入表头，键字段沿用对账明细表的列宽，月份列统一宽度
+    header_row = 2
+    for col, header in enumerate(headers, 1):
+        cell = ws.cell(row=header_row, column=col, value=REPORT_HEADER_MAPPING.get(header, header))
+        cell.font = HEADER_FONT
+        cell.alignment = CENTER_ALIGNMENT
+        cell.border = HEADER_BORDER
+        ws.column_dimensions[get_column_letter(col)].width = REPORT_COLUMN_WIDTHS.get(header, 16)
+    ws.row_dimensions[header_row].height = 18.75
+    # 冻结表头和键字段列
+    key_count = len(headers) - len(trend.select_dtypes('number').columns)
+    ws.freeze_panes = ws.cell(row=header_row + 1, column=key_count + 1).coordinate
+    
+    # 写入数据
+    for row_idx, row in enumerate(trend.itertuples(index=False), header_row + 1):
+        ws.row_dimensions[row_idx].height = 40
+        for col_idx, value in enumerate(row, 1):
+            cell = ws.cell(row=row_idx, column=col_idx, value=None if pd.isna(value) else value)
+            cell.font = CELL_FONT
+            cell.border = THIN_BORDER
+            if isinstance(value, (int, float, np.number)):
+                cell.alignment = RIGHT_ALIGNMENT
+                cell.number_format = '#,##0.00'
+            else:
+                cell.alignment = WRAP_ALIGNMENT
+    
+    add_row_formatting(ws, header_row + 1, header_row + len(trend), len(headers))
+    
+    # 写入合计行
+    total_row = len(trend) + header_row + 1
+    for col_idx, header in enumerate(headers, 1):
+        if pd.api.types.is_numeric_dtype(trend[header]):
+            value = trend[header].sum()
+        else:
+            value = '合计' if col_idx == 1 else ''
+        cell = ws.cell(row=total_row, column=col_idx, value=value)
+        cell.font = TOTAL_FONT
+        cell.border = SUMMARY_BORDER
+        if isinstance(value, (int, float, np.number)):
+            cell.alignment = RIGHT_ALIGNMENT
+            cell.number_format = '#,##0.00'
+        else:
+            cell.alignment = CENTER_ALIGNMENT
+    
+    ws.print_title_rows = f'1:{header_row}'
+    save_workbook(wb, output_file)
+
+# 对账单模板中的占位符，生成每份对账单时替换（支持格式说明，如 {净额:,.2f}、{周期开始:%Y-%m-%d}）
+TEMPLATE_FIELDS = ['公司名称', '供应商名称', '周期开始', '周期结束', '净额', '税额', '含税总额']
+
+# 商品数量统计表表头和列宽
+SUMMARY_COLUMN_WIDTHS = {
+    '商品名称 Article': 58,
+    '总数量': 12,
+    '基本单位 Unit': 16,
+    '平均单价': 14,
+    '净额 Net': 14,
+    '税额 VAT': 14,
+    '税率': 10,
+    '含税总额 Gross': 19
+}
+SUMMARY_HEADERS = list(SUMMARY_COLUMN_WIDTHS)
+
+
+def write_title_row(ws, row, value, font, alignment, height, end_column):
+    """写入一行合并后的标题"""
+    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=end_column)
+    cell = ws.cell(row=row, column=1, value=value)
+    cell.font = font
+    cell.alignment = alignment
+    ws.row_dimensions[row].height = height
+
+
+def build_default_template():
+    """生成内置的对账单模板工作簿：明细表和商品数量统计表的页面设置、标题行和表头
+
+    标题行中的供应商、对账周期和金额以占位符表示，用户可以导出后修改样式作为自定义模板。
+    """
+    wb = Workbook()
+    ws = wb.active
+    
+    # 设置页面布局、页脚和页边距
+    setup_report_page(ws, '{公司名称}')
+    
+    title_font = Font(name='微软雅黑', size=16, color='000000')
+    info_font = Font(name='微软雅黑', size=13, color='000000')
+    left_alignment = Alignment(horizontal='left', vertical='center')
+    end_column = len(REPORT_COLUMN_WIDTHS)
+    
+    # 第1行标题，第2-6行为供应商名称、对账周期和Net/VAT/Gross合计
+    write_title_row(ws, 1, '对账明细表', title_font, Alignment(horizontal='center', vertical='center'), 22, end_column)
+    write_title_row(ws, 2, '供应商名称：{供应商名称}', info_font, left_alignment, 18.75, end_column)
+    write_title_row(ws, 3, '对帐周期：{周期开始:%Y-%m-%d} 至 {周期结束:%Y-%m-%d}', info_font, left_alignment, 18.75, end_column)
+    write_title_row(ws, 4, 'Net净额：{净额:,.2f}', info_font, left_alignment, 18.75, end_column)
+    write_title_row(ws, 5, 'Vat税额：{税额:,.2f}', info_font, left_alignment, 18.75, end_column)
+    write_title_row(ws, 6, 'Gross含税总额：{含税总额:,.2f}', info_font, left_alignment, 18.75, end_column)
+    
+    # 第7行表头（模板的最后一行为表头，数据从下一行开始）
+    header_row = 7
+    write_detail_header(ws, RECEIPT_COLUMNS, header_row)
+    ws.row_dimensions[header_row].height = 18.75
+    
+    # 冻结前七行，重复打印前七行
+    ws.freeze_panes = 'A8'
+    ws.print_title_rows = '1:7'
+    
+    # 商品数量统计表
+    summary_ws = wb.create_sheet(title='Article_Summary')
+    setup_report_page(summary_ws, '{公司名称}')
+    end_column = len(SUMMARY_COLUMN_WIDTHS)
+    write_title_row(summary_ws, 1, '商品数量统计表 Article Quantity Summary', title_font,
+                    Alignment(horizontal='center', vertical='center'), 22, end_column)
+    write_title_row(summary_ws, 2, '', Font(name='微软雅黑', size=20, color='000000'),
+                    Alignment(horizontal='center', vertical='center'), 10, end_column)
+    
+    summary_header_row = 3
+    for col, header in enumerate(SUMMARY_HEADERS, 1):
+        cell = summary_ws.cell(row=summary_header_row, column=col, value=header)
+        cell.font = HEADER_FONT
+        cell.alignment = CENTER_ALIGNMENT
+        cell.border = HEADER_BORDER
+        summary_ws.column_dimensions[get_column_letter(col)].width = SUMMARY_COLUMN_WIDTHS[header]
+    
+    # 冻结前三行，重复打印前三行
+    summary_ws.freeze_panes = 'A4'
+    summary_ws.print_title_rows = '1:3'
+    return wb
+
+
+def append_row(ws, row, cells, height=None):
+    """向只写模式的工作表追加第row行，行高只在写入这一行时保留，内存占用不随行数增长"""
+    if height is not None:
+        ws.row_dimensions[row].height = height
+    ws.append(cells)
+    ws.row_dimensions.pop(row, None)
+
+
+def fill_template_text(text, fields):
+    """替换文本中的占位符，占位符无法识别时保留原文"""
+    try:
+        return text.format_map(fields)
+    except (KeyError, ValueError, IndexError, AttributeError):
+        return text
+
+
+class SheetTemplate:
+    """一个模板工作表的编译结果：单元格内容和样式、合并区域、行高列宽、页面设置
+
+    模板的最后一行为表头，数据从表头的下一行开始写入。
+    """
+
+    def __init__(self, ws, run_fields):
+        self.title = ws.title
+        self.header_row = ws.max_row
+        self.cells = []
+        for row in ws.iter_rows():
+            for cell in row:
+                if isinstance(cell, MergedCell) or (cell.value is None and not cell.has_style):
+                    continue
+                # 含占位符的文本在生成每份对账单时替换，其余内容直接复制
+                templated = isinstance(cell.value, str) and '{' in cell.value
+                self.cells.append((cell.row, cell.column, cell.value, templated, copy(cell.font),
+                                   copy(cell.alignment), copy(cell.border), copy(cell.fill), cell.number_format))
+        self.merged_ranges = [str(merged) for merged in ws.merged_cells.ranges]
+        self.row_heights = {index: dim.height for index, dim in ws.row_dimensions.items() if dim.height is not None}
+        self.column_dimensions = []
+        for dim in ws.column_dimensions.values():
+            first, last = dim.min or dim.index, dim.max or dim.index
+            if isinstance(first, str):
+                first = last = column_index_from_string(first)
+            for column in range(first, last + 1):
+                self.column_dimensions.append((get_column_letter(column), dim.width, dim.hidden))
+        self.freeze_panes = ws.freeze_panes
+        self.print_title_rows = ws.print_title_rows
+        self.page_setup = {attr: getattr(ws.page_setup, attr)
+                           for attr in ('orientation', 'paperSize', 'fitToHeight', 'fitToWidth', 'scale')}
+        self.print_options = {attr: getattr(ws.print_options, attr)
+                              for attr in ('horizontalCentered', 'verticalCentered')}
+        self.page_setup_properties = copy(ws.sheet_properties.pageSetUpPr)
+        self.zoom_scale = ws.sheet_view.zoomScale
+        self.page_margins = copy(ws.page_margins)
+        # 页眉页脚中的占位符（如公司名称）每次运行只替换一次
+        self.header_footer = deepcopy(ws.HeaderFooter)
+        for part in ('oddHeader', 'oddFooter', 'evenHeader', 'evenFooter', 'firstHeader', 'firstFooter'):
+            header_footer = getattr(self.header_footer, part)
+            for position in ('left', 'center', 'right'):
+                item = getattr(header_footer, position)
+                if item.text and '{' in item.text:
+                    item.text = fill_template_text(item.text, run_fields)
+
+    def apply_layout(self, ws):
+        """套用页面设置、页眉页脚、列宽、冻结窗格和打印标题，不写入单元格"""
+        for page_attr, value in self.page_setup.items():
+            setattr(ws.page_setup, page_attr, value)
+        for option, value in self.print_options.items():
+            setattr(ws.print_options, option, value)
+        ws.sheet_properties.pageSetUpPr = copy(self.page_setup_properties)
+        ws.sheet_view.zoomScale = self.zoom_scale
+        ws.page_margins = copy(self.page_margins)
+        ws.HeaderFooter = deepcopy(self.header_footer)
+        for letter, width, hidden in self.column_dimensions:
+            ws.column_dimensions[letter].width = width
+            if hidden:
+                ws.column_dimensions[letter].hidden = True
+        
+        ws.freeze_panes = self.freeze_panes
+        if self.print_title_rows:
+            ws.print_title_rows = self.print_title_rows
+
+    def styled_cells(self, fields, make_cell):
+        """按模板创建标题行和表头的单元格，返回 [(行号, 列号, 单元格)]，make_cell(行号, 列号, 值)创建单元格"""
+        cells = []
+        for row, column, value, templated, font, alignment, border, fill, number_format in self.cells:
+            cell = make_cell(row, column, fill_template_text(value, fields) if templated else value)
+            cell.font = font
+            cell.alignment = alignment
+            cell.border = border
+            cell.fill = fill
+            cell.number_format = number_format
+            cells.append((row, column, cell))
+        return cells
+
+    def apply(self, ws, fields):
+        """将模板套用到空白工作表，fields为占位符的值"""
+        self.apply_layout(ws)
+        for merged_range in self.merged_ranges:
+            ws.merge_cells(merged_range)
+        self.styled_cells(fields, lambda row, column, value: ws.cell(row=row, column=column, value=value))
+        for row, height in self.row_heights.items():
+            ws.row_dimensions[row].height = height
+
+    def write_rows(self, ws, fields):
+        """将模板套用到只写模式的空白工作表，逐行写入标题行和表头"""
+        self.apply_layout(ws)
+        for merged_range in self.merged_ranges:
+            ws.merged_cells.add(merged_range)
+        rows = {}
+        for row, column, cell in self.styled_cells(fields, lambda row, column, value: WriteOnlyCell(ws, value)):
+            rows.setdefault(row, {})[column] = cell
+        for row in range(1, self.header_row + 1):
+            cells = rows.get(row, {})
+            append_row(ws, row, [cells.get(column) for column in range(1, max(cells, default=0) + 1)],
+                       self.row_heights.get(row))
+
+
+class ReportTemplate:
+    """对账单模板，每次运行编译一次
+
+    默认使用内置模板；指定template_file时使用用户提供的模板工作簿（第一个工作表为明细表，
+    名为Article_Summary的工作表或第二个工作表为商品数量统计表，
+    没有时使用内置模板的统计表），可以自定义字体、颜色、列宽、页面设置等样式。
+    """
+
+    def __init__(self, company_name, template_file=None):
+        if template_file:
+            wb = load_workbook(template_file)
+            logging.info(f'使用自定义对账单模板：{template_file}')
+        else:
+            wb = build_default_template()
+        if 'Article_Summary' in wb.sheetnames:
+            summary_ws = wb['Article_Summary']
+        elif len(wb.worksheets) > 1:
+            summary_ws = wb.worksheets[1]
+        else:
+            # 模板只有明细表时，商品数量统计表沿用内置模板
+            logging.warning(f'对账单模板没有商品数量统计表，使用内置模板的统计表：{template_file}')
+            summary_ws = build_default_template()['Article_Summary']
+        self.company_name = company_name
+        run_fields = {'公司名称': company_name}
+        self.detail = SheetTemplate(wb.worksheets[0], run_fields)
+        self.summary = SheetTemplate(summary_ws, run_fields)
+
+    def new_workbook(self, fields):
+        """按模板创建一份对账单工作簿，返回 (工作簿, 明细表, 商品数量统计表)"""
+        fields = dict(fields, 公司名称=self.company_name)
+        wb = Workbook()
+        ws = wb.active
+        ws.title = self.detail.title
+        self.detail.apply(ws, fields)
+        summary_ws = wb.create_sheet(title=self.summary.title)
+        self.summary.apply(summary_ws, fields)
+        return wb, ws, summary_ws
+
+
+def report_fields(supplier_name, supplier_data, period_start, period_end):
+    """对账单占位符的值：供应商名称、对账周期和合计金额"""
+    return {
+        '供应商名称': supplier_name,
+        '周期开始': period_start,
+        '周期结束': period_end,
+        '净额': supplier_data['小计金额'].sum(),
+        '税额': supplier_data['税额'].sum(),
+        '含税总额': supplier_data['小计价税'].sum()
+    }
+
+
+def total_row_values(fields):
+    """明细表合计行各字段的值"""
+    return {
+        '收货单号': '合计',
+        '收货日期': '',
+        '商品名称': '',
+        '实收数量': '',
+        '基本单位': '',
+        '单价': '',
+        '小计金额': fields['净额'],
+        '税额': fields['税额'],
+        '税率': '',
+        '小计价税': fields['含税总额'],
+        '部门': '',
+        '供应商名称': ''
+    }
+
+
+def style_total_cell(cell, header, value):
+    """设置明细表合计行单元格的样式"""
+    cell.font = TOTAL_FONT
+    cell.border = SUMMARY_BORDER
+    
+    # 设置数字列的对齐方式和格式
+    if header in ['小计金额', '税额', '小计价税']:
+        cell.alignment = RIGHT_ALIGNMENT
+        if pd.notna(value) and str(value).strip():
+            cell.number_format = '#,##0.00'
+    else:
+        cell.alignment = CENTER_ALIGNMENT
+
+
+def generate_supplier_report(supplier_name, supplier_data, period_start, period_end, output_file, company_name,
+                             template=None):
+    """生成单个供应商在一个对账周期内的对账明细表
+
+    template 为本次运行编译好的ReportTemplate，未提供时使用内置模板。
+    """
+    if template is None:
+        template = ReportTemplate(company_name)
+    
+    # 按模板创建工作簿，只填入供应商名称、对账周期和合计金额
+    fields = report_fields(supplier_name, supplier_data, period_start, period_end)
+    summary_row = total_row_values(fields)
+    wb, ws, article_summary_ws = template.new_workbook(fields)
+    
+    # 写入数据
+    headers = list(supplier_data.columns)
+    header_row = template.detail.header_row
+    write_detail_rows(ws, supplier_data, header_row + 1)
+    
+    # 写入合计行
+    row_idx = len(supplier_data) + header_row + 1
+    for col_idx, header in enumerate(headers, 1):
+        value = summary_row[header]
+        style_total_cell(ws.cell(row=row_idx, column=col_idx, value=value), header, value)
+    
+    # 按商品名称分组统计数量
+    article_stats = supplier_data.groupby('商品名称').agg({
+        '实收数量': 'sum',
+        '基本单位': 'first',
+        '单价': 'mean',
+        '小计金额': 'sum',
+        '税额': 'sum',
+        '税率': 'first',
+        '小计价税': 'sum'
+    }).reset_index()
+    
+    # 按总数量降序排列
+    article_stats = article_stats.sort_values('实收数量', ascending=False)
+    
+    # 写入商品统计数据
+    summary_headers = SUMMARY_HEADERS
+    summary_header_row = template.summary.header_row
+    for row_idx, (_, row) in enumerate(article_stats.iterrows(), summary_header_row + 1):
+        # 设置行高
+        article_summary_ws.row_dimensions[row_idx].height = 40
+    
+        # 写入数据
+        values = [
+            row['商品名称'],
+            row['实收数量'],
+            row['基本单位'],
+            row['单价'],
+            row['小计金额'],
+            row['税额'],
+            row['税率'],
+            row['小计价税']
+        ]
+    
+        for col_idx, value in enumerate(values, 1):
+            cell = article_summary_ws.cell(row=row_idx, column=col_idx, value=value)
+            cell.font = CELL_FONT
+            cell.border = THIN_BORDER
+    
+            # 设置对齐方式和格式
+            if summary_headers[col_idx-1] == '商品名称 Article':
+                cell.alignment = WRAP_ALIGNMENT
+            elif summary_headers[col_idx-1] in ['总数量', '平均单价', '净额 Net', '税额 VAT', '含税总额 Gross']:
+                cell.alignment = RIGHT_ALIGNMENT
+                if pd.notna(value) and str(value).strip():
+                    cell.number_format = '#,##0.00'
+            elif summary_headers[col_idx-1] == '税率':
+                cell.alignment = RIGHT_ALIGNMENT
+                if pd.notna(value) and str(value).strip():
+                    cell.number_format = '0%'
+            else:
+                cell.alignment = CENTER_ALIGNMENT
+    
+    # 斑马线使用条件格式
+    add_row_formatting(article_summary_ws, summary_header_row + 1, summary_header_row + len(article_stats),
+                       len(summary_headers))
+    
+    # 添加商品统计合计行
+    summary_total_row = len(article_stats) + summary_header_row + 1
+    summary_totals = [
+        '合计',
+        article_stats['实收数量'].sum(),
+        '',
+        '',
+        article_stats['小计金额'].sum(),
+        article_stats['税额'].sum(),
+        '',
+        article_stats['小计价税'].sum()
+    ]
+    
+    for col_idx, value in enumerate(summary_totals, 1):
+        cell = article_summary_ws.cell(row=summary_total_row, column=col_idx, value=value)
+        cell.font = TOTAL_FONT
+        cell.border = SUMMARY_BORDER
+    
+        # 设置数字列的对齐方式和格式
+        if summary_headers[col_idx-1] in ['总数量', '平均单价', '小计金额', '税额', '小计价税']:
+            cell.alignment = RIGHT_ALIGNMENT
+            if pd.notna(value) and str(value).strip():
+                cell.number_format = '#,##0.00'
+        else:
+            cell.alignment = CENTER_ALIGNMENT
+    
+    # 保存文件
+    save_workbook(wb, output_file)
+    logging.info(f'已生成供应商对账单：{output_name(output_file)}')
+    
+    # 不再生成独立的商品数量统计表文件
+    logging.info(f'商品数量统计表已添加到对账明细表中')
+
+
+# 合并对账明细工作簿：目录工作表名称和各字段列宽
+INDEX_SHEET_TITLE = '目录'
+INDEX_COLUMN_WIDTHS = {
+    '工作表': 36,
+    '供应商名称': 36,
+    '对帐周期': 26,
+    '行数': 10,
+    '净额 Net': 16,
+    '税额 VAT': 16,
+    '含税总额 Gross': 19
+}
+
+# 工作表名称的长度上限和不允许使用的字符
+SHEET_NAME_LIMIT = 31
+INVALID_SHEET_NAME_CHARS = '[]:*?/\\'
+
+
+def safe_sheet_name(name, used_names):
+    """生成合法且不重复的工作表名称：替换非法字符，截断到31个字符，重名时添加序号
+
+    used_names 为已使用的名称（小写），生成的名称会加入其中。
+    """
+    base = ''.join('_' if char in INVALID_SHEET_NAME_CHARS else char for char in str(name)).strip("' ")
+    base = base or 'Sheet'
+    sheet_name = base[:SHEET_NAME_LIMIT]
+    number = 1
+    while sheet_name.lower() in used_names:
+        number += 1
+        suffix = f'~{number}'
+        sheet_name = base[:SHEET_NAME_LIMIT - len(suffix)] + suffix
+    used_names.add(sheet_name.lower())
+    return sheet_name
+
+
+class ConsolidatedReport:
+    """合并对账明细工作簿：每个供应商（对账周期）一个工作表，第一个工作表为带超链接和合计的目录
+
+    使用openpyxl的只写模式逐行写入，每个供应商的工作表写完即关闭，样式在工作簿内共享，
+    内存占用不随供应商数量和明细行数增长。不包含商品数量统计表。
+    """
+
+    def __init__(self, output_file, template, title):
+        self.output_file = output_file
+        self.template = template
+        self.title = title
+        self.wb = Workbook(write_only=True)
+        # 目录工作表最先创建，保证排在第一个，内容在保存前写入
+        self.index_ws = self.wb.create_sheet(INDEX_SHEET_TITLE)
+        self.used_names = {INDEX_SHEET_TITLE.lower()}
+        self.entries = []
+
+    def add_supplier(self, supplier_name, supplier_data, period_start, period_end, sheet_name):
+        """按模板写入一个供应商的明细工作表，返回实际使用的工作表名称"""
+        fields = dict(report_fields(supplier_name, supplier_data, period_start, period_end),
+                      公司名称=self.template.company_name)
+        sheet_name = safe_sheet_name(sheet_name, self.used_names)
+        ws = self.wb.create_sheet(sheet_name)
+        # 写入过程中出错时删除写了一半的工作表并释放名称，工作簿中其他供应商不受影响
+        try:
+            detail = self.template.detail
+            detail.write_rows(ws, fields)
+            
+            # 写入数据
+            headers = list(supplier_data.columns)
+            row_idx = detail.header_row
+            for row in supplier_data.values:
+                row_idx += 1
+                cells = []
+                for header, value in zip(headers, row):
+                    cell = WriteOnlyCell(ws, value)
+                    style_detail_cell(cell, header, value)
+                    cells.append(cell)
+                append_row(ws, row_idx, cells, 40)
+            add_detail_formatting(ws, supplier_data, detail.header_row + 1)
+            
+            # 写入合计行
+            summary_row = total_row_values(fields)
+            cells = []
+            for header in headers:
+                cell = WriteOnlyCell(ws, summary_row[header])
+                style_total_cell(cell, header, summary_row[header])
+                cells.append(cell)
+            append_row(ws, row_idx + 1, cells)
+            ws.close()
+        except Exception:
+            # 先结束只写工作表的写入流（关闭其临时文件），再从工作簿中删除
+            if not ws.closed:
+                try:
+                    ws.close()
+                except Exception:
+                    pass
+            self.wb.remove(ws)
+            self.used_names.discard(sheet_name.lower())
+            raise
+        
+        self.entries.append((sheet_name, supplier_name,
+                             f'{period_start:%Y-%m-%d} 至 {period_end:%Y-%m-%d}', len(supplier_data),
+                             fields['净额'], fields['税额'], fields['含税总额']))
+        return sheet_name
+
+    def write_index(self):
+        """写入目录：每个工作表一行，工作表名称链接到对应工作表，最后一行为合计"""
+        ws = self.index_ws
+        setup_report_page(ws, self.template.company_name)
+        ws.page_setup.orientation = Worksheet.ORIENTATION_LANDSCAPE
+        headers = list(INDEX_COLUMN_WIDTHS)
+        for col, width in enumerate(INDEX_COLUMN_WIDTHS.values(), 1):
+            ws.column_dimensions[get_column_letter(col)].width = width
+        ws.freeze_panes = 'A3'
+        ws.print_title_rows = '1:2'
+        
+        # 标题行和表头
+        ws.merged_cells.add(f'A1:{get_column_letter(len(headers))}1')
+        title_cell = WriteOnlyCell(ws, self.title)
+        title_cell.font = Font(name='微软雅黑', size=16, color='000000')
+        title_cell.alignment = Alignment(horizontal='center', vertical='center')
+        append_row(ws, 1, [title_cell], 22)
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, header)
+            cell.font = HEADER_FONT
+            cell.alignment = CENTER_ALIGNMENT
+            cell.border = HEADER_BORDER
+            header_cells.append(cell)
+        append_row(ws, 2, header_cells, 18.75)
+        
+        for row_idx, entry in enumerate(self.entries, 3):
+            cells = []
+            for col_idx, value in enumerate(entry):
+                cell = WriteOnlyCell(ws, value)
+                cell.font = CELL_FONT
+                cell.border = THIN_BORDER
+                if col_idx == 0:
+                    cell.hyperlink = Hyperlink(ref='', location=f"'{value}'!A1", display=value)
+                    cell.font = Font(name='微软雅黑', size=13, color='0563C1', underline='single')
+                if col_idx >= 3:
+                    cell.alignment = RIGHT_ALIGNMENT
+                    cell.number_format = '#,##0' if col_idx == 3 else '#,##0.00'
+                else:
+                    cell.alignment = WRAP_ALIGNMENT
+                cells.append(cell)
+            append_row(ws, row_idx, cells, 40)
+        add_row_formatting(ws, 3, len(self.entries) + 2, len(headers))
+        
+        # 合计行
+        totals = ['合计', '', '', sum(entry[3] for entry in self.entries)]
+        totals += [sum(entry[col] for entry in self.entries) for col in range(4, 7)]
+        cells = []
+        for col_idx, value in enumerate(totals):
+            cell = WriteOnlyCell(ws, value)
+            cell.font = TOTAL_FONT
+            cell.border = SUMMARY_BORDER
+            if col_idx >= 3:
+                cell.alignment = RIGHT_ALIGNMENT
+                cell.number_format = '#,##0' if col_idx == 3 else '#,##0.00'
+            else:
+                cell.alignment = CENTER_ALIGNMENT
+            cells.append(cell)
+        append_row(ws, len(self.entries) + 3, cells)
+
+    def save(self, target=None):
+        """保存工作簿，target 为保存目标（文件路径或文件对象），默认为output_file"""
+        self.write_index()
+        save_workbook(self.wb, target if target is not None else self.output_file)
+        logging.info(f'已生成合并对账明细工作簿：{self.output_file}，共{len(self.entries)}个供应商工作表')
+
+
+# 汇总表各字段列宽
+MASTER_SUMMARY_COLUMN_WIDTHS = {
+    '供应商名称': 36,
+    '对帐周期': 26,
+    '收货单数': 12,
+    '明细行数': 12,
+    '净额 Net': 16,
+    '税额 VAT': 16,
+    '含税总额 Gross': 19,
+    '负数行数': 12,
+    '对账明细': 40
+}
+
+
+def summary_entry(supplier_name, supplier_data, period_start, period_end, output_file):
+    """一份对账单在汇总表中的一行：收货单数、明细行数、Net/VAT/Gross合计和负数金额行数"""
+    return {
+        '供应商名称': supplier_name,
+        '对帐周期': f'{period_start:%Y-%m-%d} 至 {period_end:%Y-%m-%d}',
+        '收货单数': supplier_data['收货单号'].nunique(),
+        '明细行数': len(supplier_data),
+        '净额 Net': supplier_data['小计金额'].sum(),
+        '税额 VAT': supplier_data['税额'].sum(),
+        '含税总额 Gross': supplier_data['小计价税'].sum(),
+        '负数行数': int(negative_line_mask(supplier_data).sum()),
+        '对账明细': output_file
+    }
+
+
+def export_master_summary(entries, output_file, title, company_name, links=None):
+    """导出所有供应商的汇总表，每份对账单一行，最后一行为合计
+
+    entries 为summary_entry生成的行；对账明细列链接到对账单，links 可以按对账单文件指定 (显示文本, 链接目标)
+    （合并输出时为工作簿中的工作表），未指定时链接到与汇总表同目录的对账单文件。
+    """
+    links = links or {}
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '汇总'
+    setup_report_page(ws, company_name)
+    ws.page_setup.orientation = Worksheet.ORIENTATION_LANDSCAPE
+    
+    headers = list(MASTER_SUMMARY_COLUMN_WIDTHS)
+    write_title_row(ws, 1, title, Font(name='微软雅黑', size=16, color='000000'),
+                    Alignment(horizontal='center', vertical='center'), 22, len(headers))
+    header_row = 2
+    write_detail_header(ws, headers, header_row, hidden_columns=(), column_widths=MASTER_SUMMARY_COLUMN_WIDTHS)
+    ws.row_dimensions[header_row].height = 18.75
+    ws.freeze_panes = f'A{header_row + 1}'
+    
+    for row_idx, entry in enumerate(entries, header_row + 1):
+        ws.row_dimensions[row_idx].height = 40
+        for col_idx, header in enumerate(headers, 1):
+            value = entry[header]
+            if header == '对账明细':
+                file_name = os.path.basename(value)
+                value, target = links.get(entry[header], (file_name, file_name))
+            cell = ws.cell(row=row_idx, column=col_idx, value=value)
+            cell.font = CELL_FONT
+            cell.border = THIN_BORDER
+            if header == '对账明细':
+                cell.hyperlink = target
+                cell.font = Font(name='微软雅黑', size=13, color='0563C1', underline='single')
+                cell.alignment = WRAP_ALIGNMENT
+            elif header in ('收货单数', '明细行数', '负数行数'):
+                cell.alignment = RIGHT_ALIGNMENT
+                cell.number_format = '#,##0'
+            elif header in ('净额 Net', '税额 VAT', '含税总额 Gross'):
+                cell.alignment = RIGHT_ALIGNMENT
+                cell.number_format = '#,##0.00'
+            else:
+                cell.alignment = WRAP_ALIGNMENT
+    add_row_formatting(ws, header_row + 1, header_row + len(entries), len(headers))
+    
+    # 写入合计行
+    total_row = len(entries) + header_row + 1
+    for col_idx, header in enumerate(headers, 1):
+        if header in ('收货单数', '明细行数', '负数行数', '净额 Net', '税额 VAT', '含税总额 Gross'):
+            value = sum(entry[header] for entry in entries)
+        else:
+            value = '合计' if col_idx == 1 else ''
+        cell = ws.cell(row=total_row, column=col_idx, value=value)
+        cell.font = TOTAL_FONT
+        cell.border = SUMMARY_BORDER
+        if isinstance(value, str):
+            cell.alignment = CENTER_ALIGNMENT
+        else:
+            cell.alignment = RIGHT_ALIGNMENT
+            cell.number_format = '#,##0' if header in ('收货单数', '明细行数', '负数行数') else '#,##0.00'
+    
+    ws.print_title_rows = f'1:{header_row}'
+    save_workbook(wb, output_file)
+    logging.info(f'已生成供应商汇总表：{output_name(output_file)}')
+
+
+# 成本中心报表各字段列宽，未填写部门的明细归入UNASSIGNED_DEPARTMENT
+DEPARTMENT_COLUMN_WIDTHS = {
+    '供应商名称': 36,
+    '商品名称 Article': 58,
+    '基本单位 Unit': 16,
+    '总数量': 12,
+    '净额 Net': 14,
+    '税额 VAT': 14,
+    '含税总额 Gross': 19
+}
+UNASSIGNED_DEPARTMENT = '未分配成本中心'
+
+# 文件名中不允许使用的字符
+INVALID_FILE_NAME_CHARS = '\\/:*?"<>|'
+
+
+def safe_file_name(name):
+    """替换文件名中不允许使用的字符，换行等空白字符（如中英文双行的部门名称）合并为一个空格"""
+    name = ' '.join(str(name).split())
+    return ''.join('_' if char in INVALID_FILE_NAME_CHARS else char for char in name) or '_'
+
+
+class DepartmentFanout:
+    """成本中心报表：累计生成供应商对账单时切分好的每份周期数据，按成本中心、供应商和商品汇总，
+    最后为每个年月的每个成本中心输出一个工作簿
+
+    只保存汇总后的数据，不保留明细，内存占用与明细行数无关。
+    """
+
+    def __init__(self):
+        self.parts = {}
+
+    def add(self, year_month, supplier_name, supplier_data):
+        """累计一份对账单的数据（year_month为对账单归档的年月）"""
+        departments = supplier_data['部门'].where(supplier_data['部门'].notna() & (supplier_data['部门'] != ''),
+                                                 UNASSIGNED_DEPARTMENT)
+        aggregates = supplier_data.groupby([departments, supplier_data['商品名称']], sort=False, dropna=False).agg(
+            基本单位=('基本单位', 'first'),
+            总数量=('实收数量', 'sum'),
+            净额=('小计金额', 'sum'),
+            税额=('税额', 'sum'),
+            含税总额=('小计价税', 'sum')
+        ).reset_index()
+        aggregates.insert(1, '供应商名称', supplier_name)
+        self.parts.setdefault(year_month, []).append(aggregates)
+
+    def aggregates(self):
+        """按年月逐个产出 (年月, 按成本中心、供应商和商品汇总的数据)，同一供应商的多个对账周期合并为一行"""
+        for year_month, parts in sorted(self.parts.items()):
+            aggregates = pd.concat(parts, ignore_index=True)
+            yield year_month, aggregates.groupby(['部门', '供应商名称', '商品名称'], sort=True, dropna=False).agg(
+                基本单位=('基本单位', 'first'),
+                总数量=('总数量', 'sum'),
+                净额=('净额', 'sum'),
+                税额=('税额', 'sum'),
+                含税总额=('含税总额', 'sum')
+            ).reset_index()
+
+    def write(self, output_dir, company_name, progress_callback=None, output_target=None):
+        """在output_dir/年月/下为每个成本中心输出一个工作簿，返回生成的文件列表
+
+        output_target 将输出文件路径转换为保存目标（例如内存缓冲区），未指定时直接写入文件。
+        """
+        output_files = []
+        for year_month, aggregates in self.aggregates():
+            year_month_dir = os.path.join(output_dir, year_month)
+            for department, department_data in aggregates.groupby('部门', sort=True):
+                output_file = os.path.join(year_month_dir, f'{safe_file_name(department)}_成本中心明细.xlsx')
+                target = output_target(output_file) if output_target is not None else output_file
+                export_department_report(department, department_data, year_month, target, company_name)
+                output_files.append(output_file)
+                if progress_callback is not None:
+                    progress_callback(f'已生成成本中心明细：{os.path.basename(output_file)}')
+        return output_files
+
+
+def export_department_report(department, aggregates, year_month, output_file, company_name):
+    """导出一个成本中心在一个月内按供应商和商品汇总的明细，每个供应商后有小计行，最后为合计行"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '成本中心明细'
+    setup_report_page(ws, company_name)
+    
+    headers = list(DEPARTMENT_COLUMN_WIDTHS)
+    end_column = len(headers)
+    info_font = Font(name='微软雅黑', size=13, color='000000')
+    left_alignment = Alignment(horizontal='left', vertical='center')
+    write_title_row(ws, 1, '成本中心明细表', Font(name='微软雅黑', size=16, color='000000'),
+                    Alignment(horizontal='center', vertical='center'), 22, end_column)
+    info_rows = [
+        f'成本中心：{department}',
+        f'对帐月份：{year_month}',
+        f'Net净额：{aggregates["净额"].sum():,.2f}',
+        f'Vat税额：{aggregates["税额"].sum():,.2f}',
+        f'Gross含税总额：{aggregates["含税总额"].sum():,.2f}'
+    ]
+    for row_idx, text in enumerate(info_rows, 2):
+        write_title_row(ws, row_idx, text, info_font, left_alignment, 18.75, end_column)
+    
+    header_row = len(info_rows) + 2
+    for col, header in enumerate(headers, 1):
+        cell = ws.cell(row=header_row, column=col, value=header)
+        cell.font = HEADER_FONT
+        cell.alignment = CENTER_ALIGNMENT
+        cell.border = HEADER_BORDER
+        ws.column_dimensions[get_column_letter(col)].width = DEPARTMENT_COLUMN_WIDTHS[header]
+    ws.row_dimensions[header_row].height = 18.75
+    ws.freeze_panes = f'A{header_row + 1}'
+    
+    def write_row(row_idx, values, font, border):
+        for col_idx, value in enumerate(values, 1):
+            cell = ws.cell(row=row_idx, column=col_idx, value=value)
+            cell.font = font
+            cell.border = border
+            if col_idx >= 4:
+                cell.alignment = RIGHT_ALIGNMENT
+                if pd.notna(value) and str(value).strip():
+                    cell.number_format = '#,##0.00'
+            else:
+                cell.alignment = WRAP_ALIGNMENT
+    
+    amount_columns = ['净额', '税额', '含税总额']
+    row_idx = header_row
+    for supplier_name, supplier_data in aggregates.groupby('供应商名称', sort=True):
+        for row in supplier_data.itertuples(index=False):
+            row_idx += 1
+            ws.row_dimensions[row_idx].height = 40
+            write_row(row_idx, [row.供应商名称, row.商品名称, row.基本单位, row.总数量, row.净额, row.税额, row.含税总额],
+                      CELL_FONT, THIN_BORDER)
+        # 供应商小计行（数量单位不同，不合计数量）
+        row_idx += 1
+        write_row(row_idx, [f'{supplier_name} 小计', '', '', ''] + [supplier_data[column].sum() for column in amount_columns],
+                  TOTAL_FONT, THIN_BORDER)
+    add_row_formatting(ws, header_row + 1, row_idx, end_column)
+    
+    # 写入合计行
+    write_row(row_idx + 1, ['合计', '', '', ''] + [aggregates[column].sum() for column in amount_columns],
+              TOTAL_FONT, SUMMARY_BORDER)
+    ws.cell(row=row_idx + 1, column=1).alignment = CENTER_ALIGNMENT
+    
+    ws.print_title_rows = f'1:{header_row}'
+    save_workbook(wb, output_file)
+    logging.info(f'已生成成本中心明细：{output_name(output_file)}')
@@ -0,0 +1,441 @@
+import io
+import os
+import json
+import uuid
+import shutil
+import sqlite3
+import logging
+import zipfile
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs, unquote, quote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from recon_process import EngineProcess
+
+# 服务只监听本机地址
+SERVICE_HOST = '127.0.0.1'
+
+# 任务的输出目录（相对于任务目录），下载和打包只包含这些目录中的文件
+OUTPUT_DIRS = ('供应商对账明细', '成本中心明细')
+
+# 可以提交的收货明细文件类型
+JOURNAL_SUFFIXES = ('.xlsx', '.xls')
+
+# 上传内容的大小上限（MB）
+MAX_UPLOAD_MB = 1024
+
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    submitted_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    input_files TEXT NOT NULL,
+    message TEXT,
+    metrics TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, submitted_at);
+"""
+
+
+def now_text():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class JobStore:
+    """SQLite中的任务队列：任务状态为 queued、running、succeeded、failed 或 cancelled
+
+    每次操作单独打开连接，可以在HTTP线程和工作线程中同时使用；取任务在写事务中进行，同一任务只会被取走一次。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self.connect() as conn:
+            conn.executescript(JOBS_SCHEMA)
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['input_files'] = json.loads(job['input_files'])
+        job['metrics'] = json.loads(job['metrics']) if job['metrics'] else None
+        return job
+
+    def submit(self, job_id, input_files):
+        with self.connect() as conn:
+            conn.execute('INSERT INTO jobs (id, status, submitted_at, input_files) VALUES (?, ?, ?, ?)',
+                         (job_id, 'queued', now_text(), json.dumps(input_files, ensure_ascii=False)))
+
+    def claim_next(self):
+        """取出最早提交的排队任务并标记为运行中，没有排队任务时返回None"""
+        conn = self.connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY submitted_at, rowid LIMIT 1").fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (now_text(), row['id']))
+            conn.commit()
+        finally:
+            conn.close()
+        return self.row_to_job(row)
+
+    def finish(self, job_id, status, message, metrics):
+        with self.connect() as conn:
+            conn.execute('UPDATE jobs SET status = ?, finished_at = ?, message = ?, metrics = ? WHERE id = ?',
+                         (status, now_text(), message, json.dumps(metrics, ensure_ascii=False), job_id))
+
+    def cancel_queued(self, job_id):
+        """取消尚未开始的任务，返回是否取消成功"""
+        with self.connect() as conn:
+            cursor = conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ?, message = ? "
+                                  "WHERE id = ? AND status = 'queued'", (now_text(), '任务已取消', job_id))
+            return cursor.rowcount > 0
+
+    def requeue_interrupted(self):
+        """服务上次退出时仍在运行的任务重新排队，返回任务数"""
+        with self.connect() as conn:
+            cursor = conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+            return cursor.rowcount
+
+    def get(self, job_id):
+        with self.connect() as conn:
+            return self.row_to_job(conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone())
+
+    def list_jobs(self, limit=100):
+        with self.connect() as conn:
+            rows = conn.execute('SELECT * FROM jobs ORDER BY submitted_at DESC, rowid DESC LIMIT ?', (limit,)).fetchall()
+        return [self.row_to_job(row) for row in rows]
+
+
+class JobService:
+    """本地任务服务：提交的收货明细排入SQLite任务队列，由固定数量的工作线程依次取出处理
+
+    每个任务有自己的目录（输入文件、输出和日志），在单独的处理子进程中运行，互不影响；
+    历史库和配置文件由所有任务共用。服务重启后，上次未完成的任务重新排队。
+    """
+
+    def __init__(self, root, workers):
+        self.root = os.path.abspath(root)
+        os.makedirs(os.path.join(self.root, 'jobs'), exist_ok=True)
+        self.store = JobStore(os.path.join(self.root, 'jobs.db'))
+        self.workers = max(workers, 1)
+        self.stop_event = threading.Event()
+        self.wakeup = threading.Condition()
+        self.lock = threading.Lock()
+        # 运行中的任务 -> 处理子进程，以及每个任务最近的进度信息
+        self.running = {}
+        self.progress = {}
+        self.threads = []
+
+    def job_dir(self, job_id):
+        return os.path.join(self.root, 'jobs', job_id)
+
+    def start(self):
+        requeued = self.store.requeue_interrupted()
+        if requeued:
+            logging.info(f'上次未完成的{requeued}个任务已重新排队')
+        for index in range(self.workers):
+            thread = threading.Thread(target=self.worker_loop, name=f'recon-job-worker-{index + 1}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """停止取新任务，取消正在运行的任务（重启后重新排队）"""
+        self.stop_event.set()
+        with self.lock:
+            for engine_process in self.running.values():
+                engine_process.cancel()
+        with self.wakeup:
+            self.wakeup.notify_all()
+        for thread in self.threads:
+            thread.join()
+
+    def create_job(self, journals):
+        """登记一个新任务，journals 为 (文件名, 写入函数) 列表，文件保存到任务的输入目录后排队"""
+        if not journals:
+            raise ValueError('没有提交收货明细文件（支持.xlsx、.xls，或包含它们的.zip）')
+        job_id = uuid.uuid4().hex[:12]
+        input_dir = os.path.join(self.job_dir(job_id), 'input')
+        os.makedirs(input_dir)
+        input_files = []
+        try:
+            for name, write in journals:
+                path = os.path.join(input_dir, unique_name(input_dir, name))
+                write(path)
+                input_files.append(path)
+        except Exception:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+            raise
+        self.store.submit(job_id, input_files)
+        logging.info(f'已提交任务{job_id}：{len(input_files)}个文件')
+        with self.wakeup:
+            self.wakeup.notify()
+        return job_id
+
+    def submit_paths(self, paths):
+        """提交本机上的文件，提交时复制到任务目录，之后原文件的变化不影响任务"""
+        journals = []
+        for path in paths:
+            if not os.path.isfile(path):
+                raise ValueError(f'文件不存在：{path}')
+            if not path.lower().endswith(JOURNAL_SUFFIXES):
+                raise ValueError(f'不支持的文件类型：{path}')
+            journals.append((os.path.basename(path), lambda target, source=path: shutil.copyfile(source, target)))
+        return self.create_job(journals)
+
+    def submit_upload(self, name, data):
+        """提交上传的文件内容：单个收货明细，或包含多个收货明细的zip"""
+        name = os.path.basename(name or '')
+        if name.lower().endswith('.zip'):
+            journals = []
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for member in archive.namelist():
+                    member_name = os.path.basename(member)
+                    if member_name.lower().endswith(JOURNAL_SUFFIXES) and not member_name.startswith(('~$', '.')):
+                        content = archive.read(member)
+                        journals.append((member_name, lambda target, content=content: write_bytes(target, content)))
+            return self.create_job(journals)
+        if not name.lower().endswith(JOURNAL_SUFFIXES):
+            raise ValueError('请用name参数指定文件名（.xlsx、.xls或.zip）')
+        return self.create_job([(name, lambda target: write_bytes(target, data))])
+
+    def cancel(self, job_id):
+        """取消任务：排队中的任务直接取消，运行中的任务在安全的位置停止"""
+        if self.store.cancel_queued(job_id):
+            return True
+        with self.lock:
+            engine_process = self.running.get(job_id)
+        if engine_process is None:
+            return False
+        engine_process.cancel()
+        return True
+
+    def worker_loop(self):
+        while not self.stop_event.is_set():
+            job = self.store.claim_next()
+            if job is None:
+                with self.wakeup:
+                    self.wakeup.wait(timeout=1)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job):
+        job_id = job['id']
+        logging.info(f'开始处理任务{job_id}')
+        engine_process = EngineProcess()
+        with self.lock:
+            self.running[job_id] = engine_process
+        try:
+            success, error_msg = engine_process.run(job['input_files'],
+                                                    lambda message: self.progress.__setitem__(job_id, message),
+                                                    work_dir=self.job_dir(job_id))
+        finally:
+            with self.lock:
+                self.running.pop(job_id, None)
+        metrics = engine_process.summary or {}
+        metrics['input_files'] = len(job['input_files'])
+        metrics['input_mb'] = round(sum(os.path.getsize(path) for path in job['input_files']
+                                        if os.path.exists(path)) / (1024 * 1024), 3)
+        metrics['outputs'] = len(self.outputs(job_id))
+        if success:
+            status = 'succeeded'
+        elif engine_process.cancel_event.is_set():
+            # 服务停止时取消的任务重启后重新排队
+            status = 'queued' if self.stop_event.is_set() else 'cancelled'
+        else:
+            status = 'failed'
+        self.store.finish(job_id, status, error_msg, metrics)
+        self.progress.pop(job_id, None)
+        if status == 'queued':
+            logging.info(f'任务{job_id}在服务停止时中断，下次启动后重新处理')
+        else:
+            logging.info(f'任务{job_id}结束：{status}，耗时{metrics.get("elapsed", 0):.1f}秒，{metrics.get("rows", 0)}行')
+
+    def outputs(self, job_id):
+        """任务生成的文件（相对于任务目录的路径）"""
+        job_dir = self.job_dir(job_id)
+        files = []
+        for output_dir in OUTPUT_DIRS:
+            for root, _, names in os.walk(os.path.join(job_dir, output_dir)):
+                for name in sorted(names):
+                    if name.endswith('.xlsx') and not name.startswith(('.', '~$')):
+                        files.append(os.path.relpath(os.path.join(root, name), job_dir).replace(os.sep, '/'))
+        return sorted(files)
+
+    def output_path(self, job_id, relative_path):
+        """任务输出文件的完整路径，不在输出目录中或不存在时返回None"""
+        job_dir = os.path.realpath(self.job_dir(job_id))
+        path = os.path.realpath(os.path.join(job_dir, relative_path))
+        allowed = [os.path.join(job_dir, output_dir) + os.sep for output_dir in OUTPUT_DIRS] + [
+            os.path.join(job_dir, 'job.log')]
+        if not any(path.startswith(prefix) or path == prefix for prefix in allowed) or not os.path.isfile(path):
+            return None
+        return path
+
+    def build_zip(self, job_id):
+        """将任务的全部输出打包为zip，返回zip文件路径"""
+        job_dir = self.job_dir(job_id)
+        zip_path = os.path.join(job_dir, f'{job_id}.zip')
+        temp_path = f'{zip_path}.tmp'
+        with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for relative_path in self.outputs(job_id):
+                archive.write(os.path.join(job_dir, relative_path), relative_path)
+        os.replace(temp_path, zip_path)
+        return zip_path
+
+    def describe(self, job):
+        """任务状态（JSON），运行中的任务包括最近的进度，已结束的任务包括输出文件列表"""
+        job = dict(job)
+        job['input_files'] = [os.path.basename(path) for path in job['input_files']]
+        job['progress'] = self.progress.get(job['id'])
+        if job['status'] in ('succeeded', 'failed', 'cancelled'):
+            job['outputs'] = self.outputs(job['id'])
+        return job
+
+
+def unique_name(directory, name):
+    """同一任务中的同名文件加序号"""
+    base, suffix = os.path.splitext(os.path.basename(name))
+    candidate = f'{base}{suffix}'
+    number = 1
+    while os.path.exists(os.path.join(directory, candidate)):
+        number += 1
+        candidate = f'{base}_{number}{suffix}'
+    return candidate
+
+
+def write_bytes(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """任务服务的HTTP接口
+
+    POST /jobs                   提交任务：JSON {"files": [本机文件路径]}，或请求体为文件内容并用 ?name= 指定文件名
+    GET  /jobs                   最近的任务列表
+    GET  /jobs/<id>              任务状态、进度、指标和输出文件
+    POST /jobs/<id>/cancel       取消任务
+    GET  /jobs/<id>/files/<路径>  下载一个输出文件（或 job.log）
+    GET  /jobs/<id>/zip          下载全部输出的zip
+    """
+
+    server_version = 'MCReconService/1.0'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logging.info(f'{self.address_string()} {format % args}')
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        self.send_json(status, {'error': message})
+
+    def send_file(self, path, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(os.path.getsize(path)))
+        self.send_header('Content-Disposition', f"attachment; filename*=UTF-8''{quote(os.path.basename(path))}")
+        self.end_headers()
+        with open(path, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile)
+
+    def route(self):
+        url = urlsplit(self.path)
+        parts = [unquote(part) for part in url.path.strip('/').split('/') if part]
+        return parts, parse_qs(url.query)
+
+    def do_GET(self):
+        parts, _ = self.route()
+        if parts == ['jobs']:
+            self.send_json(200, [self.service.describe(job) for job in self.service.store.list_jobs()])
+            return
+        if len(parts) < 2 or parts[0] != 'jobs':
+            self.send_error_json(404, '未知的地址')
+            return
+        job = self.service.store.get(parts[1])
+        if job is None:
+            self.send_error_json(404, f'任务不存在：{parts[1]}')
+            return
+        if len(parts) == 2:
+            self.send_json(200, self.service.describe(job))
+        elif len(parts) == 3 and parts[2] == 'zip':
+            if job['status'] in ('queued', 'running'):
+                self.send_error_json(409, f'任务尚未结束：{job["status"]}')
+                return
+            self.send_file(self.service.build_zip(job['id']), 'application/zip')
+        elif len(parts) >= 4 and parts[2] == 'files':
+            path = self.service.output_path(job['id'], '/'.join(parts[3:]))
+            if path is None:
+                self.send_error_json(404, '文件不存在')
+                return
+            content_type = ('text/plain; charset=utf-8' if path.endswith('.log') else
+                            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+            self.send_file(path, content_type)
+        else:
+            self.send_error_json(404, '未知的地址')
+
+    def do_POST(self):
+        parts, query = self.route()
+        if len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+            if self.service.store.get(parts[1]) is None:
+                self.send_error_json(404, f'任务不存在：{parts[1]}')
+            elif self.service.cancel(parts[1]):
+                self.send_json(202, self.service.describe(self.service.store.get(parts[1])))
+            else:
+                self.send_error_json(409, '任务已结束，无法取消')
+            return
+        if parts != ['jobs']:
+            self.send_error_json(404, '未知的地址')
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_UPLOAD_MB * 1024 * 1024:
+            self.send_error_json(413, f'上传内容超过{MAX_UPLOAD_MB}MB')
+            return
+        data = self.rfile.read(length)
+        try:
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                files = json.loads(data.decode('utf-8')).get('files') or []
+                job_id = self.service.submit_paths(files)
+            else:
+                job_id = self.service.submit_upload(query.get('name', [''])[0], data)
+        except (ValueError, zipfile.BadZipFile, AttributeError) as e:
+            self.send_error_json(400, str(e))
+            return
+        self.send_json(201, self.service.describe(self.service.store.get(job_id)))
+
+
+def serve(root, port, workers):
+    """启动本地任务服务，直到按Ctrl+C；退出时正在运行的任务被取消，下次启动后重新排队"""
+    service = JobService(root, workers)
+    server = ThreadingHTTPServer((SERVICE_HOST, port), JobRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    service.start()
+    logging.info(f'任务服务已启动：http://{SERVICE_HOST}:{server.server_address[1]}/jobs，'
+                 f'{service.workers}个工作线程，任务目录{service.root}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logging.info('正在停止任务服务')
+        server.server_close()
+        service.stop()
@@ -0,0 +1,163 @@
+import os
+import re
+import math
+import pickle
+import shutil
+import logging
+import tempfile
+
+import pandas as pd
+from openpyxl import load_workbook
+
+# 原始收货明细表前9行为抬头和表头（与 pd.read_excel(skiprows=8) 一致），数据从第10行开始
+HEADER_ROWS = 9
+
+# 流式处理时每批清洗的收货单数量
+STREAM_CHUNK_RECEIPTS = 500
+
+# 收货单号行的格式
+RECEIPT_PATTERN = re.compile(r'^(RTS)?000\d+$')
+
+
+def iter_journal_rows(input_file, width, skip_rows=HEADER_ROWS):
+    """逐行读取收货明细表的数据行，不把整个文件载入内存
+
+    每行补齐到width列，空单元格统一为NaN（与 pd.read_excel 一致）。
+    """
+    if input_file.lower().endswith('.xls'):
+        rows = iter_xls_rows(input_file, skip_rows)
+    else:
+        rows = iter_xlsx_rows(input_file, skip_rows)
+    for row in rows:
+        row = [math.nan if value is None else value for value in row[:width]]
+        if len(row) < width:
+            row.extend([math.nan] * (width - len(row)))
+        yield row
+
+
+def iter_xlsx_rows(input_file, skip_rows):
+    """以只读模式逐行读取xlsx文件的第一个工作表"""
+    wb = load_workbook(input_file, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        for row in ws.iter_rows(min_row=skip_rows + 1, values_only=True):
+            yield row
+    finally:
+        wb.close()
+
+
+def iter_xls_rows(input_file, skip_rows):
+    """逐行读取xls文件的第一个工作表，日期单元格转换为datetime，空单元格转换为None"""
+    import xlrd
+
+    book = xlrd.open_workbook(input_file, on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        for row_index in range(skip_rows, sheet.nrows):
+            row = []
+            for cell in sheet.row(row_index):
+                if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+                    row.append(None)
+                elif cell.ctype == xlrd.XL_CELL_DATE:
+                    row.append(xlrd.xldate_as_datetime(cell.value, book.datemode))
+                else:
+                    row.append(cell.value)
+            yield row
+    finally:
+        book.release_resources()
+
+
+def iter_receipt_blocks(rows, receipt_column, first_row=HEADER_ROWS + 1):
+    """按收货单号行切分数据行，逐个产出 (收货单号行的Excel行号, 收货单号行, 明细行列表)
+
+    first_row 为第一个数据行的Excel行号，明细行紧接在收货单号行之后。第一个收货单号之前的行被忽略。
+    """
+    current = None
+    current_row = None
+    details = []
+    for row_number, row in enumerate(rows, first_row):
+        if RECEIPT_PATTERN.match(str(row[receipt_column])):
+            if current is not None:
+                yield current_row, current, details
+            current, current_row, details = row, row_number, []
+        elif current is not None:
+            details.append(row)
+    if current is not None:
+        yield current_row, current, details
+
+
+def iter_receipt_batches(input_file, width, receipt_column, batch_size=STREAM_CHUNK_RECEIPTS, skip_rows=HEADER_ROWS):
+    """流式读取一个文件，每次产出最多batch_size张收货单的 (Excel行号, 收货单号行, 明细行列表) 列表
+
+    skip_rows 为数据行之前的行数（抬头和表头）。
+    """
+    batch = []
+    for block in iter_receipt_blocks(iter_journal_rows(input_file, width, skip_rows), receipt_column, skip_rows + 1):
+        batch.append(block)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def input_size_mb(input_files):
+    """输入文件的总大小（MB）"""
+    return sum(os.path.getsize(path) for path in input_files if os.path.exists(path)) / (1024 * 1024)
+
+
+class SupplierPartitions:
+    """按供应商分区暂存在磁盘上的清洗后数据
+
+    每个供应商一个临时文件，每批数据以pickle追加写入，生成对账单时再逐个供应商读回，
+    内存中同时只保留一个供应商的数据。
+    """
+
+    def __init__(self, temp_root=None):
+        self.directory = tempfile.mkdtemp(prefix='mc_recon_', dir=temp_root)
+        self.paths = {}
+        self.row_count = 0
+
+    def __len__(self):
+        return len(self.paths)
+
+    def append(self, chunk):
+        """将一批清洗后的数据按供应商追加到对应分区"""
+        for supplier, frame in chunk.groupby('供应商名称', dropna=False, sort=False):
+            key = None if pd.isna(supplier) else supplier
+            path = self.paths.get(key)
+            if path is None:
+                path = os.path.join(self.directory, f'{len(self.paths):05d}.pkl')
+                self.paths[key] = path
+            with open(path, 'ab') as f:
+                pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.row_count += len(chunk)
+
+    def suppliers(self):
+        """有供应商名称的分区，按名称排序（与 groupby 的顺序一致）"""
+        return sorted(key for key in self.paths if key is not None)
+
+    def load(self, supplier):
+        """读回一个供应商分区的全部数据"""
+        frames = []
+        with open(self.paths[supplier], 'rb') as f:
+            while True:
+                try:
+                    frames.append(pickle.load(f))
+                except EOFError:
+                    break
+        return pd.concat(frames, ignore_index=True)
+
+    def iter_suppliers(self):
+        """逐个产出 (供应商名称, 数据)"""
+        for supplier in self.suppliers():
+            yield supplier, self.load(supplier)
+
+    def iter_frames(self):
+        """逐个产出每个分区的数据，包括供应商名称为空的分区"""
+        for key in self.paths:
+            yield self.load(key)
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        logging.info(f'已清理临时分区目录：{self.directory}')
@@ -0,0 +1,144 @@
+import os
+import time
+import logging
+import zipfile
+
+from recon_cache import ParseCache
+from recon_checkpoint import input_signature
+
+# 监视的收货明细文件类型
+JOURNAL_SUFFIXES = ('.xlsx', '.xls')
+
+
+class JournalWatcher:
+    """轮询输入文件夹，找出已经写入完成的收货明细文件
+
+    文件大小和修改时间在settle_seconds内保持不变，并且能够打开（xlsx的zip目录完整）时视为写入完成。
+    Excel的临时文件（~$开头）和隐藏文件不处理。
+    """
+
+    def __init__(self, folder, settle_seconds):
+        self.folder = folder
+        self.settle_seconds = settle_seconds
+        # 文件 -> (大小, 修改时间, 首次看到该状态的时间)
+        self.states = {}
+
+    def is_complete(self, path):
+        if path.lower().endswith('.xlsx'):
+            return zipfile.is_zipfile(path)
+        try:
+            with open(path, 'rb'):
+                return True
+        except OSError:
+            return False
+
+    def scan(self):
+        """返回文件夹中所有已写入完成的收货明细文件（按文件名排序），以及仍在写入的文件数"""
+        os.makedirs(self.folder, exist_ok=True)
+        now = time.monotonic()
+        ready = []
+        pending = 0
+        states = {}
+        for name in sorted(os.listdir(self.folder)):
+            path = os.path.join(self.folder, name)
+            if name.startswith(('~$', '.')) or not name.lower().endswith(JOURNAL_SUFFIXES) or not os.path.isfile(path):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            size_mtime = (stat.st_size, stat.st_mtime_ns)
+            previous = self.states.get(path)
+            since = previous[2] if previous is not None and previous[:2] == size_mtime else now
+            states[path] = size_mtime + (since,)
+            if now - since >= self.settle_seconds and self.is_complete(path):
+                ready.append(path)
+            else:
+                pending += 1
+        self.states = states
+        return ready, pending
+
+
+class WatchService:
+    """监视文件夹守护进程：出现新的收货明细时，用文件夹中全部已完成的收货明细增量处理一次
+
+    已处理过的文件从解析缓存载入，不再读取和清洗；只重新生成新文件中出现的供应商的对账单，
+    汇总表、成本中心报表和历史库按全部数据更新。每次处理后记录耗时和吞吐量。
+    """
+
+    def __init__(self, folder, cache_dir, poll_seconds, settle_seconds, stop_event=None):
+        self.watcher = JournalWatcher(folder, settle_seconds)
+        self.parse_cache = ParseCache(cache_dir)
+        self.poll_seconds = poll_seconds
+        self.stop_event = stop_event
+        # 已成功处理过但没有进入解析缓存的文件（读取失败或有清洗错误），内容不变时不重复处理；
+        # 处理失败的运行不记录，下次检查时重新处理
+        self.attempted = set()
+        self.total_files = 0
+        self.total_rows = 0
+        self.total_seconds = 0.0
+
+    def signature(self, path):
+        try:
+            return input_signature([path])
+        except OSError:
+            return None
+
+    def new_files(self, ready):
+        """尚未处理过的文件：不在解析缓存中，且上次处理后内容有变化"""
+        return [path for path in ready
+                if not self.parse_cache.contains(path) and self.signature(path) not in self.attempted]
+
+    def process(self, ready, new):
+        """处理一次：输入为文件夹中全部已完成的文件，返回 (是否成功, 错误信息)"""
+        from recon_engine import ReconEngine
+
+        logging.info(f'发现{len(new)}个新的收货明细文件：{"，".join(os.path.basename(path) for path in new)}')
+        start_time = time.perf_counter()
+        engine = ReconEngine(ready, cancel_event=self.stop_event, parse_cache=self.parse_cache, incremental=True)
+        success, error_msg = engine.run()
+        elapsed = time.perf_counter() - start_time
+        if success:
+            for path in new:
+                signature = self.signature(path)
+                if signature is not None:
+                    self.attempted.add(signature)
+        self.parse_cache.prune(ready)
+
+        self.total_files += len(new)
+        self.total_rows += engine.total_rows
+        self.total_seconds += elapsed
+        rate = engine.total_rows / elapsed if elapsed > 0 else 0
+        logging.info(f'增量处理{"完成" if success else "失败"}：新文件{len(new)}个（共{len(ready)}个），'
+                     f'重新生成{len(engine.completed_reports)}份对账单，{engine.total_rows}行，'
+                     f'耗时{elapsed:.1f}秒，{rate:.0f}行/秒')
+        logging.info(f'监视以来累计：{self.total_files}个新文件，{self.total_rows}行，处理耗时{self.total_seconds:.1f}秒')
+        if not success:
+            logging.error(error_msg)
+        elif error_msg:
+            logging.warning(error_msg)
+        return success, error_msg
+
+    def poll(self):
+        """检查一次文件夹，有新文件时处理，返回仍在写入、尚未处理的文件数"""
+        ready, pending = self.watcher.scan()
+        new = self.new_files(ready)
+        if new:
+            self.process(ready, new)
+        elif pending:
+            logging.debug(f'{pending}个文件仍在写入，稍后处理')
+        return pending
+
+    def run(self, once=False):
+        """持续监视文件夹，直到stop_event被设置；once为True时等待现有文件写入完成并处理一次后返回"""
+        logging.info(f'开始监视文件夹：{os.path.abspath(self.watcher.folder)}，每{self.poll_seconds:g}秒检查一次，'
+                     f'文件{self.watcher.settle_seconds:g}秒内不再变化视为写入完成')
+        while self.stop_event is None or not self.stop_event.is_set():
+            pending = self.poll()
+            if once and not pending:
+                return
+            wait = min(self.poll_seconds, self.watcher.settle_seconds) if once else self.poll_seconds
+            if self.stop_event is not None:
+                self.stop_event.wait(wait)
+            else:
+                time.sleep(wait)
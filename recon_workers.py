@@ -0,0 +1,316 @@
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import multiprocessing
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from recon_report import RECEIPT_COLUMNS, ReportTemplate, generate_supplier_report
+from shared_columns import SharedColumns, SharedColumnsWriter
+
+# 子进程挂载的共享缓冲区和编译好的对账单模板，每个子进程对每次运行（共享缓冲区目录）只准备一次；
+# 批量处理多个物业时进程池共用，换到下一个物业的缓冲区时重新挂载
+_shared_columns = None
+_shared_directory = None
+_report_templates = {}
+
+# 调度参数：每份对账单的固定开销（折算为行数），行数少于SMALL_JOB_ROWS的对账单合并为一个任务
+JOB_OVERHEAD_ROWS = 100
+SMALL_JOB_ROWS = 50
+
+# 周期数据按批写入共享缓冲区，一批累计达到RENDER_BATCH_ROWS行时提交该批任务，子进程生成对账单的同时继续切分
+RENDER_BATCH_ROWS = 20000
+
+# 子进程内存估算：基础占用加每行明细的占用，所有子进程合计不超过可用内存的MEMORY_BUDGET_RATIO
+WORKER_BASE_MB = 80
+ROW_MEMORY_KB = 10
+MEMORY_BUDGET_RATIO = 0.7
+
+
+def process_memory_mb():
+    """当前进程的内存占用（MB），优先使用psutil，否则使用峰值常驻内存，都无法获取时返回None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux下单位为KB，macOS下为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def available_memory_mb():
+    """系统当前可用内存（MB），无法获取时返回None"""
+    try:
+        import psutil
+        return psutil.virtual_memory().available / (1024 * 1024)
+    except ImportError:
+        pass
+    if sys.platform == 'win32':
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                        ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                        ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                        ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                        ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys / (1024 * 1024)
+        return None
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def job_cost(job):
+    """估算一份对账单的生成成本：明细行数加固定开销"""
+    return job[4] - job[3] + JOB_OVERHEAD_ROWS
+
+
+def plan_render_tasks(jobs, workers):
+    """将对账单分配为进程池任务：大的对账单单独成为一个任务，按成本从大到小提交，
+    小的对账单合并为成本接近的批次，减少每个任务的调度开销
+
+    Returns:
+        list: 任务列表，每个任务是一组对账单
+    """
+    jobs = sorted(jobs, key=job_cost, reverse=True)
+    large_jobs = [job for job in jobs if job[4] - job[3] >= SMALL_JOB_ROWS]
+    small_jobs = [job for job in jobs if job[4] - job[3] < SMALL_JOB_ROWS]
+
+    tasks = [[job] for job in large_jobs]
+    if small_jobs:
+        # 小任务批次的成本不超过平均每个子进程负载的1/4，保证末尾仍能均衡分配
+        total_cost = sum(job_cost(job) for job in jobs)
+        batch_cost = max(total_cost / (max(workers, 1) * 4), JOB_OVERHEAD_ROWS * 2)
+        batch, cost = [], 0
+        for job in small_jobs:
+            if batch and cost + job_cost(job) > batch_cost:
+                tasks.append(batch)
+                batch, cost = [], 0
+            batch.append(job)
+            cost += job_cost(job)
+        tasks.append(batch)
+    return sorted(tasks, key=lambda task: sum(job_cost(job) for job in task), reverse=True)
+
+
+def choose_worker_count(requested, tasks, limit_by_tasks=True):
+    """按CPU核数和可用内存确定实际使用的子进程数，不超过配置的数量和任务数（limit_by_tasks为False时不按任务数限制）"""
+    cpu_count = os.cpu_count() or 1
+    largest_rows = max((job[4] - job[3] for task in tasks for job in task), default=0)
+    worker_mb = WORKER_BASE_MB + largest_rows * ROW_MEMORY_KB / 1024
+    memory_mb = available_memory_mb()
+
+    limits = {'配置': requested, 'CPU核数': cpu_count}
+    if limit_by_tasks:
+        limits['任务数'] = len(tasks)
+    if memory_mb is not None:
+        limits['可用内存'] = max(int(memory_mb * MEMORY_BUDGET_RATIO // worker_mb), 1)
+    workers = max(min(limits.values()), 1)
+
+    memory_text = f'{memory_mb:.0f}MB' if memory_mb is not None else '未知'
+    limit_text = '，'.join(f'{name}{value}' for name, value in limits.items())
+    logging.info(f'进程池调度：可用内存{memory_text}，单个子进程预计占用{worker_mb:.0f}MB，'
+                 f'上限（{limit_text}），使用{workers}个子进程')
+    return workers
+
+
+def attach_shared_columns(directory, company_name, template_file):
+    """在子进程中挂载共享缓冲区并取得编译好的对账单模板，已挂载的缓冲区和已编译的模板直接复用"""
+    global _shared_columns, _shared_directory
+    if _shared_directory != directory:
+        _shared_columns = SharedColumns(directory)
+        _shared_directory = directory
+    template = _report_templates.get((company_name, template_file))
+    if template is None:
+        template = _report_templates[(company_name, template_file)] = ReportTemplate(company_name, template_file)
+    return _shared_columns, template
+
+
+def render_report_task(task, directory, company_name, template_file):
+    """子进程中生成一组对账单，每个对账单只有行范围和生成参数，数据直接从共享缓冲区读取
+
+    一份对账单生成失败不影响同一任务中的其他对账单，失败的对账单以 (供应商名称, 输出文件, 原因) 返回。
+    """
+    output_files = []
+    errors = []
+    shared_columns, template = attach_shared_columns(directory, company_name, template_file)
+    for supplier_name, period_start, period_end, row_start, row_stop, output_file in task:
+        try:
+            period_data = shared_columns.frame(row_start, row_stop)
+            generate_supplier_report(supplier_name, period_data, period_start, period_end, output_file,
+                                     company_name, template)
+        except Exception as e:
+            errors.append((supplier_name, output_file, str(e)))
+            continue
+        output_files.append(output_file)
+    return output_files, errors, os.getpid(), process_memory_mb()
+
+
+class RenderPool:
+    """生成对账单的进程池，可以在多次运行之间共用（例如集团批量处理多个物业），避免每次重新启动子进程
+
+    子进程在第一次使用时按当时的任务和可用内存确定数量并启动，之后的运行沿用同一批子进程；
+    shared 为True时供多次运行共用，子进程数不受第一次运行的任务数限制。
+    """
+
+    def __init__(self, workers, shared=False):
+        self.workers = workers
+        self.shared = shared
+        self.started_workers = 0
+        self.executor = None
+
+    def start(self, tasks, all_tasks=True):
+        """返回进程池，尚未启动时按配置的上限、CPU核数、可用内存和任务数确定子进程数后启动
+
+        all_tasks 为False表示tasks只是第一批任务，子进程数不按任务数限制。
+        """
+        if self.executor is None:
+            self.started_workers = choose_worker_count(self.workers, tasks,
+                                                       limit_by_tasks=all_tasks and not self.shared)
+            # 统一使用spawn，与Windows打包版本一致；fork时备份和预读线程正在运行，子进程可能继承被占用的锁而死锁
+            self.executor = ProcessPoolExecutor(max_workers=self.started_workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        else:
+            logging.info(f'进程池调度：沿用已启动的{self.started_workers}个子进程')
+        return self.executor
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iter_render_batches(report_jobs, buffer_dir):
+    """将周期数据逐批写入共享缓冲区，每批写入单独的分段目录，累计达到RENDER_BATCH_ROWS行或数据结束时产出一批
+
+    Yields:
+        tuple: (分段目录, 本批对账单的 (供应商名称, 周期开始, 周期结束, 起始行, 结束行, 输出文件) 列表, 是否最后一批)
+    """
+    report_jobs = iter(report_jobs)
+    pending = next(report_jobs, None)
+    batch = 0
+    while pending is not None:
+        directory = os.path.join(buffer_dir, f'{batch:05d}')
+        writer = SharedColumnsWriter(directory, RECEIPT_COLUMNS)
+        jobs = []
+        while pending is not None and (not jobs or writer.rows < RENDER_BATCH_ROWS):
+            supplier_name, period_start, period_end, period_data, output_file = pending
+            row_start = writer.rows
+            writer.append(period_data)
+            jobs.append((supplier_name, period_start, period_end, row_start, writer.rows, output_file))
+            pending = next(report_jobs, None)
+        writer.close()
+        batch += 1
+        logging.info(f'共享缓冲区第{batch}批已写入：{writer.rows}行，{writer.size_mb():.1f}MB，{len(jobs)}份对账单')
+        yield directory, jobs, pending is None
+
+
+def render_reports_in_pool(report_jobs, company_name, template_file, workers, progress_callback=None,
+                           cancel_check=None, report_callback=None, error_callback=None, pool=None):
+    """在进程池中生成对账单
+
+    report_jobs 逐个产出 (供应商名称, 周期开始, 周期结束, 周期数据, 输出文件)。周期数据按批（RENDER_BATCH_ROWS行）
+    写入共享缓冲区的分段，每写完一批即提交，子进程生成这一批的同时继续切分和写入下一批；子进程以内存映射方式
+    读取自己的行范围，进程间只传递行偏移和生成参数。每批内按成本从大到小提交，跨批次不重新排序。
+    template_file 为自定义对账单模板（None表示内置模板），每个子进程编译一次。
+    workers 为配置的子进程数上限，实际数量还受CPU核数和可用内存限制。
+    cancel_check 在每个任务完成后调用，抛出异常时取消尚未开始的任务，只等待正在生成的任务结束。
+    report_callback 在每份对账单生成后以输出文件调用。
+    error_callback 在一份对账单生成失败时以 (供应商名称, 输出文件, 原因) 调用，其他对账单继续生成。
+    pool 为共用的RenderPool，未指定时为本次运行单独启动一个进程池，结束后关闭。
+    """
+    buffer_dir = tempfile.mkdtemp(prefix='mc_recon_shared_')
+    try:
+        worker_memory = {}
+        futures = []
+        finished = set()
+        done = 0
+        submitted = 0
+        
+        def collect(future):
+            """登记一个已完成任务生成的对账单"""
+            nonlocal done
+            finished.add(future)
+            output_files, errors, pid, memory_mb = future.result()
+            if memory_mb is not None:
+                worker_memory[pid] = max(memory_mb, worker_memory.get(pid, 0))
+            for supplier_name, output_file, reason in errors:
+                done += 1
+                if error_callback is not None:
+                    error_callback(supplier_name, output_file, reason)
+            for output_file in output_files:
+                done += 1
+                logging.info(f'已生成供应商对账单：{output_file}')
+                if report_callback is not None:
+                    report_callback(output_file)
+                if progress_callback is not None:
+                    progress_callback(f'已生成供应商对账单 ({done}/{submitted}): {os.path.basename(output_file)}')
+        
+        def collect_finished():
+            """登记提交下一批之前已经完成的任务"""
+            for future in futures:
+                if future not in finished and future.done():
+                    collect(future)
+                    if cancel_check is not None:
+                        cancel_check()
+        
+        with RenderPool(workers) if pool is None else nullcontext(pool) as render_pool:
+            try:
+                for directory, jobs, last in iter_render_batches(report_jobs, buffer_dir):
+                    tasks = plan_render_tasks(jobs, workers)
+                    batched = [task for task in tasks if len(task) > 1]
+                    logging.info(f'进程池调度：{len(tasks)}个任务，其中{len(batched)}个任务合并了'
+                                 f'{sum(len(task) for task in batched)}份小对账单（少于{SMALL_JOB_ROWS}行）')
+                    for task in tasks:
+                        if len(task) == 1:
+                            logging.info(f'进程池调度：{task[0][0]} {task[0][4] - task[0][3]}行，预计成本{job_cost(task[0])}')
+                    # 第一批之后还有数据时，子进程数不按第一批的任务数限制
+                    executor = render_pool.start(tasks, all_tasks=not futures and last)
+                    # 按成本从大到小提交，最大的对账单最先开始，避免最后只剩一个子进程在生成大对账单
+                    futures.extend(executor.submit(render_report_task, task, directory, company_name, template_file)
+                                   for task in tasks)
+                    submitted += len(jobs)
+                    collect_finished()
+                
+                for future in as_completed([future for future in futures if future not in finished]):
+                    collect(future)
+                    if cancel_check is not None:
+                        cancel_check()
+            except BaseException:
+                # 取消尚未开始的任务；正在生成的任务完成后对账单是完整的，照常登记
+                for future in futures:
+                    future.cancel()
+                for future in futures:
+                    if future not in finished and not future.cancelled():
+                        try:
+                            collect(future)
+                        except Exception:
+                            pass
+                raise
+
+        for pid, memory_mb in sorted(worker_memory.items()):
+            logging.info(f'子进程 {pid} 内存占用：{memory_mb:.1f}MB')
+    finally:
+        shutil.rmtree(buffer_dir, ignore_errors=True)
@@ -0,0 +1,194 @@
+import os
+import json
+import pickle
+
+import numpy as np
+import pandas as pd
+
+# 共享缓冲区的描述文件
+MANIFEST_FILE = 'manifest.json'
+
+# 对象编码中的特殊值：None 和 NaN 分开记录，读回后与原数据一致；浮点列中FLOAT_CODE表示取浮点数组中的值
+NONE_CODE = -1
+NAN_CODE = -2
+FLOAT_CODE = -3
+
+
+class SharedColumnsWriter:
+    """将数据按列写入磁盘上的共享缓冲区，供子进程以内存映射方式读取
+
+    浮点列直接保存为float64数组；其他列保存为int32编码，编码对应的值以pickle写入同一个字典文件，
+    子进程只解码自己读取的行用到的值。浮点列中个别非浮点的值（如文本）也通过编码保存。
+    数据可以分多次追加，写入后调用close生成描述文件。
+    """
+
+    def __init__(self, directory, columns):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.columns = list(columns)
+        self.kinds = {}
+        self.dtypes = {}
+        self.files = {}
+        self.codes = {}
+        self.offsets = [0]
+        self.dictionary_file = open(os.path.join(directory, 'dictionary.bin'), 'wb')
+        self.rows = 0
+
+    def encode(self, value):
+        """返回值在字典中的编码，新值追加到字典文件"""
+        key = (type(value), value)
+        code = self.codes.get(key)
+        if code is None:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            self.dictionary_file.write(data)
+            self.offsets.append(self.offsets[-1] + len(data))
+            code = len(self.offsets) - 2
+            self.codes[key] = code
+        return code
+
+    def encode_values(self, values):
+        """对象数组整体编码：相同的值只查一次字典，空值使用NONE_CODE/NAN_CODE"""
+        codes = np.empty(len(values), dtype=np.int32)
+        null_mask = pd.isna(values)
+        for position in np.flatnonzero(null_mask):
+            codes[position] = NONE_CODE if values[position] is None else NAN_CODE
+        if not null_mask.all():
+            positions = np.flatnonzero(~null_mask)
+            value_codes, uniques = pd.factorize(values[positions])
+            unique_codes = np.array([self.encode(value) for value in uniques], dtype=np.int32)
+            codes[positions] = unique_codes[value_codes]
+        return codes
+
+    def open_column(self, column, series):
+        """首次写入时按列的类型确定保存方式，并打开对应的数据文件"""
+        is_float = pd.api.types.is_float_dtype(series.dtype)
+        self.kinds[column] = 'float' if is_float else 'object'
+        self.dtypes[column] = str(series.dtype)
+        files = {'codes': open(os.path.join(self.directory, f'{len(self.files)}.codes'), 'wb')}
+        if is_float:
+            files['values'] = open(os.path.join(self.directory, f'{len(self.files)}.values'), 'wb')
+        self.files[column] = files
+
+    def append(self, frame):
+        """追加一批数据，列顺序以columns为准"""
+        for column in self.columns:
+            series = frame[column]
+            if column not in self.files:
+                self.open_column(column, series)
+            files = self.files[column]
+
+            if self.kinds[column] == 'float':
+                codes = np.full(len(series), FLOAT_CODE, dtype=np.int32)
+                if pd.api.types.is_float_dtype(series.dtype):
+                    values = series.to_numpy(dtype=np.float64)
+                else:
+                    # 后续批次中不是浮点数的值（整数、文本、None等）按对象编码保存，读回时原样恢复
+                    objects = series.to_numpy(dtype=object)
+                    exceptions = np.array([not isinstance(value, float) for value in objects], dtype=bool)
+                    values = np.full(len(series), np.nan)
+                    values[~exceptions] = objects[~exceptions].astype(np.float64)
+                    codes[exceptions] = self.encode_values(objects[exceptions])
+                files['values'].write(values.tobytes())
+            else:
+                codes = self.encode_values(series.to_numpy(dtype=object))
+            files['codes'].write(codes.tobytes())
+        self.rows += len(frame)
+
+    def close(self):
+        """关闭数据文件并写入字典偏移和描述文件"""
+        for files in self.files.values():
+            for f in files.values():
+                f.close()
+        self.dictionary_file.close()
+        np.array(self.offsets, dtype=np.int64).tofile(os.path.join(self.directory, 'offsets.bin'))
+
+        manifest = {
+            'rows': self.rows,
+            'columns': [{'name': column, 'kind': self.kinds[column], 'dtype': self.dtypes[column], 'file': index}
+                        for index, column in enumerate(self.files)]
+        }
+        with open(os.path.join(self.directory, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+    def size_mb(self):
+        """共享缓冲区占用的磁盘空间（MB）"""
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory)) / (1024 * 1024)
+
+
+class SharedColumns:
+    """以只读内存映射方式挂载共享缓冲区，按行范围读取数据，不复制整个缓冲区"""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, MANIFEST_FILE), encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.rows = manifest['rows']
+        self.columns = [column['name'] for column in manifest['columns']]
+        self.kinds = {column['name']: column['kind'] for column in manifest['columns']}
+        self.dtypes = {column['name']: column['dtype'] for column in manifest['columns']}
+        self.codes = {}
+        self.values = {}
+        for column in manifest['columns']:
+            name, index = column['name'], column['file']
+            self.codes[name] = self.map_file(os.path.join(directory, f'{index}.codes'), np.int32)
+            if column['kind'] == 'float':
+                self.values[name] = self.map_file(os.path.join(directory, f'{index}.values'), np.float64)
+        self.offsets = self.map_file(os.path.join(directory, 'offsets.bin'), np.int64)
+        self.dictionary = self.map_file(os.path.join(directory, 'dictionary.bin'), np.uint8)
+        self.decoded = {}
+
+    @staticmethod
+    def map_file(path, dtype):
+        # 空文件无法建立内存映射，直接返回空数组
+        if os.path.getsize(path) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r')
+
+    def decode(self, code):
+        """解码字典中的一个值，已解码的值缓存在当前进程中"""
+        if code == NONE_CODE:
+            return None
+        if code == NAN_CODE:
+            return np.nan
+        value = self.decoded.get(code, self.decoded)
+        if value is self.decoded:
+            start, end = self.offsets[code], self.offsets[code + 1]
+            value = pickle.loads(self.dictionary[start:end].tobytes())
+            self.decoded[code] = value
+        return value
+
+    def decode_codes(self, codes):
+        """将编码数组解码为对象数组，相同的编码只解码一次"""
+        uniques, inverse = np.unique(codes, return_inverse=True)
+        values = np.empty(len(uniques), dtype=object)
+        values[:] = [self.decode(int(code)) for code in uniques]
+        return values[inverse.reshape(-1)]
+
+    def frame(self, start, stop):
+        """读取[start, stop)行，返回DataFrame"""
+        data = {}
+        for column in self.columns:
+            codes = self.codes[column][start:stop]
+            if self.kinds[column] == 'float':
+                values = np.array(self.values[column][start:stop])
+                exceptions = codes != FLOAT_CODE
+                if exceptions.any():
+                    values = values.astype(object)
+                    values[exceptions] = self.decode_codes(codes[exceptions])
+                    values = pd.Series(values, dtype=object)
+                data[column] = values
+            else:
+                data[column] = self.restore_dtype(self.decode_codes(codes), self.dtypes[column])
+        frame = pd.DataFrame(data, columns=self.columns)
+        frame.index = pd.RangeIndex(start, stop)
+        return frame
+
+    @staticmethod
+    def restore_dtype(values, dtype):
+        """按首次写入时的类型恢复列（如整数列），无法转换时保留对象类型"""
+        if dtype != 'object':
+            try:
+                return pd.array(values, dtype=dtype)
+            except (TypeError, ValueError):
+                pass
+        # 显式指定对象类型，避免文本列被自动推断为其他类型
+        return pd.Series(values, dtype=object)
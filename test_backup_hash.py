@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+
+from openpyxl import Workbook
+
+from recon_backup import BACKUP_PREFIX
+from recon_config import ReconConfig
+from recon_engine import ReconEngine
+
+# 测试脚本，用于检查流式处理和一次性处理同一份收货明细时得到相同的备份文件（内容哈希相同）
+
+
+def build_journal(path):
+    """生成一个收货明细表（默认列配置），数量和金额都是整数，收货单之间没有分页行"""
+    wb = Workbook()
+    ws = wb.active
+    for row in range(1, 9):
+        ws.cell(row=row, column=1, value=f'preamble {row}')
+    rows = [
+        ('000000001', '某某肉业', '2025-07-02', [('Beef 牛肉', 10, 'KG', 42, 420, 55, 475)]),
+        ('000000002', '小小商行', '2025-07-03', [('Salt 盐', 2, 'BAG', 3, 6, 1, 7),
+                                                ('Sugar 糖', 1, 'BAG', 5, 5, 1, 6)]),
+    ]
+    row = 10
+    for receipt, supplier, date, details in rows:
+        ws.cell(row=row, column=1, value=receipt)
+        ws.cell(row=row, column=4, value=supplier)
+        ws.cell(row=row, column=24, value=date)
+        row += 1
+        for name, quantity, unit, price, subtotal, tax, total in details:
+            # A、I、J、N、Z、AE、AI、AL列
+            for column, value in ((1, name), (9, quantity), (10, unit), (14, price), (26, subtotal),
+                                  (31, tax), (35, total), (38, 'Kitchen 厨房')):
+                ws.cell(row=row, column=column, value=value)
+            row += 1
+    wb.save(path)
+
+
+def backup_files(output_root):
+    directory = os.path.join(output_root, 'bak')
+    return sorted(name for name in os.listdir(directory) if name.startswith(BACKUP_PREFIX))
+
+
+work_dir = tempfile.mkdtemp()
+current_dir = os.getcwd()
+try:
+    # run() 的日志目录在运行目录下
+    os.chdir(work_dir)
+    journal = os.path.join(work_dir, 'journal.xlsx')
+    build_journal(journal)
+    backups = {}
+    for mode, threshold in (('一次性处理', 200), ('流式处理', 0)):
+        output_root = os.path.join(work_dir, mode)
+        config = ReconConfig(company_name='TEST HOTEL', output_root=output_root, history_store=None,
+                             performance={'streaming_threshold_mb': threshold})
+        success, error_msg = ReconEngine([journal], config=config).run()
+        assert success, error_msg
+        backups[mode] = backup_files(output_root)
+        print(f'{mode}：{backups[mode]}')
+    assert backups['一次性处理'] == backups['流式处理']
+    print('两种方式得到相同的备份文件')
+finally:
+    os.chdir(current_dir)
+    shutil.rmtree(work_dir, ignore_errors=True)
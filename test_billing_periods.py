@@ -0,0 +1,50 @@
+import pandas as pd
+
+from recon_config import ReconConfig
+from recon_engine import ReconEngine
+
+# 测试脚本，用于检查按对账周期切分供应商数据时周期边界上的收货单归入正确的周期，
+# 没有数据的周期被跳过，收货日期缺失的行归入最后一个周期
+
+engine = ReconEngine(config=ReconConfig(company_name='TEST HOTEL'))
+
+
+def slice_receipts(rule_text, dates):
+    """按规则切分一个供应商的数据（已按收货日期排序，缺失日期在末尾），返回 [(周期开始, 周期结束, 收货单号列表)]"""
+    data = pd.DataFrame({'收货单号': [f'{number:09d}' for number in range(1, len(dates) + 1)],
+                         '收货日期': dates,
+                         '供应商名称': '某某肉业'})
+    rule = engine.parse_billing_period_rule(rule_text)
+    return [(str(start.date()), str(end.date()), period['收货单号'].tolist())
+            for start, end, period in engine.slice_billing_periods(data, rule)]
+
+
+# 自然月：月末最后一天和下月1日分属两个周期
+periods = slice_receipts('month', ['2025-07-01', '2025-07-31', '2025-08-01', '2025-08-31'])
+print(f'month：{periods}')
+assert periods == [('2025-07-01', '2025-07-31', ['000000001', '000000002']),
+                   ('2025-08-01', '2025-08-31', ['000000003', '000000004'])]
+
+# 每月26日起：25日在上一个周期，26日开始新周期；9月没有数据的周期被跳过
+periods = slice_receipts('month:26', ['2025-07-25', '2025-07-26', '2025-08-25', '2025-10-26'])
+print(f'month:26：{periods}')
+assert periods == [('2025-06-26', '2025-07-25', ['000000001']),
+                   ('2025-07-26', '2025-08-25', ['000000002', '000000003']),
+                   ('2025-10-26', '2025-11-25', ['000000004'])]
+
+# 自锚定日期起每14天：锚定日期之前的收货单归入之前的周期，第14天和第15天分属两个周期
+periods = slice_receipts('days:14:2025-01-06  # 双周', ['2025-01-05', '2025-01-06', '2025-01-19', '2025-01-20'])
+print(f'days:14：{periods}')
+assert periods == [('2024-12-23', '2025-01-05', ['000000001']),
+                   ('2025-01-06', '2025-01-19', ['000000002', '000000003']),
+                   ('2025-01-20', '2025-02-02', ['000000004'])]
+
+# 收货日期缺失的行归入最后一个周期
+periods = slice_receipts('month', ['2025-07-15', '2025-08-15', None])
+print(f'缺失日期：{periods}')
+assert periods == [('2025-07-01', '2025-07-31', ['000000001']),
+                   ('2025-08-01', '2025-08-31', ['000000002', '000000003'])]
+
+# 没有有效日期时不产生任何周期
+assert slice_receipts('month', [None, None]) == []
+print('对账周期边界检查通过')
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import threading
+
+from openpyxl import load_workbook
+
+import recon_engine
+from fixture_journal import write_journal
+from recon_checkpoint import CHECKPOINT_FILE
+from recon_engine import ReconEngine
+
+# 测试脚本，用于检查运行中断后续跑：检查点中已完成的对账单不再重新生成，只生成剩余的对账单，
+# 汇总表仍列出全部对账单，运行成功后删除检查点
+
+RECEIPTS = [
+    ('000000001', '某某肉业', '2025-07-02', [('Beef 牛肉', 10, 'KG', 42.5, 425.0, 55.25, 480.25)]),
+    ('000000002', '小小商行', '2025-07-03', [('Salt 盐', 2, 'BAG', 3.0, 6.0, 0.78, 6.78)]),
+    ('000000003', '大大蔬菜', '2025-07-09', [('Onion 洋葱', 5, 'KG', 4.0, 20.0, 1.8, 21.8)]),
+]
+
+work_dir = tempfile.mkdtemp()
+current_dir = os.getcwd()
+generate_supplier_report = recon_engine.generate_supplier_report
+try:
+    # run() 的日志目录和输出都在运行目录下
+    os.chdir(work_dir)
+    journal = os.path.join(work_dir, 'journal.xlsx')
+    write_journal(journal, RECEIPTS)
+    generated = []
+    cancel_event = threading.Event()
+
+    def record_report(supplier_name, *args, **kwargs):
+        generate_supplier_report(supplier_name, *args, **kwargs)
+        generated.append(supplier_name)
+        # 第一份对账单生成后中断运行
+        cancel_event.set()
+
+    recon_engine.generate_supplier_report = record_report
+    success, error_msg = ReconEngine([journal], cancel_event=cancel_event).run()
+    print(f'第一次运行：{error_msg}，已生成{generated}')
+    assert not success
+    assert len(generated) == 1
+    assert os.path.exists(CHECKPOINT_FILE), '中断的运行应保留检查点'
+    first_supplier = generated[0]
+    first_report = os.path.join('供应商对账明细', '202507', f'{first_supplier}_对账明细.xlsx')
+    first_mtime = os.stat(first_report).st_mtime_ns
+
+    # 续跑只生成剩余的两份对账单
+    generated.clear()
+    engine = ReconEngine([journal], resume=True)
+    success, error_msg = engine.run()
+    print(f'续跑：已生成{generated}')
+    assert success, error_msg
+    assert sorted(generated) == sorted({'某某肉业', '小小商行', '大大蔬菜'} - {first_supplier})
+    assert os.stat(first_report).st_mtime_ns == first_mtime, '已完成的对账单不应重新生成'
+    assert not os.path.exists(CHECKPOINT_FILE), '运行成功后应删除检查点'
+
+    # 汇总表列出全部三份对账单
+    ws = load_workbook(os.path.join('供应商对账明细', '202507', '_汇总.xlsx')).active
+    suppliers = {value for row in ws.iter_rows(values_only=True) for value in row if value in ('某某肉业', '小小商行', '大大蔬菜')}
+    assert suppliers == {'某某肉业', '小小商行', '大大蔬菜'}, suppliers
+    print('续跑时跳过了已完成的对账单')
+finally:
+    recon_engine.generate_supplier_report = generate_supplier_report
+    os.chdir(current_dir)
+    shutil.rmtree(work_dir, ignore_errors=True)
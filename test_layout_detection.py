@@ -0,0 +1,70 @@
+import io
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from fixture_journal import write_journal
+from recon_config import ReconConfig
+from recon_engine import ReconEngine
+from recon_layout import LayoutDetector
+
+# 测试脚本，用于检查ERP多了一行抬头并在A列之后插入一列时，按表头文字识别出新的布局并读出与原布局相同的数据；
+# 抬头中的Delivery Date等文字不会被误认为表头，同一表头文字出现多次时取配置的列，没有表头文字的列在布局中记录
+
+RECEIPTS = [
+    ('000000001', '某某肉业', '2025-07-02', [('Beef 牛肉', 10, 'KG', 42.5, 425.0, 55.25, 480.25)]),
+    ('000000002', '小小商行', '2025-07-03', [('Salt 盐', 2, 'BAG', 3.0, 6.0, 0.78, 6.78),
+                                            ('Sugar 糖', 1, 'BAG', 5.0, 5.0, 0.65, 5.65)]),
+]
+
+# 表头行：A列为收货单号（商品名称与其同列，没有单独的表头），税额在AE列，另有一列“税额”在C列
+HEADER = {1: '收货单号', 3: '税额', 4: '供应商', 24: '收货日期', 9: '实收数量 QTY', 10: '基本单位', 14: '单价 Unit Price',
+          26: '小计金额', 31: '税额', 35: '小计价税', 38: '部门'}
+
+engine = ReconEngine(config=ReconConfig(company_name='TEST HOTEL'))
+work_dir = tempfile.mkdtemp()
+try:
+    original = os.path.join(work_dir, 'original.xlsx')
+    shifted = os.path.join(work_dir, 'shifted.xlsx')
+    write_journal(original, RECEIPTS, header=HEADER)
+    write_journal(shifted, RECEIPTS, header=HEADER, preamble_rows=9, inserted_columns=1)
+
+    # ERP的页眉：A列为Delivery Date，其他列为通用的英文词
+    wb = load_workbook(shifted)
+    for column, text in enumerate(('Delivery Date', 'Date', 'Total', 'Net', 'Unit', 'Price'), 1):
+        wb.active.cell(row=2, column=column, value=text)
+    wb.save(shifted)
+
+    detector = LayoutDetector(engine.column_config)
+    # 原布局：C列和AE列都是“税额”时取配置的AE列，与config.ini一致
+    layout = detector.detect(original)
+    assert layout.header_row == 9 and detector.mismatches(layout) == [], detector.mismatches(layout)
+
+    layout = detector.detect(shifted)
+    print(f'表头在第{layout.header_row}行，{detector.mismatches(layout)}')
+    assert layout.source == 'header'
+    assert layout.header_row == 10
+    expected = {key: index + 1 if index > 0 else index for key, index in engine.column_config.items()}
+    assert layout.columns == expected, layout.columns
+    assert layout.unmatched == ['product_name_column']
+    print(f'没有表头文字的列：{detector.unmatched_notes(layout)}')
+
+    # 表头签名相同的文件使用缓存的布局
+    buffer = io.BytesIO()
+    with open(shifted, 'rb') as f:
+        buffer.write(f.read())
+    buffer.seek(0)
+    cached = detector.detect(buffer)
+    assert cached.signature == layout.signature and cached.columns == layout.columns
+
+    # 新布局读出的数据与原布局相同
+    first = engine.process([original])
+    second = engine.process([shifted])
+    assert len(first.errors) == 0 and len(second.errors) == 0
+    pd.testing.assert_frame_equal(first.cleaned, second.cleaned)
+    print(f'两种布局读出相同的{len(second.cleaned)}行明细')
+finally:
+    shutil.rmtree(work_dir, ignore_errors=True)
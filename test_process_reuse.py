@@ -0,0 +1,94 @@
+import io
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from fixture_journal import write_journal
+from recon_config import ReconConfig
+from recon_engine import ReconEngine
+
+# 测试脚本，用于检查同一个ReconEngine多次调用process()时结果相同（上一次的对账单、错误不会带入下一次），
+# 以及process()和run()交替调用时：run()仍写入输出根目录并保存布局缓存，process()不写入任何文件
+
+# 其中一张收货单的金额不是数值
+RECEIPTS = [
+    ('000000001', '某某肉业', '2025-07-02', [('Beef 牛肉', 10, 'KG', 42.5, 425.0, 55.25, 480.25)]),
+    ('000000002', '小小商行', '2025-07-03', [('Salt 盐', 2, 'BAG', 3.0, 6.0, 0.78, 6.78),
+                                            ('Sugar 糖', 1, 'BAG', 5.0, 5.0, 0.65, 5.65)]),
+    ('000000003', '小小商行', '2025-07-09', [('Oil 油', 1, 'L', 20.0, 'abc', 2.6, 22.6)]),
+]
+
+
+def workbook_values(data):
+    wb = load_workbook(io.BytesIO(data))
+    return [[list(row) for row in ws.iter_rows(values_only=True)] for ws in wb.worksheets]
+
+
+def list_files(directory):
+    return sorted(os.path.relpath(os.path.join(root, name), directory)
+                  for root, dirs, names in os.walk(directory) for name in names)
+
+
+buffer = io.BytesIO()
+write_journal(buffer, RECEIPTS)
+journal = buffer.getvalue()
+
+# 同一个引擎两次process()
+engine = ReconEngine(config=ReconConfig(company_name='TEST HOTEL'))
+first = engine.process([io.BytesIO(journal)])
+second = engine.process([io.BytesIO(journal)])
+
+print(f"第一次：{first.metrics['reports']}份对账单，{len(first.errors)}个错误")
+print(f"第二次：{second.metrics['reports']}份对账单，{len(second.errors)}个错误")
+assert first.metrics['reports'] == second.metrics['reports']
+assert first.metrics['rows'] == second.metrics['rows']
+assert first.errors.equals(second.errors)
+pd.testing.assert_frame_equal(first.cleaned, second.cleaned)
+pd.testing.assert_frame_equal(first.summary, second.summary)
+pd.testing.assert_frame_equal(first.departments, second.departments)
+assert sorted(first.workbooks) == sorted(second.workbooks)
+for output_file in first.workbooks:
+    assert workbook_values(first.workbooks[output_file]) == workbook_values(second.workbooks[output_file]), output_file
+print('两次处理结果相同')
+
+work_dir = tempfile.mkdtemp()
+current_dir = os.getcwd()
+try:
+    # run() 的日志目录在运行目录下，输出在输出根目录下
+    os.chdir(work_dir)
+    journal_file = os.path.join(work_dir, 'journal.xlsx')
+    with open(journal_file, 'wb') as f:
+        f.write(journal)
+    shifted_file = os.path.join(work_dir, 'shifted.xlsx')
+    write_journal(shifted_file, RECEIPTS, preamble_rows=9)
+    output_root = os.path.join(work_dir, 'output')
+    layout_cache = os.path.join(output_root, 'cache', 'layouts.json')
+    statement = os.path.join(output_root, '供应商对账明细', '202507', '某某肉业_对账明细.xlsx')
+
+    # process() 之后 run()：输出仍在输出根目录下，布局缓存照常保存
+    engine = ReconEngine([journal_file], config=ReconConfig(company_name='TEST HOTEL', output_root=output_root))
+    engine.process([io.BytesIO(journal)])
+    assert not os.path.exists(output_root), 'process()不应写入文件'
+    success, error_msg = engine.run()
+    assert success, error_msg
+    assert os.path.exists(statement), 'run()应写入输出根目录'
+    assert not os.path.exists(os.path.join(work_dir, '供应商对账明细')), 'run()不应写入运行目录'
+    assert os.path.exists(layout_cache), 'run()应保存布局缓存'
+    print('process()之后run()：输出写入输出根目录，布局缓存已保存')
+
+    # run() 之后 process()：识别新的布局也不写入布局缓存
+    before = list_files(output_root)
+    with open(layout_cache, encoding='utf-8') as f:
+        cache_before = f.read()
+    result = engine.process([shifted_file])
+    assert result.metrics['reports'] == first.metrics['reports']
+    assert list_files(output_root) == before
+    with open(layout_cache, encoding='utf-8') as f:
+        assert f.read() == cache_before, 'process()不应写入布局缓存'
+    print('run()之后process()：没有写入任何文件')
+finally:
+    os.chdir(current_dir)
+    shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+
+import recon_engine
+from fixture_journal import write_journal
+from receipt_dedup import CONFLICTING_DUPLICATE, EXACT_DUPLICATE
+from receipt_store import ReceiptStore
+from recon_config import ReconConfig
+from recon_engine import ReconEngine
+
+# 测试脚本，用于检查跨文件和跨分块的重复收货单：完全重复的收货单（明细顺序、10与10.0的写法不同也算）只保留一份，
+# 内容冲突的收货单两份都保留并写入重复报告；流式处理（每块一张收货单）时同样识别
+
+BEEF = ('Beef 牛肉', 10, 'KG', 42.5, 425.0, 55.25, 480.25)
+PORK = ('Pork 猪肉', 5, 'KG', 30.0, 150.0, 19.5, 169.5)
+
+FIRST = [
+    ('000000001', '某某肉业', '2025-07-02', [BEEF, PORK]),
+    ('000000002', '小小商行', '2025-07-03', [('Salt 盐', 2, 'BAG', 3.0, 6.0, 0.78, 6.78)]),
+]
+# 收货单1明细顺序不同、数量写成浮点数；收货单2金额不同；收货单3是新的
+SECOND = [
+    ('000000003', '小小商行', '2025-07-09', [('Sugar 糖', 1, 'BAG', 5.0, 5.0, 0.65, 5.65)]),
+    ('000000001', '某某肉业', '2025-07-02', [PORK, ('Beef 牛肉', 10.0, 'KG', 42.5, 425.0, 55.25, 480.25)]),
+    ('000000002', '小小商行', '2025-07-03', [('Salt 盐', 2, 'BAG', 3.0, 6.5, 0.85, 7.35)]),
+]
+
+
+def receipt_lines(frame):
+    return frame.groupby('收货单号').size().to_dict()
+
+
+def duplicate_kinds(report):
+    return sorted(zip(report['收货单号'], report['类型']))
+
+
+EXPECTED_LINES = {'000000001': 2, '000000002': 2, '000000003': 1}
+EXPECTED_DUPLICATES = [('000000001', EXACT_DUPLICATE), ('000000002', CONFLICTING_DUPLICATE)]
+
+work_dir = tempfile.mkdtemp()
+current_dir = os.getcwd()
+stream_chunk = recon_engine.STREAM_CHUNK_RECEIPTS
+try:
+    # run() 的日志目录在运行目录下
+    os.chdir(work_dir)
+    first_file = os.path.join(work_dir, 'first.xlsx')
+    second_file = os.path.join(work_dir, 'second.xlsx')
+    write_journal(first_file, FIRST)
+    write_journal(second_file, SECOND)
+
+    # 一次性处理
+    result = ReconEngine(config=ReconConfig(company_name='TEST HOTEL')).process([first_file, second_file])
+    print(f'一次性处理：{receipt_lines(result.cleaned)}，{duplicate_kinds(result.duplicates)}')
+    assert receipt_lines(result.cleaned) == EXPECTED_LINES
+    assert duplicate_kinds(result.duplicates) == EXPECTED_DUPLICATES
+
+    # 流式处理，每块只有一张收货单，每张收货单都与其重复的收货单位于不同的块
+    recon_engine.STREAM_CHUNK_RECEIPTS = 1
+    output_root = os.path.join(work_dir, 'output')
+    config = ReconConfig(company_name='TEST HOTEL', output_root=output_root, performance={'streaming_threshold_mb': 0})
+    success, error_msg = ReconEngine([first_file, second_file], config=config).run()
+    assert success, error_msg
+    with ReceiptStore(os.path.join(output_root, config.history_store)) as store:
+        streamed = store.query_receipts()
+    print(f'流式处理：{receipt_lines(streamed)}')
+    assert receipt_lines(streamed) == EXPECTED_LINES
+    reports = [name for name in os.listdir(os.path.join(output_root, '供应商对账明细')) if name.startswith('_重复收货单_')]
+    assert len(reports) == 1, reports
+    print('跨文件和跨分块的重复收货单检查通过')
+finally:
+    recon_engine.STREAM_CHUNK_RECEIPTS = stream_chunk
+    os.chdir(current_dir)
+    shutil.rmtree(work_dir, ignore_errors=True)
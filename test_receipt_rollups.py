@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from receipt_store import ALL_RECEIPTS, ROLLUP_SELECTS, ROLLUP_TABLES, ReceiptStore
+
+# 测试脚本，用于检查重复导入和更正收货单后历史库的月度汇总表与按全部明细重新计算的结果一致：
+# 收货单改了供应商或日期时旧月份的汇总随之更新，更正后行数变少的收货单不保留多出的旧明细
+
+
+def cleaned(lines):
+    """清洗后的收货明细，lines 为 (收货单号, 收货日期, 供应商, 商品名称, 小计金额, 部门) 的列表"""
+    return pd.DataFrame([{'收货单号': receipt, '收货日期': date, '商品名称': article, '实收数量': 1.0,
+                          '基本单位': 'KG', '单价': amount, '小计金额': amount, '税额': round(amount * 0.13, 2),
+                          '税率': 0.13, '小计价税': round(amount * 1.13, 2), '部门': department, '供应商名称': supplier}
+                         for receipt, date, supplier, article, amount, department in lines])
+
+
+def check_rollups(store, step):
+    """增量更新的汇总表与全量重新计算的结果相同"""
+    for dimension, (table, key_columns) in ROLLUP_TABLES.items():
+        current = sorted(store.conn.execute(f'SELECT * FROM {table}').fetchall())
+        expected = sorted(store.conn.execute(ROLLUP_SELECTS[dimension].format(source=ALL_RECEIPTS)).fetchall())
+        assert len(current) == len(expected), f'{step}：{table} 行数不同'
+        for row, expected_row in zip(current, expected):
+            assert row[:-3] == expected_row[:-3], f'{step}：{table} {row} != {expected_row}'
+            assert all(abs((value or 0) - (expected_value or 0)) < 1e-6
+                       for value, expected_value in zip(row[-3:], expected_row[-3:])), f'{step}：{table} {row}'
+    print(f'{step}：汇总表与全部明细一致')
+
+
+def supplier_month(store, supplier, month):
+    return store.conn.execute('SELECT receipt_count, line_count, net_amount FROM rollup_supplier_month '
+                              'WHERE supplier = ? AND month = ?', (supplier, month)).fetchone()
+
+
+FIRST_IMPORT = [
+    ('000000001', '2025-07-02', '某某肉业', 'Beef 牛肉', 100.0, 'Kitchen 厨房'),
+    ('000000001', '2025-07-02', '某某肉业', 'Pork 猪肉', 50.0, 'Kitchen 厨房'),
+    ('000000001', '2025-07-02', '某某肉业', 'Lamb 羊肉', 30.0, 'Kitchen 厨房'),
+    ('000000002', '2025-07-03', '小小商行', 'Salt 盐', 6.0, 'Bar 酒吧'),
+    ('000000003', '2025-07-31', '小小商行', 'Sugar 糖', 5.0, 'Kitchen 厨房'),
+]
+
+work_dir = tempfile.mkdtemp()
+try:
+    with ReceiptStore(os.path.join(work_dir, 'receipts.db')) as store:
+        store.upsert_receipts(cleaned(FIRST_IMPORT))
+        check_rollups(store, '第一次导入')
+        assert supplier_month(store, '某某肉业', '2025-07') == (1, 3, 180.0)
+
+        # 重复导入同一批数据，汇总不变
+        store.upsert_receipts(cleaned(FIRST_IMPORT))
+        check_rollups(store, '重复导入')
+        assert store.count() == len(FIRST_IMPORT)
+        assert supplier_month(store, '某某肉业', '2025-07') == (1, 3, 180.0)
+
+        # 更正：收货单1只剩一行，收货单3改到8月并换了供应商和部门
+        store.upsert_receipts(cleaned([
+            ('000000001', '2025-07-02', '某某肉业', 'Beef 牛肉', 10.0, 'Kitchen 厨房'),
+            ('000000003', '2025-08-01', '某某肉业', 'Sugar 糖', 5.0, 'Bar 酒吧'),
+        ]))
+        check_rollups(store, '更正后导入')
+        assert store.count() == 3, '更正后行数变少的收货单不应保留旧明细行'
+        assert supplier_month(store, '某某肉业', '2025-07') == (1, 1, 10.0)
+        assert supplier_month(store, '某某肉业', '2025-08') == (1, 1, 5.0)
+        assert supplier_month(store, '小小商行', '2025-07') == (1, 1, 6.0)
+        print('更正的收货单已从原供应商月份的汇总中移除')
+finally:
+    shutil.rmtree(work_dir, ignore_errors=True)
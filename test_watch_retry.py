@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+
+from fixture_journal import write_journal
+from recon_engine import ReconEngine
+from recon_watch import WatchService
+
+# 测试脚本，用于检查监视文件夹模式下处理失败的文件：不写入解析缓存，下一次检查时重新处理
+
+RECEIPTS = [
+    ('000000001', '某某肉业', '2025-07-02', [('Beef 牛肉', 10, 'KG', 42.5, 425.0, 55.25, 480.25)]),
+    ('000000002', '小小商行', '2025-07-03', [('Salt 盐', 2, 'BAG', 3.0, 6.0, 0.78, 6.78)]),
+]
+
+work_dir = tempfile.mkdtemp()
+current_dir = os.getcwd()
+write_master_summaries = ReconEngine.write_master_summaries
+try:
+    # run() 的日志目录和输出都在运行目录下
+    os.chdir(work_dir)
+    inbox = os.path.join(work_dir, 'inbox')
+    os.makedirs(inbox)
+    journal = os.path.join(inbox, 'journal.xlsx')
+    write_journal(journal, RECEIPTS)
+    service = WatchService(inbox, os.path.join(work_dir, 'cache'), poll_seconds=0, settle_seconds=0)
+
+    # 第一次处理在读取和清洗之后、对账单生成完成前失败
+    def fail_once(engine, *args, **kwargs):
+        ReconEngine.write_master_summaries = write_master_summaries
+        raise RuntimeError('模拟写入汇总表失败')
+
+    ReconEngine.write_master_summaries = fail_once
+    ready, pending = service.watcher.scan()
+    success, error_msg = service.process(ready, service.new_files(ready))
+    print(f'第一次处理：{"成功" if success else "失败"}，{error_msg}')
+    assert not success
+    assert not service.parse_cache.contains(journal), '失败的运行不应写入解析缓存'
+    assert service.new_files(ready) == [journal], '失败的文件下次检查时应重新处理'
+
+    # 重新启动监视后同样视为新文件
+    restarted = WatchService(inbox, os.path.join(work_dir, 'cache'), poll_seconds=0, settle_seconds=0)
+    ready, pending = restarted.watcher.scan()
+    assert restarted.new_files(ready) == [journal]
+
+    success, error_msg = service.process(ready, service.new_files(ready))
+    print(f'第二次处理：{"成功" if success else "失败"}')
+    assert success, error_msg
+    assert service.parse_cache.contains(journal)
+    assert service.new_files(ready) == []
+    assert os.path.exists(os.path.join('供应商对账明细', '202507', '某某肉业_对账明细.xlsx'))
+    print('失败的文件已在下一次检查时重新处理')
+finally:
+    ReconEngine.write_master_summaries = write_master_summaries
+    os.chdir(current_dir)
+    shutil.rmtree(work_dir, ignore_errors=True)